@@ -1,16 +1,201 @@
 import os
+import re
+import sys
+import sqlite3
 import json
-from flask import Flask, request, jsonify, send_from_directory, render_template_string
+import base64
+import gzip
+import math
+import functools
+import itertools
+import struct
+import hashlib
+import mimetypes
+import shutil
+import threading
+import uuid
+import time
+import random
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from flask import Flask, Request, Response, g, request, jsonify, send_file, render_template_string, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_etags
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 from datetime import datetime
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
+
+# Le SDK Cloudinary (et urllib3) et Pillow sont importés au premier usage:
+# voir cloudinary_sdk() et pillow(). Un worker en stockage local ne les
+# charge jamais, et le démarrage à froid ne paie que Flask.
 
 app = Flask(__name__, static_folder='static', static_url_path='')
 CORS(app)
 
+# ========== MÉTRIQUES (FORMAT PROMETHEUS) ==========
+
+# Bornes des histogrammes: durées (secondes) et tailles d'upload (octets)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (10_000, 100_000, 500_000, 1_000_000, 2_000_000, 5_000_000, 10_000_000, 50_000_000)
+
+class Metric:
+    """Compteur ou histogramme étiqueté, tenu en mémoire par le processus.
+
+    Chaque worker gunicorn a ses propres valeurs: /metrics décrit le
+    worker qui répond (étiquette `worker` ajoutée à l'export).
+    """
+
+    def __init__(self, name, help_text, kind, buckets=None):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.buckets = buckets
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                # [compte par tranche (+Inf en dernier), somme, total]
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            values = {key: (list(v[0]), v[1], v[2]) if self.kind == 'histogram' else v
+                      for key, v in self.values.items()}
+        for key, value in sorted(values.items()):
+            if self.kind != 'histogram':
+                yield self.name, key, value
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key + (('le', format_bound(bound)),), cumulative
+            yield f"{self.name}_sum", key, total
+            yield f"{self.name}_count", key, count
+
+class CallbackMetric:
+    """Valeur lue à l'export (statistiques de caches, de pools, de file)"""
+
+    def __init__(self, name, help_text, kind, collect):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield self.name, tuple(sorted(labels.items())), value
+
+metrics_registry = []
+
+def counter(name, help_text):
+    metric = Metric(name, help_text, 'counter')
+    metrics_registry.append(metric)
+    return metric
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS):
+    metric = Metric(name, help_text, 'histogram', buckets)
+    metrics_registry.append(metric)
+    return metric
+
+def callback_metric(name, help_text, kind, collect):
+    metrics_registry.append(CallbackMetric(name, help_text, kind, collect))
+
+def format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+def render_metrics():
+    """Exporter toutes les métriques au format texte Prometheus 0.0.4"""
+    worker = (('worker', str(os.getpid())),)
+    lines = []
+    for metric in metrics_registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        try:
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{format_labels(worker + labels)} {value}")
+        except Exception as e:
+            print(f"Erreur métrique {metric.name}: {e}")
+    return '\n'.join(lines) + '\n'
+
+http_latency = histogram('rayschic_http_request_duration_seconds', 'Durée des requêtes HTTP par route (jusqu\'aux en-têtes)')
+upload_bytes = histogram('rayschic_upload_bytes', 'Taille des images uploadées', SIZE_BUCKETS)
+upload_latency = histogram(
+    'rayschic_upload_duration_seconds', 'Durée d\'un upload par résultat (stored, duplicate, error)'
+)
+cloudinary_latency = histogram('rayschic_cloudinary_request_duration_seconds', 'Durée des appels Cloudinary par opération')
+cloudinary_errors = counter('rayschic_cloudinary_errors_total', 'Appels Cloudinary en erreur par opération')
+local_scan_latency = histogram('rayschic_local_scan_duration_seconds', 'Parcours d\'un dossier de collection local')
+store_load_latency = histogram('rayschic_catalog_load_duration_seconds', 'Lecture complète du catalogue dans SQLite')
+catalog_cache_total = counter('rayschic_catalog_cache_total', 'Accès à l\'index en mémoire (hit, reload, refresh)')
+listing_responses_total = counter('rayschic_listing_responses_total', 'Réponses de catalogue (full, delta, not_modified)')
+
+@contextmanager
+def track_cloudinary(operation):
+    """Mesurer un appel Cloudinary (sync ou async), compter ses erreurs, suivre les limitations"""
+    start = time.perf_counter()
+    cloudinary_response.status = None
+    try:
+        yield
+    except Exception as e:
+        cloudinary_errors.inc(operation=operation)
+        limited, retry_after = rate_limit_signal(e)
+        if limited:
+            cloudinary_backoff.throttled(retry_after)
+        raise
+    else:
+        cloudinary_backoff.succeeded()
+    finally:
+        cloudinary_latency.observe(time.perf_counter() - start, operation=operation)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        http_latency.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=request.url_rule.rule if request.url_rule else 'unmatched',
+            status=str(response.status_code)
+        )
+    return response
+
 # ========== CONFIGURATION CLOUDINARY AVEC SECOURS ==========
 
 # Configuration
@@ -31,227 +216,3064 @@ COLLECTION_TITLES = {
 UPLOAD_FOLDER = 'temp_uploads'
 
 # Configuration Cloudinary
-def configure_cloudinary():
-    """Configurer Cloudinary avec valeurs d'environnement ou secours"""
+def cloudinary_credentials():
+    """(cloud_name, api_key, api_secret) depuis l'environnement, sans charger le SDK"""
     # Essayer les noms de variables les plus courants
-    cloud_name = os.environ.get('CLOUDINARY_CLOUD_NAME') or os.environ.get('CLOUDINARY_CLOUD')
-    api_key = os.environ.get('CLOUDINARY_API_KEY') or os.environ.get('CLOUDINARY_KEY')
-    api_secret = os.environ.get('CLOUDINARY_API_SECRET') or os.environ.get('CLOUDINARY_SECRET')
+    return (
+        os.environ.get('CLOUDINARY_CLOUD_NAME') or os.environ.get('CLOUDINARY_CLOUD'),
+        os.environ.get('CLOUDINARY_API_KEY') or os.environ.get('CLOUDINARY_KEY'),
+        os.environ.get('CLOUDINARY_API_SECRET') or os.environ.get('CLOUDINARY_SECRET')
+    )
+
+def configure_cloudinary(sdk):
+    """Configurer Cloudinary avec valeurs d'environnement ou secours"""
+    cloud_name, api_key, api_secret = cloudinary_credentials()
     
     # Log pour débogage
     print(f"DEBUG: cloud_name exists = {bool(cloud_name)}")
     print(f"DEBUG: api_key exists = {bool(api_key)}")
     print(f"DEBUG: api_secret exists = {bool(api_secret)}")
     
-    if cloud_name and api_key and api_secret:
+    try:
+        sdk.config(
+            cloud_name=cloud_name,
+            api_key=api_key,
+            api_secret=api_secret,
+            secure=True
+        )
+        print("✅ Cloudinary configuré avec succès")
+    except Exception as e:
+        print(f"⚠️ Erreur configuration Cloudinary: {e}")
+
+# Le SDK n'est chargé et configuré qu'au premier appel (cloudinary_sdk)
+CLOUDINARY_ENABLED = all(cloudinary_credentials())
+if not CLOUDINARY_ENABLED:
+    print("⚠️ Variables Cloudinary non trouvées. Utilisation du stockage local.")
+
+# Listing Cloudinary parallèle: taille du pool et délai par collection (secondes)
+CLOUDINARY_LIST_WORKERS = int(os.environ.get('CLOUDINARY_LIST_WORKERS', len(COLLECTIONS)))
+CLOUDINARY_LIST_TIMEOUT = float(os.environ.get('CLOUDINARY_LIST_TIMEOUT', 10))
+
+# Taille de page maximale acceptée par l'API Admin Cloudinary
+CLOUDINARY_MAX_RESULTS = 500
+cloudinary_list_executor = ThreadPoolExecutor(
+    max_workers=CLOUDINARY_LIST_WORKERS,
+    thread_name_prefix='cloudinary-list'
+)
+
+# ========== POOL HTTP CLOUDINARY ==========
+
+# Connexions gardées ouvertes par hôte (API, livraison) et par worker
+CLOUDINARY_POOL_SIZE = int(os.environ.get('CLOUDINARY_POOL_SIZE', max(10, CLOUDINARY_LIST_WORKERS)))
+CLOUDINARY_CONNECT_TIMEOUT = float(os.environ.get('CLOUDINARY_CONNECT_TIMEOUT', 5))
+CLOUDINARY_READ_TIMEOUT = float(os.environ.get('CLOUDINARY_READ_TIMEOUT', 60))
+CLOUDINARY_RETRIES = int(os.environ.get('CLOUDINARY_RETRIES', 3))
+CLOUDINARY_RETRY_BACKOFF = float(os.environ.get('CLOUDINARY_RETRY_BACKOFF', 0.5))
+
+# Statut et Retry-After de la dernière réponse Cloudinary, par thread
+cloudinary_response = threading.local()
+
+pool_metrics_lock = threading.Lock()
+pool_metrics = {'retries': 0}
+
+# Pool partagé par le SDK, créé avec lui (None tant que Cloudinary n'a pas servi)
+cloudinary_http = None
+cloudinary_module = None
+cloudinary_lock = threading.Lock()
+
+def make_cloudinary_http(sdk):
+    """Pool urllib3 du SDK: keep-alive, délais bornés, nouvelles tentatives comptées"""
+    import urllib3
+
+    class CountingRetry(urllib3.Retry):
+        """Retry qui compte les nouvelles tentatives pour les métriques du pool"""
+
+        def increment(self, *args, **kwargs):
+            with pool_metrics_lock:
+                pool_metrics['retries'] += 1
+            return super().increment(*args, **kwargs)
+
+    # Les erreurs de connexion sont réessayées pour toute méthode (rien n'est
+    # parti); les erreurs de lecture et 5xx/429 seulement pour les méthodes
+    # idempotentes (listing GET, delete_resources DELETE), pas pour les uploads
+    connector = sdk.utils.get_http_connector(sdk.config(), dict(
+        sdk.CERT_KWARGS,
+        num_pools=4,
+        maxsize=CLOUDINARY_POOL_SIZE,
+        timeout=urllib3.Timeout(connect=CLOUDINARY_CONNECT_TIMEOUT, read=CLOUDINARY_READ_TIMEOUT),
+        retries=CountingRetry(
+            total=CLOUDINARY_RETRIES,
+            allowed_methods=frozenset({'GET', 'HEAD', 'DELETE', 'OPTIONS'}),
+            status_forcelist={420, 429, 500, 502, 503, 504},
+            backoff_factor=CLOUDINARY_RETRY_BACKOFF,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+    ))
+    
+    # Les exceptions du SDK ne portent pas le statut HTTP: le noter au passage
+    # (dernière réponse du thread, après les nouvelles tentatives)
+    urlopen = connector.urlopen
+    
+    def recording_urlopen(method, url, *args, **kwargs):
+        response = urlopen(method, url, *args, **kwargs)
+        cloudinary_response.status = response.status
+        cloudinary_response.retry_after = response.headers.get('Retry-After')
+        return response
+    
+    connector.urlopen = recording_urlopen
+    return connector
+
+def cloudinary_sdk():
+    """Module cloudinary, importé et configuré au premier appel (une fois par processus)"""
+    global cloudinary_module, cloudinary_http
+    if cloudinary_module is not None:
+        return cloudinary_module
+    with cloudinary_lock:
+        if cloudinary_module is None:
+            import cloudinary
+            import cloudinary.uploader
+            import cloudinary.api
+            import cloudinary.utils
+            import cloudinary.exceptions
+            import cloudinary.api_client.call_api
+            configure_cloudinary(cloudinary)
+            cloudinary_http = make_cloudinary_http(cloudinary)
+            # Un seul pool pour le SDK (API d'upload et API Admin)
+            cloudinary.uploader._http = cloudinary_http
+            cloudinary.api_client.call_api._http = cloudinary_http
+            cloudinary_module = cloudinary
+    return cloudinary_module
+
+def cloudinary_pool_stats():
+    """Requêtes, connexions ouvertes et connexions au repos par hôte"""
+    hosts = {}
+    for key in (cloudinary_http.pools.keys() if cloudinary_http is not None else ()):
+        pool = cloudinary_http.pools.get(key)
+        if pool is None:
+            continue
+        queue = pool.pool
+        hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+            'requests': pool.num_requests,
+            'connections_opened': pool.num_connections,
+            'idle': sum(1 for conn in list(queue.queue) if conn is not None) if queue else 0,
+            'maxsize': queue.maxsize if queue else 0
+        }
+    requests_count = sum(host['requests'] for host in hosts.values())
+    opened = sum(host['connections_opened'] for host in hosts.values())
+    return {
+        'hosts': hosts,
+        'requests': requests_count,
+        'connections_opened': opened,
+        # Part des requêtes servies sur une connexion déjà ouverte
+        'reuse_ratio': round(1 - opened / requests_count, 3) if requests_count else None,
+        'retries': pool_metrics['retries'],
+        'pool_size': CLOUDINARY_POOL_SIZE
+    }
+
+callback_metric(
+    'rayschic_cloudinary_pool_requests_total', 'Requêtes HTTP envoyées par le pool Cloudinary', 'counter',
+    lambda: [({'host': host}, stats['requests']) for host, stats in cloudinary_pool_stats()['hosts'].items()]
+)
+callback_metric(
+    'rayschic_cloudinary_pool_connections_total', 'Connexions ouvertes par le pool Cloudinary', 'counter',
+    lambda: [({'host': host}, stats['connections_opened']) for host, stats in cloudinary_pool_stats()['hosts'].items()]
+)
+callback_metric(
+    'rayschic_cloudinary_retries_total', 'Nouvelles tentatives du pool Cloudinary', 'counter',
+    lambda: [({}, pool_metrics['retries'])]
+)
+
+# ========== CONTRÔLE D'ADMISSION ==========
+
+# Limites par opération, par worker:
+#   (requêtes simultanées, débit global/s, rafale globale, débit par client/s, rafale par client)
+# 0 désactive une limite. Surcharge: ADMISSION_UPLOAD=4,10,30,2,10
+# Un lot (/api/upload/batch, /api/delete/batch) compte pour une requête.
+ADMISSION_DEFAULTS = {
+    'upload': (4, 10, 30, 2, 10),
+    'delete': (4, 20, 50, 5, 20),
+    # Seulement ?refresh=1: relecture complète du stockage (listing Cloudinary)
+    'list': (2, 2, 5, 0.5, 2),
+    'ping': (1, 1, 3, 0.2, 2),
+}
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1').lower() in ('1', 'true', 'yes')
+# Proxys devant l'application (Render: 1) dont on croit X-Forwarded-For
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 1))
+ADMISSION_MAX_CLIENTS = int(os.environ.get('ADMISSION_MAX_CLIENTS', 10000))
+# Retry-After conseillé quand toutes les places sont prises
+ADMISSION_BUSY_RETRY = float(os.environ.get('ADMISSION_BUSY_RETRY', 1))
+# Pause après une limitation Cloudinary (420/429): doublée à chaque signal
+CLOUDINARY_BACKOFF_BASE = float(os.environ.get('CLOUDINARY_BACKOFF_BASE', 2))
+CLOUDINARY_BACKOFF_MAX = float(os.environ.get('CLOUDINARY_BACKOFF_MAX', 120))
+
+RATE_LIMIT_STATUSES = {420, 429}
+# Dernier recours, quand aucun statut HTTP n'est connu
+RATE_LIMIT_PATTERN = re.compile(r'\b(?:Error|HTTP|status(?: code)?)\W*42[09]\b|\(42[09]\)|rate limit', re.IGNORECASE)
+
+admission_rejections = counter(
+    'rayschic_admission_rejected_total', 'Requêtes refusées par opération et motif (concurrency, client, rate, cloudinary)'
+)
+
+class AdmissionRejected(Exception):
+    """Requête refusée avant traitement (429 client trop rapide, 503 serveur saturé)"""
+
+    def __init__(self, status, retry_after, message):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.message = message
+
+class TokenBucket:
+    """Seau à jetons: `rate` jetons par seconde, au plus `burst` en réserve"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.updated = now
+
+    def take(self, now):
+        """Prendre un jeton: 0 si accordé, sinon l'attente avant le prochain"""
+        if self.rate <= 0:
+            return 0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+class Admission:
+    """Places simultanées et débits (global et par client) d'une opération.
+
+    Rien n'attend: une requête en trop est refusée tout de suite, ce qui
+    garde la latence des requêtes admises prévisible sous la charge.
+    """
+
+    def __init__(self, operation, concurrency, rate, burst, client_rate, client_burst):
+        now = time.monotonic()
+        self.operation = operation
+        self.concurrency = int(concurrency)
+        self.bucket = TokenBucket(rate, burst, now)
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.clients = OrderedDict()
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def reject(self, reason, status, retry_after, message):
+        admission_rejections.inc(operation=self.operation, reason=reason)
+        raise AdmissionRejected(status, retry_after, message)
+
+    def acquire(self, client):
+        now = time.monotonic()
+        with self.lock:
+            if self.concurrency and self.in_flight >= self.concurrency:
+                self.reject('concurrency', 503, ADMISSION_BUSY_RETRY, 'Serveur occupé, réessayez dans un instant')
+            bucket = self.clients.get(client)
+            if bucket is None:
+                bucket = self.clients[client] = TokenBucket(self.client_rate, self.client_burst, now)
+                if len(self.clients) > ADMISSION_MAX_CLIENTS:
+                    self.clients.popitem(last=False)
+            else:
+                self.clients.move_to_end(client)
+            wait = bucket.take(now)
+            if wait:
+                self.reject('client', 429, wait, 'Trop de requêtes, ralentissez')
+            wait = self.bucket.take(now)
+            if wait:
+                # Le jeton du client n'a pas servi
+                bucket.refund()
+                self.reject('rate', 503, wait, 'Serveur saturé, réessayez plus tard')
+            self.in_flight += 1
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {
+            'in_flight': self.in_flight,
+            'concurrency': self.concurrency,
+            'clients': len(self.clients)
+        }
+
+class CloudinaryBackoff:
+    """Pause adaptative des appels Cloudinary après une limitation (420/429).
+
+    Chaque signal double la pause (bornée), ou suit le Retry-After reçu;
+    chaque appel réussi la divise par deux. Propre à chaque worker.
+    """
+
+    def __init__(self, base, maximum):
+        self.base = base
+        self.maximum = maximum
+        self.delay = 0
+        self.until = 0
+        self.throttles = 0
+        self.lock = threading.Lock()
+
+    def throttled(self, retry_after=None):
+        with self.lock:
+            self.delay = min(self.maximum, max(self.base, self.delay * 2))
+            pause = min(self.maximum, retry_after) if retry_after else self.delay
+            self.until = max(self.until, time.monotonic() + pause)
+            self.throttles += 1
+        print(f"⚠️ Cloudinary limite les requêtes: pause de {pause:.0f}s")
+
+    def succeeded(self):
+        if self.delay:
+            with self.lock:
+                self.delay = self.delay / 2 if self.delay / 2 >= self.base else 0
+
+    def remaining(self):
+        return max(0.0, self.until - time.monotonic())
+
+def admission_limits(operation):
+    value = os.environ.get(f'ADMISSION_{operation.upper()}')
+    if not value:
+        return ADMISSION_DEFAULTS[operation]
+    return tuple(float(part) for part in value.split(','))
+
+admissions = {operation: Admission(operation, *admission_limits(operation)) for operation in ADMISSION_DEFAULTS}
+cloudinary_backoff = CloudinaryBackoff(CLOUDINARY_BACKOFF_BASE, CLOUDINARY_BACKOFF_MAX)
+
+def rate_limit_signal(error):
+    """(limité ?, Retry-After) d'une erreur Cloudinary.
+
+    Le statut HTTP fait foi: celui de l'erreur (client async) ou de la
+    dernière réponse du pool; la classe et le texte de l'exception ne
+    servent que s'il est inconnu.
+    """
+    status = getattr(error, 'http_code', None) or getattr(cloudinary_response, 'status', None)
+    if status is not None:
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is None and str(getattr(cloudinary_response, 'retry_after', None) or '').isdigit():
+            retry_after = int(cloudinary_response.retry_after)
+        return status in RATE_LIMIT_STATUSES, retry_after
+    limited = type(error).__name__ == 'RateLimited' or bool(RATE_LIMIT_PATTERN.search(str(error)))
+    return limited, getattr(error, 'retry_after', None)
+
+@contextmanager
+def admitted(operation, client, cloudinary=False):
+    """Admettre une requête `operation` du client, ou lever AdmissionRejected.
+
+    `cloudinary`: la requête appellera Cloudinary, refusée pendant une pause.
+    """
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    if cloudinary:
+        pause = cloudinary_backoff.remaining()
+        if pause:
+            admission_rejections.inc(operation=operation, reason='cloudinary')
+            raise AdmissionRejected(503, pause, 'Cloudinary limite les requêtes, réessayez plus tard')
+    admission = admissions[operation]
+    admission.acquire(client)
+    try:
+        yield
+    finally:
+        admission.release()
+
+def client_address(remote_addr, forwarded_for):
+    """Adresse du client: celle qu'a vue le plus lointain proxy de confiance"""
+    if TRUSTED_PROXIES and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+        if len(hops) >= TRUSTED_PROXIES:
+            return hops[-TRUSTED_PROXIES]
+    return remote_addr or 'unknown'
+
+def limited(operation, cloudinary=lambda: False, when=lambda: True):
+    """Décorateur de route (sous @app.route): admission avant la vue"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not when():
+                return view(*args, **kwargs)
+            client = client_address(request.remote_addr, request.headers.get('X-Forwarded-For'))
+            with admitted(operation, client, cloudinary()):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    response = jsonify({'error': error.message, 'retry_after': error.retry_after})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def admission_status():
+    return {
+        'enabled': ADMISSION_ENABLED,
+        'operations': {operation: admission.stats() for operation, admission in admissions.items()},
+        'cloudinary_backoff': round(cloudinary_backoff.remaining(), 1),
+        'cloudinary_throttles': cloudinary_backoff.throttles
+    }
+
+callback_metric(
+    'rayschic_admission_in_flight', 'Requêtes admises en cours par opération', 'gauge',
+    lambda: [({'operation': operation}, admission.in_flight) for operation, admission in admissions.items()]
+)
+callback_metric(
+    'rayschic_cloudinary_backoff_seconds', 'Pause restante avant de rappeler Cloudinary', 'gauge',
+    lambda: [({}, round(cloudinary_backoff.remaining(), 3))]
+)
+callback_metric(
+    'rayschic_cloudinary_throttles_total', 'Limitations signalées par Cloudinary (420/429)', 'counter',
+    lambda: [({}, cloudinary_backoff.throttles)]
+)
+
+# ========== RÉCEPTION DES UPLOADS EN STREAMING ==========
+
+# Taille maximale d'un fichier uploadé
+MAX_FILE_SIZE = 10 * 1024 * 1024
+
+# Taille maximale d'une requête entière (plusieurs fichiers pour /api/upload/batch)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 100 * 1024 * 1024))
+
+# Fichiers en cours de réception, sur le même disque que les collections
+INCOMING_FOLDER = os.path.join(UPLOAD_FOLDER, '.incoming')
+
+# Taille des morceaux envoyés à l'API d'upload découpé de Cloudinary (min 5 Mo)
+CLOUDINARY_CHUNK_SIZE = int(os.environ.get('CLOUDINARY_CHUNK_SIZE', 6 * 1024 * 1024))
+
+class StagedUpload:
+    """Fichier reçu écrit directement sur disque, haché au passage.
+
+    Le parseur multipart y écrit morceau par morceau: rien n'est gardé en
+    mémoire et la taille est contrôlée pendant la réception. Au-delà de
+    `limit` octets, le contenu est abandonné et `too_large` passe à True.
+    upload_image() renomme ensuite le fichier à sa place définitive.
+    """
+
+    def __init__(self, limit):
+        os.makedirs(INCOMING_FOLDER, exist_ok=True)
+        self.path = os.path.join(INCOMING_FOLDER, f"{uuid.uuid4().hex}.part")
+        self.limit = limit
+        self.size = 0
+        self.too_large = False
+        self.digest = hashlib.sha256()
+        self._file = open(self.path, 'w+b')
+
+    def write(self, data):
+        if self.too_large:
+            return len(data)
+        self.size += len(data)
+        if self.size > self.limit:
+            self.too_large = True
+            self._file.truncate(0)
+            return len(data)
+        self.digest.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self.digest.hexdigest()
+
+    def commit(self, destination, replace=True):
+        """Déplacer le fichier reçu vers destination (simple renommage).
+
+        replace=False: FileExistsError si destination existe déjà, le
+        fichier reçu reste alors en place pour un autre essai.
+        """
+        self._file.close()
+        if replace:
+            os.replace(self.path, destination)
+        else:
+            os.link(self.path, destination)
+            os.remove(self.path)
+        self.path = None
+
+    def close(self):
+        self._file.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __getattr__(self, name):
+        # read, seek, tell, flush... sont ceux du fichier sous-jacent
+        return getattr(self._file, name)
+
+class StreamingUploadRequest(Request):
+    """Requête dont les fichiers multipart sont reçus dans des StagedUpload"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return StagedUpload(MAX_FILE_SIZE)
+
+app.request_class = StreamingUploadRequest
+
+def upload_sha256(file):
+    """Empreinte SHA-256 d'un fichier uploadé (déjà calculée en streaming)"""
+    if isinstance(file.stream, StagedUpload):
+        return file.stream.sha256
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.stream.read(1024 * 1024), b''):
+        digest.update(chunk)
+    file.stream.seek(0)
+    return digest.hexdigest()
+
+# ========== SONDAGE DES EN-TÊTES D'IMAGE ==========
+
+# Octets lus en tête de fichier: assez pour IHDR, l'en-tête GIF et RIFF/VP8*
+IMAGE_PROBE_BYTES = 64
+
+# Bombes de décompression: pixels maximum par image et images par animation
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 50_000_000))
+MAX_IMAGE_FRAMES = int(os.environ.get('MAX_IMAGE_FRAMES', 1000))
+
+# Marqueurs JPEG portant les dimensions (SOF0..SOF15 hors DHT, JPG, DAC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Extensions acceptées -> format réel attendu (noms Cloudinary)
+EXTENSION_FORMATS = {'png': 'png', 'jpg': 'jpg', 'jpeg': 'jpg', 'gif': 'gif', 'webp': 'webp'}
+
+class ImageProbeError(ValueError):
+    """Contenu qui n'est pas une image PNG, JPEG, GIF ou WebP lisible"""
+
+def probe_image(f):
+    """Format, dimensions et nombre d'images d'un fichier ouvert, sans décoder.
+
+    Seuls les en-têtes sont lus: les segments JPEG, chunks PNG/WebP et
+    blocs GIF sont sautés par seek(). Retourne un dict au format des
+    enregistrements du magasin (format, width, height, frames).
+    """
+    head = f.read(IMAGE_PROBE_BYTES)
+    try:
+        if head.startswith(b'\x89PNG\r\n\x1a\n'):
+            return probe_png(f, head)
+        if head.startswith(b'\xff\xd8'):
+            return probe_jpeg(f)
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return probe_gif(f, head)
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return probe_webp(f, head)
+    except (struct.error, IndexError):
+        raise ImageProbeError('Fichier image tronqué')
+    raise ImageProbeError('Contenu non reconnu: PNG, JPEG, GIF ou WebP attendu')
+
+def image_info(fmt, width, height, frames=1):
+    if not width or not height:
+        raise ImageProbeError(f"Dimensions invalides ({fmt})")
+    return {'format': fmt, 'width': width, 'height': height, 'frames': frames}
+
+def read_exact(f, size):
+    data = f.read(size)
+    if len(data) < size:
+        raise ImageProbeError('Fichier image tronqué')
+    return data
+
+def probe_png(f, head):
+    if head[12:16] != b'IHDR':
+        raise ImageProbeError('PNG sans en-tête IHDR')
+    width, height = struct.unpack('>II', head[16:24])
+    # APNG: le chunk acTL (nombre d'images) précède les données IDAT
+    frames = 1
+    offset = 8
+    while True:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, kind = struct.unpack('>I4s', header)
+        if kind == b'acTL':
+            frames = struct.unpack('>I', read_exact(f, 4))[0]
+            break
+        if kind in (b'IDAT', b'IEND'):
+            break
+        offset += 12 + length
+    return image_info('png', width, height, frames)
+
+def probe_jpeg(f):
+    offset = 2
+    while True:
+        f.seek(offset)
+        marker = read_exact(f, 2)
+        if marker[0] != 0xFF:
+            raise ImageProbeError('JPEG invalide')
+        if marker[1] == 0xFF:
+            # Octet de remplissage
+            offset += 1
+            continue
+        if marker[1] == 0x01 or 0xD0 <= marker[1] <= 0xD8:
+            # Marqueurs sans longueur
+            offset += 2
+            continue
+        if marker[1] in (0xD9, 0xDA):
+            raise ImageProbeError('JPEG sans dimensions')
+        length = struct.unpack('>H', read_exact(f, 2))[0]
+        if marker[1] in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>xHH', read_exact(f, 5))
+            return image_info('jpg', width, height)
+        offset += 2 + length
+
+def probe_gif(f, head):
+    width, height, flags = struct.unpack('<HHB', head[6:11])
+    offset = 13 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)
+    # Compter les descripteurs d'image; les données LZW sont sautées
+    # sous-bloc par sous-bloc (un octet de longueur lu pour 255 de données)
+    frames = 0
+    while frames <= MAX_IMAGE_FRAMES:
+        f.seek(offset)
+        block = f.read(1)
+        if block in (b'', b';'):
+            break
+        if block == b',':
+            descriptor = read_exact(f, 9)
+            offset += 10
+            if descriptor[8] & 0x80:
+                offset += 3 << ((descriptor[8] & 7) + 1)
+            offset += 1  # taille minimale du code LZW
+            frames += 1
+        elif block == b'!':
+            offset += 2  # introducteur et étiquette
+        else:
+            raise ImageProbeError('GIF invalide')
+        f.seek(offset)
+        while True:
+            size = f.read(1)
+            if not size or size == b'\x00':
+                offset = f.tell()
+                break
+            f.seek(size[0], os.SEEK_CUR)
+    return image_info('gif', width, height, max(frames, 1))
+
+def probe_webp(f, head):
+    kind = head[12:16]
+    if kind == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', head[26:30])
+        return image_info('webp', width & 0x3FFF, height & 0x3FFF)
+    if kind == b'VP8L' and head[20] == 0x2F:
+        bits = struct.unpack('<I', head[21:25])[0]
+        return image_info('webp', (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if kind == b'VP8X':
+        width = int.from_bytes(head[24:27], 'little') + 1
+        height = int.from_bytes(head[27:30], 'little') + 1
+        frames = 1
+        if head[20] & 0x02:
+            # Animation: une chunk ANMF par image
+            frames = 0
+            offset = 12
+            while frames <= MAX_IMAGE_FRAMES:
+                f.seek(offset)
+                header = f.read(8)
+                if len(header) < 8:
+                    break
+                chunk, size = struct.unpack('<4sI', header)
+                if chunk == b'ANMF':
+                    frames += 1
+                offset += 8 + size + (size & 1)
+        return image_info('webp', width, height, max(frames, 1))
+    raise ImageProbeError('WebP invalide')
+
+def probe_upload(source):
+    """Sonder un upload (FileStorage) ou un fichier sur disque (chemin)"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return probe_image(f)
+    stream = source.stream
+    stream.seek(0)
+    try:
+        return probe_image(stream)
+    finally:
+        stream.seek(0)
+
+def image_limits_error(info, filename):
+    """Message d'erreur si l'image dépasse les limites ou ment sur son type"""
+    pixels = info['width'] * info['height']
+    if pixels > MAX_IMAGE_PIXELS:
+        return f"Image trop grande: {info['width']}x{info['height']} pixels (max {MAX_IMAGE_PIXELS})"
+    if info['frames'] > MAX_IMAGE_FRAMES:
+        return f"Animation trop longue (max {MAX_IMAGE_FRAMES} images)"
+    if '.' in filename:
+        ext = filename.rsplit('.', 1)[1].lower()
+        if EXTENSION_FORMATS.get(ext) != info['format']:
+            return f"Contenu {info['format'].upper()} avec l'extension .{ext}"
+    return None
+
+# ========== MAGASIN DE MÉTADONNÉES (SQLITE) ==========
+
+# Base SQLite partagée par les workers (mode WAL: lectures sans blocage),
+# hors de UPLOAD_FOLDER qui est servi publiquement
+METADATA_DB = os.environ.get('METADATA_DB', os.path.join('instance', 'catalog.db'))
+# Ancien emplacement, repris au premier démarrage
+LEGACY_METADATA_DB = os.path.join(UPLOAD_FOLDER, '.catalog.db')
+
+# Réservation de nom (ligne `pending`) abandonnée par un worker tué: libérée après ce délai
+PENDING_CLAIM_TIMEOUT = float(os.environ.get('PENDING_CLAIM_TIMEOUT', 900))
+
+# Réservation d'un stockage distant (nom choisi par le backend): clé
+# PENDING_PREFIX + empreinte, jamais produite par secure_filename
+PENDING_PREFIX = '~pending-'
+
+# Attente maximale de la fin d'un upload identique déjà en cours
+PENDING_CLAIM_WAIT = float(os.environ.get('PENDING_CLAIM_WAIT', 60))
+
+# Nombre de versions gardées dans le journal des changements (?since=)
+CHANGE_LOG_VERSIONS = int(os.environ.get('CHANGE_LOG_VERSIONS', 1000))
+
+# Champs comparés pour savoir si une relecture du stockage change une image
+# (format et frames viennent du sondage à l'upload: un listing sans eux
+# ne les efface pas, voir _upsert)
+RECORD_FIELDS = ('storage', 'url', 'public_id', 'size', 'width', 'height', 'sha256', 'uploaded_at')
+
+# Colonnes ajoutées après coup aux bases existantes
+METADATA_COLUMNS = {'images': {'format': 'TEXT', 'frames': 'INTEGER'}}
+
+METADATA_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS images (
+    collection TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    storage TEXT NOT NULL,
+    url TEXT NOT NULL,
+    public_id TEXT,
+    size INTEGER NOT NULL DEFAULT 0,
+    width INTEGER,
+    height INTEGER,
+    format TEXT,
+    frames INTEGER,
+    sha256 TEXT,
+    variants TEXT NOT NULL DEFAULT '{}',
+    uploaded_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    sort_order INTEGER NOT NULL DEFAULT 0,
+    pending INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (collection, filename)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS images_sha256 ON images (collection, sha256);
+CREATE INDEX IF NOT EXISTS images_sort_order ON images (collection, sort_order);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0');
+INSERT OR IGNORE INTO meta (key, value) VALUES ('updated_at', strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'));
+INSERT OR IGNORE INTO meta (key, value) SELECT 'changes_from', value FROM meta WHERE key = 'version';
+CREATE TABLE IF NOT EXISTS changes (
+    version INTEGER NOT NULL,
+    collection TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    op TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_version ON changes (version);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    collection TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    staged_path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS jobs_content ON jobs (collection, sha256);
+'''
+
+def image_entry(record):
+    """Convertir une ligne du magasin (ou un enregistrement) en entrée de catalogue"""
+    variants = record['variants']
+    image = {
+        'filename': record['filename'],
+        'url': record['url'],
+        'size': record['size'],
+        'public_id': record['public_id'],
+        'uploaded_at': record['uploaded_at'],
+        'variants': json.loads(variants) if isinstance(variants, str) else variants
+    }
+    if record['width'] is not None:
+        image['dimensions'] = f"{record['width']}x{record['height']}"
+    if record['format']:
+        image['format'] = record['format']
+    if record['frames'] and record['frames'] > 1:
+        image['frames'] = record['frames']
+    return image
+
+def name_variants(filename):
+    """Noms sous lesquels une image peut être désignée (Cloudinary: sans extension)"""
+    return {filename, os.path.splitext(filename)[0]}
+
+@contextmanager
+def file_lock(path):
+    """Verrou inter-workers sur un fichier (fcntl, sinon rien)"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class MetadataStore:
+    """Métadonnées des images dans SQLite, source de vérité du catalogue.
+
+    Chaque écriture visible incrémente un compteur `version` dans la même
+    transaction, ce qui permet aux caches des workers de savoir s'ils sont
+    à jour, et note les images touchées dans le journal `changes` (deltas
+    ?since= et flux /api/events). Les lignes `pending` réservent un nom
+    pendant un upload.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.schema_lock = threading.Lock()
+        self.schema_ready = False
+
+    def connection(self):
+        # Une connexion par thread et par processus (les workers sont forkés)
+        if getattr(self.local, 'pid', None) != os.getpid():
+            # Dossier créé à la première connexion, pas à l'import
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.migrate_legacy()
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self.schema_lock:
+                if not self.schema_ready:
+                    conn.executescript(METADATA_SCHEMA)
+                    self.add_columns(conn)
+                    self.schema_ready = True
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return self.local.conn
+
+    def migrate_legacy(self):
+        """Déplacer la base de temp_uploads/ (servi en HTTP) vers self.path"""
+        if self.path == LEGACY_METADATA_DB or os.path.exists(self.path) or not os.path.exists(LEGACY_METADATA_DB):
+            return
+        with file_lock(self.path + '.lock'):
+            if os.path.exists(self.path) or not os.path.exists(LEGACY_METADATA_DB):
+                return
+            # Vider le WAL dans la base pour ne déplacer qu'un fichier
+            legacy = sqlite3.connect(LEGACY_METADATA_DB, timeout=30)
+            try:
+                legacy.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            finally:
+                legacy.close()
+            os.replace(LEGACY_METADATA_DB, self.path)
+            for suffix in ('-wal', '-shm'):
+                try:
+                    os.remove(LEGACY_METADATA_DB + suffix)
+                except FileNotFoundError:
+                    pass
+            print(f"Magasin de métadonnées déplacé vers {self.path}")
+
+    def add_columns(self, conn):
+        for table, columns in METADATA_COLUMNS.items():
+            existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            for column, kind in columns.items():
+                if column in existing:
+                    continue
+                try:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {kind}')
+                except sqlite3.OperationalError as e:
+                    # Un autre worker l'a ajoutée entre-temps
+                    if 'duplicate column' not in str(e):
+                        raise
+
+    @contextmanager
+    def transaction(self):
+        """Transaction d'écriture (BEGIN IMMEDIATE: un seul écrivain à la fois)"""
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
         try:
-            cloudinary.config(
-                cloud_name=cloud_name,
-                api_key=api_key,
-                api_secret=api_secret,
-                secure=True
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _version(self, conn):
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+
+    def _bump(self, conn, changes=()):
+        """Passer à la version suivante en journalisant les (collection, filename, op)"""
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+        version = self._version(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)",
+            (datetime.now().isoformat(),)
+        )
+        conn.executemany(
+            'INSERT INTO changes (version, collection, filename, op) VALUES (?, ?, ?, ?)',
+            [(version, collection, filename, op) for collection, filename, op in changes]
+        )
+        # Purge de temps en temps: les deltas plus anciens deviennent indisponibles
+        oldest = version - CHANGE_LOG_VERSIONS
+        if oldest > 0 and version % 100 == 0:
+            conn.execute('DELETE FROM changes WHERE version <= ?', (oldest,))
+            conn.execute(
+                "UPDATE meta SET value = MAX(CAST(value AS INTEGER), ?) WHERE key = 'changes_from'",
+                (oldest,)
             )
-            print("✅ Cloudinary configuré avec succès")
-            return True
-        except Exception as e:
-            print(f"⚠️ Erreur configuration Cloudinary: {e}")
-            return False
-    else:
-        print("⚠️ Variables Cloudinary non trouvées. Utilisation du stockage local.")
-        return False
+        return version
 
-# Initialiser Cloudinary
-CLOUDINARY_ENABLED = configure_cloudinary()
+    def version(self):
+        return self._version(self.connection())
 
-# Créer le dossier local de secours
-for collection in COLLECTIONS:
-    os.makedirs(os.path.join(UPLOAD_FOLDER, collection), exist_ok=True)
+    def get_meta(self, key):
+        row = self.connection().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
 
-# ========== FONCTIONS DE GESTION DES IMAGES ==========
+    def set_meta(self, key, value):
+        with self.transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
 
-def upload_image(file, collection, public_id=None):
-    """Upload une image (Cloudinary ou local selon configuration)"""
-    try:
-        if CLOUDINARY_ENABLED:
-            # Utiliser Cloudinary
-            if not public_id:
-                name = secure_filename(file.filename)
-                public_id = f"rayschic/{collection}/{os.path.splitext(name)[0]}"
+    def changes_since(self, since):
+        """Images ajoutées ou modifiées et noms retirés depuis `since`.
+
+        Retourne (version, {collection: {'added': [images], 'removed': [noms]}}),
+        ou None si le journal ne remonte pas jusque-là.
+        """
+        conn = self.connection()
+        conn.execute('BEGIN')
+        try:
+            version = self._version(conn)
+            changes_from = int(self.get_meta('changes_from') or version)
+            if not changes_from <= since <= version:
+                return None
+            # Dernière opération par image: un ajout puis un retrait = retrait
+            latest = {}
+            for row in conn.execute(
+                "SELECT collection, filename, op FROM changes WHERE version > ? AND op != 'cleared' "
+                "ORDER BY version, rowid",
+                (since,)
+            ):
+                latest[(row['collection'], row['filename'])] = row['op']
+            delta = {}
+            for (collection, filename), op in sorted(latest.items()):
+                entry = delta.setdefault(collection, {'added': [], 'removed': []})
+                row = None
+                if op != 'removed':
+                    row = conn.execute(
+                        'SELECT * FROM images WHERE collection = ? AND filename = ? AND pending = 0',
+                        (collection, filename)
+                    ).fetchone()
+                if row is not None:
+                    entry['added'].append(image_entry(row))
+                else:
+                    entry['removed'].append(filename)
+        finally:
+            conn.execute('COMMIT')
+        return version, delta
+
+    def events_since(self, since, limit=500):
+        """Changements journalisés après `since`, dans l'ordre, par versions entières.
+
+        Retourne (version atteinte, [(version, op, collection, filename, image)])
+        avec au moins `limit` lignes si le journal en a autant, ou None si le
+        journal ne remonte pas jusqu'à `since`. `image` vaut None sauf pour
+        les ajouts et modifications d'images encore présentes.
+        """
+        conn = self.connection()
+        conn.execute('BEGIN')
+        try:
+            version = self._version(conn)
+            changes_from = int(self.get_meta('changes_from') or version)
+            if not changes_from <= since <= version:
+                return None
+            # Jamais de version coupée en deux: l'id SSE est la version
+            last = conn.execute(
+                'SELECT MAX(version) FROM (SELECT version FROM changes WHERE version > ? ORDER BY version LIMIT ?)',
+                (since, limit)
+            ).fetchone()[0]
+            if last is None:
+                return version, []
+            events = []
+            for row in conn.execute(
+                'SELECT version, collection, filename, op FROM changes WHERE version > ? AND version <= ? '
+                'ORDER BY version, rowid',
+                (since, last)
+            ).fetchall():
+                image = None
+                if row['op'] in ('added', 'updated'):
+                    image_row = conn.execute(
+                        'SELECT * FROM images WHERE collection = ? AND filename = ? AND pending = 0',
+                        (row['collection'], row['filename'])
+                    ).fetchone()
+                    if image_row is None:
+                        continue
+                    image = image_entry(image_row)
+                events.append((row['version'], row['op'], row['collection'], row['filename'], image))
+        finally:
+            conn.execute('COMMIT')
+        return last, events
+
+    def load_catalog(self):
+        """Lire (version, {collection: [images]}) dans une même transaction"""
+        with store_load_latency.time():
+            conn = self.connection()
+            conn.execute('BEGIN')
+            try:
+                version = self._version(conn)
+                rows = conn.execute(
+                    'SELECT * FROM images WHERE pending = 0 ORDER BY collection, filename'
+                ).fetchall()
+            finally:
+                conn.execute('COMMIT')
             
-            result = cloudinary.uploader.upload(
-                file,
-                folder=f"rayschic/{collection}",
-                public_id=public_id,
-                overwrite=True,
-                resource_type="auto"
+            catalog = {collection: [] for collection in COLLECTIONS}
+            for row in rows:
+                catalog.setdefault(row['collection'], []).append(image_entry(row))
+            return version, catalog
+
+    def storages(self):
+        """Stockage de chaque image, par (collection, nom de fichier)"""
+        rows = self.connection().execute(
+            'SELECT collection, filename, storage FROM images WHERE pending = 0'
+        ).fetchall()
+        return {(row['collection'], row['filename']): row['storage'] for row in rows}
+
+    def known_files(self, collection):
+        """Lignes existantes d'une collection, par nom de fichier"""
+        rows = self.connection().execute(
+            'SELECT * FROM images WHERE collection = ? AND pending = 0', (collection,)
+        ).fetchall()
+        return {row['filename']: row for row in rows}
+
+    def image_row(self, collection, filename):
+        """Ligne d'une image enregistrée, ou None"""
+        return self.connection().execute(
+            'SELECT * FROM images WHERE collection = ? AND filename = ? AND pending = 0', (collection, filename)
+        ).fetchone()
+
+    def find_duplicate(self, collection, sha256):
+        """Image enregistrée avec ce contenu dans la collection, ou None"""
+        row = self.connection().execute(
+            'SELECT * FROM images WHERE collection = ? AND sha256 = ? AND pending = 0 LIMIT 1', (collection, sha256)
+        ).fetchone()
+        return image_entry(row) if row else None
+
+    def claim(self, collection, sha256, name=None, unknown=()):
+        """Réserver l'upload d'un contenu.
+
+        Retourne (image existante, None) pour un doublon, (None, None) si le
+        même contenu est déjà en cours d'upload, sinon (None, clé réservée).
+        La réservation est une ligne `pending` qui porte l'empreinte: un
+        upload concurrent du même contenu la voit. Avec name, la clé est le
+        nom libre (name, name_1, name_2...), sans sonder le disque; `unknown`
+        écarte en plus des noms trouvés occupés sur le stockage. Sans name
+        (nom choisi par un stockage distant), la clé est PENDING_PREFIX +
+        empreinte. Les réservations plus vieilles que PENDING_CLAIM_TIMEOUT
+        (upload interrompu par un crash) sont libérées au passage.
+        """
+        with self.transaction() as conn:
+            cutoff = datetime.fromtimestamp(time.time() - PENDING_CLAIM_TIMEOUT).isoformat()
+            conn.execute(
+                'DELETE FROM images WHERE collection = ? AND pending = 1 AND updated_at < ?',
+                (collection, cutoff)
             )
+            row = conn.execute(
+                'SELECT * FROM images WHERE collection = ? AND sha256 = ? ORDER BY pending LIMIT 1',
+                (collection, sha256)
+            ).fetchone()
+            if row and row['pending']:
+                return None, None
+            if row:
+                return image_entry(row), None
+            if not name:
+                return None, self._reserve(conn, collection, f"{PENDING_PREFIX}{sha256}", sha256)
             
-            return {
-                'success': True,
-                'storage': 'cloudinary',
-                'url': result['secure_url'],
-                'public_id': result['public_id'],
-                'filename': file.filename,
-                'size': result.get('bytes', 0),
-                'dimensions': f"{result.get('width', 0)}x{result.get('height', 0)}"
+            base_name, ext = os.path.splitext(name)
+            escaped = base_name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            taken = set(unknown) | {
+                r[0] for r in conn.execute(
+                    "SELECT filename FROM images WHERE collection = ? AND (filename = ? OR filename LIKE ? ESCAPE '\\')",
+                    (collection, name, f"{escaped}\\_%")
+                )
             }
-        else:
-            # Utiliser stockage local
-            name = secure_filename(file.filename)
-            upload_path = os.path.join(UPLOAD_FOLDER, collection)
-            os.makedirs(upload_path, exist_ok=True)
-            
-            # Éviter les doublons
             filename = name
             counter = 1
-            base_name, ext = os.path.splitext(name)
-            
-            while os.path.exists(os.path.join(upload_path, filename)):
+            while filename in taken:
                 filename = f"{base_name}_{counter}{ext}"
                 counter += 1
-            
-            # Sauvegarder le fichier
-            file_path = os.path.join(upload_path, filename)
-            file.save(file_path)
-            
-            # Obtenir la taille
-            size = os.path.getsize(file_path)
-            
-            # Pour le local, nous servons les fichiers via une route
-            return {
-                'success': True,
-                'storage': 'local',
-                'url': f'/temp_uploads/{collection}/{filename}',
-                'filename': filename,
-                'size': size,
-                'collection': collection,
-                'public_id': None
+            return None, self._reserve(conn, collection, filename, sha256)
+
+    def _reserve(self, conn, collection, filename, sha256):
+        now = datetime.now().isoformat()
+        conn.execute(
+            "INSERT INTO images (collection, filename, storage, url, sha256, uploaded_at, updated_at, pending) "
+            "VALUES (?, ?, '', '', ?, ?, ?, 1)",
+            (collection, filename, sha256, now, now)
+        )
+        return filename
+
+    def release(self, collection, filename):
+        """Libérer une clé réservée par claim() pour un upload abandonné"""
+        with self.transaction() as conn:
+            conn.execute(
+                'DELETE FROM images WHERE collection = ? AND filename = ? AND pending = 1',
+                (collection, filename)
+            )
+
+    def _upsert(self, conn, collection, record, now):
+        """Écrire une image; retourne 'added' ou 'updated' pour le journal"""
+        existing = conn.execute(
+            'SELECT pending FROM images WHERE collection = ? AND filename = ?',
+            (collection, record['filename'])
+        ).fetchone()
+        conn.execute(
+            '''INSERT INTO images (collection, filename, storage, url, public_id, size, width, height,
+                                   format, frames, sha256, variants, uploaded_at, updated_at, sort_order, pending)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                       (SELECT COALESCE(MAX(sort_order), 0) + 1 FROM images WHERE collection = ?), 0)
+               ON CONFLICT (collection, filename) DO UPDATE SET
+                   storage = excluded.storage, url = excluded.url, public_id = excluded.public_id,
+                   size = excluded.size, width = excluded.width, height = excluded.height,
+                   format = COALESCE(excluded.format, images.format),
+                   frames = COALESCE(excluded.frames, images.frames),
+                   sha256 = excluded.sha256, variants = excluded.variants,
+                   uploaded_at = excluded.uploaded_at, updated_at = excluded.updated_at,
+                   sort_order = CASE WHEN images.pending THEN excluded.sort_order ELSE images.sort_order END,
+                   pending = 0''',
+            (
+                collection, record['filename'], record['storage'], record['url'], record['public_id'],
+                record['size'], record['width'], record['height'], record['format'], record['frames'], record['sha256'],
+                json.dumps(record['variants']), record['uploaded_at'], now, collection
+            )
+        )
+        return 'updated' if existing is not None and not existing['pending'] else 'added'
+
+    def record(self, collection, record, claimed=None):
+        """Enregistrer une image prête; retourne la nouvelle version.
+
+        claimed: clé réservée par claim(), libérée dans la même transaction
+        si l'image est enregistrée sous un autre nom.
+        """
+        with self.transaction() as conn:
+            op = self._upsert(conn, collection, record, datetime.now().isoformat())
+            if claimed and claimed != record['filename']:
+                conn.execute(
+                    'DELETE FROM images WHERE collection = ? AND filename = ? AND pending = 1',
+                    (collection, claimed)
+                )
+            return self._bump(conn, [(collection, record['filename'], op)])
+
+    def update_variants(self, collection, filename, variants):
+        with self.transaction() as conn:
+            conn.execute(
+                'UPDATE images SET variants = ?, updated_at = ? WHERE collection = ? AND filename = ?',
+                (json.dumps(variants), datetime.now().isoformat(), collection, filename)
+            )
+            return self._bump(conn, [(collection, filename, 'updated')])
+
+    def delete_many(self, items, cleared=()):
+        """Supprimer des (collection, filename); retourne la nouvelle version.
+
+        `cleared` liste les (collection, préfixe) vidés en bloc: le journal
+        les note ('cleared', préfixe dans filename) avant les retraits.
+        """
+        with self.transaction() as conn:
+            removed = [(collection, prefix, 'cleared') for collection, prefix in cleared]
+            for collection, filename in items:
+                for name in name_variants(filename):
+                    cursor = conn.execute(
+                        'DELETE FROM images WHERE collection = ? AND filename = ?', (collection, name)
+                    )
+                    if cursor.rowcount:
+                        removed.append((collection, name, 'removed'))
+            return self._bump(conn, removed)
+
+    def replace_collection(self, collection, records):
+        """Remplacer le contenu d'une collection par ce que le stockage contient.
+
+        Seules les images réellement différentes sont réécrites: une relecture
+        sans changement ne fait pas avancer la version.
+        """
+        now = datetime.now().isoformat()
+        with self.transaction() as conn:
+            names = {record['filename'] for record in records}
+            existing = {row['filename']: row for row in conn.execute(
+                'SELECT * FROM images WHERE collection = ? AND pending = 0', (collection,)
+            )}
+            changes = [(collection, name, 'removed') for name in existing if name not in names]
+            conn.executemany(
+                'DELETE FROM images WHERE collection = ? AND filename = ?',
+                [(collection, name) for _, name, _ in changes]
+            )
+            for record in records:
+                row = existing.get(record['filename'])
+                if (row is not None
+                        and all(row[field] == record[field] for field in RECORD_FIELDS)
+                        and json.loads(row['variants']) == record['variants']):
+                    continue
+                changes.append((collection, record['filename'], self._upsert(conn, collection, record, now)))
+            if not changes:
+                return self._version(conn)
+            return self._bump(conn, changes)
+
+metadata_store = MetadataStore(METADATA_DB)
+
+# ========== INDEX DU CATALOGUE EN MÉMOIRE ==========
+
+# Durée de validité de la copie en mémoire avant relecture du magasin (secondes)
+CATALOG_TTL = int(os.environ.get('CATALOG_TTL', 300))
+
+# Tris de /api/images et leur ordre par défaut
+SEARCH_SORTS = {'date': 'desc', 'size': 'desc', 'name': 'asc'}
+# Borne haute des comparaisons de chaînes (préfixe, date de fin)
+SEARCH_MAX_CHAR = '\uffff'
+
+class SearchIndex:
+    """Index secondaires du catalogue pour /api/images.
+
+    Une liste triée de clés (valeur, collection, nom) par tri: nom en
+    minuscules (préfixe), taille, date d'upload; les trigrammes des noms
+    pour la recherche par sous-chaîne. Tenu à jour par CatalogIndex.add
+    et remove_many, reconstruit après un rechargement.
+    """
+
+    def __init__(self, collections, storages, default_storage):
+        self.images = {}
+        self.storages = {}
+        self.sorted = {sort: [] for sort in SEARCH_SORTS}
+        self.trigrams = {}
+        self.default_storage = default_storage
+        for collection, entry in collections.items():
+            for image in entry['images'].values():
+                key = (collection, image['filename'])
+                self._index(key, image, storages.get(key, default_storage), list.append)
+        for keys in self.sorted.values():
+            keys.sort()
+
+    @staticmethod
+    def sort_values(image):
+        return {'date': image['uploaded_at'] or '', 'size': image['size'] or 0, 'name': image['filename'].lower()}
+
+    @staticmethod
+    def name_trigrams(name):
+        name = name.lower()
+        return {name[i:i + 3] for i in range(len(name) - 2)}
+
+    def _index(self, key, image, storage_name, insert):
+        self.images[key] = image
+        self.storages[key] = storage_name
+        for sort, value in self.sort_values(image).items():
+            insert(self.sorted[sort], (value,) + key)
+        for trigram in self.name_trigrams(key[1]):
+            self.trigrams.setdefault(trigram, set()).add(key)
+
+    def add(self, collection, image, storage_name=None):
+        key = (collection, image['filename'])
+        storage_name = storage_name or self.storages.get(key, self.default_storage)
+        self.remove(key)
+        self._index(key, image, storage_name, insort)
+
+    def remove(self, key):
+        image = self.images.pop(key, None)
+        if image is None:
+            return
+        del self.storages[key]
+        for sort, value in self.sort_values(image).items():
+            keys = self.sorted[sort]
+            position = bisect_left(keys, (value,) + key)
+            if position < len(keys) and keys[position][1:] == key:
+                del keys[position]
+            else:
+                # Image modifiée sur place depuis son indexation
+                keys[:] = [entry for entry in keys if entry[1:] != key]
+        for trigram in self.name_trigrams(key[1]):
+            keys = self.trigrams.get(trigram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.trigrams[trigram]
+
+    def _candidates(self, filters, sort):
+        """Clés possibles d'après les index sélectifs (None: tout le catalogue)"""
+        candidates = None
+        text = filters['text']
+        if len(text) >= 3:
+            sets = sorted((self.trigrams.get(trigram, set()) for trigram in self.name_trigrams(text)), key=len)
+            candidates = set(sets[0]).intersection(*sets[1:])
+        if filters['prefix'] and sort != 'name':
+            names = self.sorted['name']
+            lo, hi = self._prefix_bounds(names, filters['prefix'])
+            matches = {entry[1:] for entry in itertools.islice(names, lo, hi)}
+            candidates = matches if candidates is None else candidates & matches
+        return candidates
+
+    @staticmethod
+    def _prefix_bounds(keys, prefix):
+        return bisect_left(keys, (prefix,)), bisect_left(keys, (prefix + SEARCH_MAX_CHAR,))
+
+    def _bounds(self, keys, filters, sort):
+        """Tranche de la liste triée permise par le filtre portant sur le tri"""
+        if sort == 'name' and filters['prefix']:
+            return self._prefix_bounds(keys, filters['prefix'])
+        if sort == 'size':
+            return bisect_left(keys, (filters['min_size'],)), bisect_left(keys, (filters['max_size'] + 1,))
+        if sort == 'date':
+            return bisect_left(keys, (filters['date_from'],)), bisect_left(keys, (filters['date_to'],))
+        return 0, len(keys)
+
+    def _matches(self, key, filters):
+        image = self.images[key]
+        name = key[1].lower()
+        return (
+            (filters['collections'] is None or key[0] in filters['collections'])
+            and (filters['storage'] is None or self.storages[key] == filters['storage'])
+            and name.startswith(filters['prefix'])
+            and filters['text'] in name
+            and filters['min_size'] <= (image['size'] or 0) <= filters['max_size']
+            and filters['date_from'] <= (image['uploaded_at'] or '') < filters['date_to']
+        )
+
+    def query(self, filters, sort, descending, limit, cursor=None):
+        """Retourner (clés triées de la page, dernière clé si d'autres suivent)"""
+        keys = self.sorted[sort]
+        candidates = self._candidates(filters, sort)
+        if candidates is not None:
+            # Peu de candidats: les trier plutôt que parcourir tout l'index
+            keys = sorted((self.sort_values(self.images[key])[sort],) + key for key in candidates)
+        lo, hi = self._bounds(keys, filters, sort)
+        if cursor is not None:
+            if descending:
+                hi = min(hi, bisect_left(keys, cursor))
+            else:
+                lo = max(lo, bisect_right(keys, cursor))
+        page = []
+        for position in (range(hi - 1, lo - 1, -1) if descending else range(lo, hi)):
+            entry = keys[position]
+            if self._matches(entry[1:], filters):
+                if len(page) == limit:
+                    return page, page[-1]
+                page.append(entry)
+        return page, None
+
+class CatalogIndex:
+    """Copie en mémoire du magasin de métadonnées, mise à jour sur place.
+
+    Chaque worker garde sa propre copie. Elle est à jour tant que la
+    version du magasin n'a avancé que par ses propres écritures; sinon
+    elle est relue au prochain accès.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.collections = None
+        self.loaded_at = 0
+        self.version = None
+        self.updated_at = None
+        self._snapshot = None
+        self._search = None
+
+    def _is_fresh(self):
+        if self.collections is None:
+            return False
+        if time.monotonic() - self.loaded_at > self.ttl:
+            return False
+        return self.version == metadata_store.version()
+
+    def _reload(self):
+        ensure_reconciled()
+        version, catalog = metadata_store.load_catalog()
+        collections = {}
+        for key in COLLECTIONS:
+            images = {image['filename']: image for image in catalog.get(key, [])}
+            collections[key] = {
+                'title': COLLECTION_TITLES.get(key, key),
+                'storage': storage.name,
+                'images': images,
+                'names': sorted(images)
             }
-            
-    except Exception as e:
-        print(f"Erreur upload: {e}")
-        return {'success': False, 'error': str(e)}
+        self.collections = collections
+        self.version = version
+        self.updated_at = None
+        self._snapshot = None
+        self._search = None
+        self.loaded_at = time.monotonic()
 
-def delete_image(collection, filename):
-    """Supprimer une image"""
-    try:
-        if CLOUDINARY_ENABLED:
-            # Supprimer de Cloudinary
-            name = secure_filename(filename)
-            name_without_ext = os.path.splitext(name)[0]
-            public_id = f"rayschic/{collection}/{name_without_ext}"
-            
-            result = cloudinary.uploader.destroy(public_id)
-            return {'success': True, 'storage': 'cloudinary'}
+    def _ensure_fresh(self, force_refresh=False):
+        if force_refresh:
+            # Rattraper les écarts avec le stockage (fichiers ou Cloudinary)
+            catalog_cache_total.inc(result='refresh')
+            reconcile()
+        if force_refresh or not self._is_fresh():
+            if not force_refresh:
+                catalog_cache_total.inc(result='reload')
+            self._reload()
         else:
-            # Supprimer du local
-            safe_filename = secure_filename(filename)
-            file_path = os.path.join(UPLOAD_FOLDER, collection, safe_filename)
-            
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                return {'success': True, 'storage': 'local'}
-            else:
-                return {'success': False, 'error': 'Fichier non trouvé'}
-                
-    except Exception as e:
-        print(f"Erreur delete: {e}")
-        return {'success': False, 'error': str(e)}
+            catalog_cache_total.inc(result='hit')
 
-def list_images():
-    """Lister toutes les images"""
-    collections_data = {}
-    total_images = 0
-    
-    if CLOUDINARY_ENABLED:
-        # Lister depuis Cloudinary
-        for collection in COLLECTIONS:
-            try:
-                result = cloudinary.api.resources(
-                    type="upload",
-                    prefix=f"rayschic/{collection}/",
-                    max_results=100
-                )
-                
-                images = []
-                for resource in result.get('resources', []):
-                    images.append({
-                        'filename': os.path.basename(resource['public_id']),
-                        'url': resource['secure_url'],
-                        'size': resource.get('bytes', 0),
-                        'public_id': resource['public_id'],
-                        'dimensions': f"{resource.get('width', 0)}x{resource.get('height', 0)}",
-                        'uploaded_at': resource.get('created_at', '')
-                    })
-                
-                collections_data[collection] = {
-                    'title': COLLECTION_TITLES.get(collection, collection),
-                    'images': images,
-                    'count': len(images),
-                    'storage': 'cloudinary'
-                }
-                total_images += len(images)
-                
-            except Exception as e:
-                print(f"Erreur listing {collection}: {e}")
-                collections_data[collection] = {
-                    'title': COLLECTION_TITLES.get(collection, collection),
-                    'images': [],
-                    'count': 0,
-                    'storage': 'error'
-                }
-    else:
-        # Lister depuis le local
-        for collection in COLLECTIONS:
-            collection_path = os.path.join(UPLOAD_FOLDER, collection)
-            images = []
-            
-            if os.path.exists(collection_path):
-                for filename in os.listdir(collection_path):
-                    filepath = os.path.join(collection_path, filename)
-                    if os.path.isfile(filepath):
-                        try:
-                            size = os.path.getsize(filepath)
-                            images.append({
-                                'filename': filename,
-                                'url': f'/temp_uploads/{collection}/{filename}',
-                                'size': size,
-                                'public_id': None,
-                                'uploaded_at': datetime.fromtimestamp(os.path.getctime(filepath)).isoformat()
-                            })
-                        except:
-                            continue
-            
-            collections_data[collection] = {
-                'title': COLLECTION_TITLES.get(collection, collection),
+    def invalidate(self):
+        with self.lock:
+            self.collections = None
+
+    def _last_updated(self):
+        # Date de la dernière écriture: stable tant que la version ne bouge pas
+        if self.updated_at is None:
+            self.updated_at = metadata_store.get_meta('updated_at') or ''
+        return self.updated_at
+
+    def stamp(self, force_refresh=False):
+        """Retourner (version, last_updated) de la copie, rafraîchie si besoin"""
+        with self.lock:
+            self._ensure_fresh(force_refresh)
+            return self.version, self._last_updated()
+
+    def get(self, force_refresh=False):
+        """Retourner le catalogue au format de list_images()"""
+        with self.lock:
+            self._ensure_fresh(force_refresh)
+            if self._snapshot is None:
+                self._snapshot = self._build_snapshot()
+            snapshot = self._snapshot
+            version, last_updated = self.version, self._last_updated()
+        return {
+            'collections': snapshot,
+            'stats': {
+                'total_images': sum(c['count'] for c in snapshot.values()),
+                'collections_count': len(snapshot),
+                'storage': storage.name,
+                'version': version,
+                'last_updated': last_updated
+            }
+        }
+
+    def page(self, collection, limit, cursor=None, force_refresh=False):
+        """Retourner une page d'images triées par nom et le curseur suivant"""
+        with self.lock:
+            self._ensure_fresh(force_refresh)
+            entry = self.collections[collection]
+            names = entry['names']
+            start = bisect_right(names, cursor) if cursor else 0
+            chunk = names[start:start + limit]
+            images = [entry['images'][name] for name in chunk]
+            next_cursor = chunk[-1] if start + limit < len(names) else None
+            return images, next_cursor, entry['storage']
+
+    def search(self, filters, sort, descending, limit, cursor=None):
+        """Retourner (images de la page, clé de curseur suivante, version)"""
+        with self.lock:
+            self._ensure_fresh()
+            if self._search is None:
+                self._search = SearchIndex(self.collections, metadata_store.storages(), storage.name)
+            search = self._search
+            entries, next_key = search.query(filters, sort, descending, limit, cursor)
+            images = [
+                dict(search.images[entry[1:]], collection=entry[1], storage=search.storages[entry[1:]])
+                for entry in entries
+            ]
+            return images, next_key, self.version
+
+    def _build_snapshot(self):
+        snapshot = {}
+        for key, collection in self.collections.items():
+            images = [collection['images'][name] for name in collection['names']]
+            snapshot[key] = {
+                'title': collection['title'],
                 'images': images,
                 'count': len(images),
-                'storage': 'local'
+                'storage': collection['storage']
             }
-            total_images += len(images)
+        return snapshot
+
+    def _mutate(self, apply, version):
+        """Appliquer une écriture du magasin si elle est la seule depuis la lecture"""
+        with self.lock:
+            if self.collections is not None and self.version == version - 1:
+                apply(self.collections)
+                self._snapshot = None
+                self.version = version
+                self.updated_at = None
+            else:
+                self.collections = None
+
+    def add(self, collection, image, version, storage_name=None):
+        def apply(collections):
+            if collection in collections:
+                entry = collections[collection]
+                if image['filename'] not in entry['images']:
+                    insort(entry['names'], image['filename'])
+                entry['images'][image['filename']] = image
+                if self._search is not None:
+                    self._search.add(collection, image, storage_name)
+        self._mutate(apply, version)
+
+    def remove_many(self, items, version):
+        """Retirer plusieurs (collection, filename) supprimés en une écriture"""
+        def apply(collections):
+            for collection, filename in items:
+                if collection not in collections:
+                    continue
+                entry = collections[collection]
+                for name in name_variants(filename):
+                    if entry['images'].pop(name, None) is not None:
+                        del entry['names'][bisect_right(entry['names'], name) - 1]
+                        if self._search is not None:
+                            self._search.remove((collection, name))
+        self._mutate(apply, version)
+
+catalog_index = CatalogIndex(CATALOG_TTL)
+
+def forget_images(items, cleared=()):
+    """Retirer des images supprimées du magasin et du cache, en une écriture"""
+    if items:
+        catalog_index.remove_many(items, metadata_store.delete_many(items, cleared))
+        snapshot_publisher.schedule()
+
+# ========== DÉRIVÉS D'IMAGES (MINIATURES, WEBP/AVIF) ==========
+
+# Largeur maximale de chaque taille dérivée (pas d'agrandissement)
+VARIANT_SIZES = {'thumbnail': 320, 'medium': 800, 'large': 1600}
+
+# Formats dérivés; en local, seuls ceux que Pillow sait écrire sont produits
+VARIANT_FORMATS = [f for f in os.environ.get('VARIANT_FORMATS', 'webp,avif').split(',') if f]
+VARIANT_QUALITY = int(os.environ.get('VARIANT_QUALITY', 80))
+
+# Sous-dossier des dérivés dans chaque collection (ignoré par les listings)
+VARIANTS_DIRNAME = '_variants'
+
+VARIANT_WORKERS = int(os.environ.get('VARIANT_WORKERS', 2))
+variant_executor = ThreadPoolExecutor(max_workers=VARIANT_WORKERS, thread_name_prefix='variants')
+
+# Pillow est optionnel (sans lui, pas de dérivés générés en local) et
+# n'est importé qu'à la première image locale
+pillow_modules = None
+pillow_formats = None
+pillow_lock = threading.Lock()
+
+def pillow():
+    """(Image, ImageOps) importés au premier appel, ou None sans Pillow"""
+    global pillow_modules, pillow_formats
+    if pillow_formats is None:
+        with pillow_lock:
+            if pillow_formats is None:
+                try:
+                    from PIL import Image, ImageOps
+                except ImportError:
+                    pillow_formats = []
+                else:
+                    Image.init()
+                    # Même limite que le sondage à l'upload
+                    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+                    pillow_modules = (Image, ImageOps)
+                    pillow_formats = [fmt for fmt in VARIANT_FORMATS if fmt.upper() in Image.SAVE]
+    return pillow_modules
+
+def local_variant_formats():
+    """Formats dérivés que Pillow peut écrire sur cette machine"""
+    pillow()
+    return pillow_formats
+
+def local_file_url(collection, filename, sha256=None):
+    """URL d'un original local; ?v= (empreinte du contenu) permet le cache immuable"""
+    url = f'/temp_uploads/{collection}/{filename}'
+    return f'{url}?v={sha256[:VERSION_MIN_LENGTH]}' if sha256 else url
+
+def local_variants(collection, filename, sha256=None):
+    """Map des URLs dérivées locales {taille: {format: url}}"""
+    base_url = f'/temp_uploads/{collection}/{VARIANTS_DIRNAME}/{filename}'
+    # Les dérivés portent l'empreinte de leur original
+    version = f'?v={sha256[:VERSION_MIN_LENGTH]}' if sha256 else ''
+    return {
+        size: {fmt: f'{base_url}/{size}.{fmt}{version}' for fmt in local_variant_formats()}
+        for size in VARIANT_SIZES
+    }
+
+def cloudinary_variants(public_id):
+    """Map des URLs Cloudinary correspondant aux transformations eager"""
+    return {
+        size: {
+            fmt: cloudinary_sdk().utils.cloudinary_url(public_id, width=width, crop='limit', format=fmt, secure=True)[0]
+            for fmt in VARIANT_FORMATS
+        }
+        for size, width in VARIANT_SIZES.items()
+    }
+
+def cloudinary_eager_transformations():
+    """Transformations générées par Cloudinary dès l'upload"""
+    return [
+        {'width': width, 'crop': 'limit', 'format': fmt}
+        for width in VARIANT_SIZES.values()
+        for fmt in VARIANT_FORMATS
+    ]
+
+def generate_variants(collection, filename):
+    """Générer les dérivés d'une image locale.
+
+    Les fichiers sont écrits dans un dossier temporaire renommé d'un bloc:
+    un dossier de dérivés présent est toujours complet.
+    """
+    formats = local_variant_formats()
+    if not formats:
+        return False
+    Image, ImageOps = pillow()
+    
+    variants_root = os.path.join(UPLOAD_FOLDER, collection, VARIANTS_DIRNAME)
+    tmp_dir = os.path.join(variants_root, f'.tmp-{filename}-{os.getpid()}-{threading.get_ident()}')
+    os.makedirs(tmp_dir, exist_ok=True)
+    
+    try:
+        with Image.open(os.path.join(UPLOAD_FOLDER, collection, filename)) as img:
+            if getattr(img, 'is_animated', False):
+                # Les animations gardent leur original
+                return False
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+            
+            for size, width in VARIANT_SIZES.items():
+                resized = img.copy()
+                resized.thumbnail((width, width * 4))
+                for fmt in formats:
+                    resized.save(os.path.join(tmp_dir, f'{size}.{fmt}'), fmt.upper(), quality=VARIANT_QUALITY)
+        
+        final_dir = os.path.join(variants_root, filename)
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(tmp_dir, final_dir)
+        return True
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def schedule_variants(collection, image):
+    """Lancer la génération des dérivés hors du thread de la requête"""
+    if pillow() is None:
+        return
+    
+    def run():
+        try:
+            if generate_variants(collection, image['filename']):
+                row = metadata_store.image_row(collection, image['filename'])
+                variants = local_variants(collection, image['filename'], row and row['sha256'])
+                version = metadata_store.update_variants(collection, image['filename'], variants)
+                catalog_index.add(collection, dict(image, variants=variants), version)
+                snapshot_publisher.schedule()
+        except Exception as e:
+            print(f"Erreur dérivés {collection}/{image['filename']}: {e}")
+    
+    variant_executor.submit(run)
+
+def remove_variants(collection, filename):
+    """Supprimer les dérivés locaux d'une image"""
+    shutil.rmtree(os.path.join(UPLOAD_FOLDER, collection, VARIANTS_DIRNAME, filename), ignore_errors=True)
+
+# ========== BACKENDS DE STOCKAGE ==========
+
+class StorageBackend:
+    """Interface commune des stockages d'images.
+
+    put() écrit un fichier et retourne l'enregistrement du magasin;
+    delete_many() et clear() retournent un statut par image
+    ({'collection', 'filename', 'status'[, 'error']}); scan() relit le
+    stockage ({collection: enregistrements, ou None en cas d'erreur}).
+
+    unique_names: le backend ne remplace jamais un fichier, le nom libre
+    est réservé dans le magasin avant put(). remote: les écritures passent
+    par le réseau (file d'attente possible).
+    """
+    name = None
+    unique_names = False
+    remote = False
+
+    def put(self, collection, source, filename, sha256, public_id=None):
+        """source: chemin d'un fichier sur disque ou FileStorage"""
+        raise NotImplementedError
+
+    def delete_many(self, collection, names):
+        raise NotImplementedError
+
+    def clear(self, collection, prefix=''):
+        raise NotImplementedError
+
+    def scan(self, collections):
+        raise NotImplementedError
+
+    def after_put(self, collection, image):
+        """Travail différé après l'enregistrement (dérivés locaux...)"""
+
+class LocalBackend(StorageBackend):
+    """Fichiers dans temp_uploads/<collection>/, servis par /temp_uploads"""
+    name = 'local'
+    unique_names = True
+
+    def __init__(self, root):
+        self.root = root
+
+    def put(self, collection, source, filename, sha256, public_id=None):
+        upload_path = os.path.join(self.root, collection)
+        os.makedirs(upload_path, exist_ok=True)
+        
+        # Un fichier reçu en streaming est juste renommé. Jamais de
+        # remplacement: un fichier inconnu du magasin lève FileExistsError
+        file_path = os.path.join(upload_path, filename)
+        if isinstance(source, str):
+            with open(file_path, 'xb') as dest:
+                copy_file_into(source, dest)
+        elif isinstance(source.stream, StagedUpload):
+            source.stream.commit(file_path, replace=False)
+        else:
+            with open(file_path, 'xb') as dest:
+                source.save(dest)
+        
+        return {
+            'filename': filename,
+            'storage': 'local',
+            'url': local_file_url(collection, filename, sha256),
+            'public_id': None,
+            'size': os.path.getsize(file_path),
+            'width': None,
+            'height': None,
+            'format': None,
+            'frames': None,
+            'sha256': sha256,
+            'variants': {},
+            'uploaded_at': datetime.now().isoformat()
+        }
+
+    def after_put(self, collection, image):
+        schedule_variants(collection, image)
+
+    def delete_many(self, collection, names):
+        # Un seul parcours du dossier pour tout le lot
+        results = []
+        collection_path = os.path.join(self.root, collection)
+        existing = set()
+        if os.path.isdir(collection_path):
+            with os.scandir(collection_path) as entries:
+                existing = {entry.name for entry in entries if entry.is_file()}
+        for name in names:
+            if name not in existing:
+                results.append({'collection': collection, 'filename': name, 'status': 'not_found'})
+                continue
+            try:
+                os.remove(os.path.join(collection_path, name))
+                remove_variants(collection, name)
+                existing.discard(name)
+                results.append({'collection': collection, 'filename': name, 'status': 'deleted'})
+            except OSError as e:
+                results.append({'collection': collection, 'filename': name, 'status': 'error', 'error': str(e)})
+        return results
+
+    def clear(self, collection, prefix=''):
+        results = []
+        collection_path = os.path.join(self.root, collection)
+        if os.path.isdir(collection_path):
+            with os.scandir(collection_path) as entries:
+                for entry in entries:
+                    if not entry.is_file() or not entry.name.startswith(prefix):
+                        continue
+                    try:
+                        os.remove(entry.path)
+                        remove_variants(collection, entry.name)
+                        results.append({'collection': collection, 'filename': entry.name, 'status': 'deleted'})
+                    except OSError as e:
+                        results.append({'collection': collection, 'filename': entry.name, 'status': 'error', 'error': str(e)})
+        return results
+
+    def scan(self, collections):
+        return {collection: scan_local_collection(collection) for collection in collections}
+
+# Nombre maximal de public_ids par appel delete_resources
+CLOUDINARY_DELETE_BATCH = 100
+
+def destroy_status(result):
+    """Statut de delete_many ('deleted', 'not_found', 'error') d'une réponse de destroy"""
+    outcome = result.get('result')
+    if outcome == 'ok':
+        return {'status': 'deleted'}
+    if outcome == 'not found':
+        return {'status': 'not_found'}
+    return {'status': 'error', 'error': f"Cloudinary destroy: {outcome or result}"}
+
+class CloudinaryBackend(StorageBackend):
+    """Images sous rayschic/<collection>/ chez Cloudinary (un nom = un public_id)"""
+    name = 'cloudinary'
+    remote = True
+
+    def put(self, collection, source, filename, sha256, public_id=None):
+        uploader = cloudinary_sdk().uploader
+        # Fichier sur disque: envoi par morceaux, mémoire bornée
+        if isinstance(source, str):
+            upload, payload = uploader.upload_large, source
+        elif isinstance(source.stream, StagedUpload):
+            upload, payload = uploader.upload_large, source.stream.path
+        else:
+            upload, payload = uploader.upload, source
+        with track_cloudinary('upload'):
+            result = upload(payload, **cloudinary_upload_options(collection, filename, sha256, public_id))
+        return cloudinary_record(result, sha256)
+
+    def delete_many(self, collection, names):
+        public_ids = {collection_public_id(collection, name): name for name in names}
+        if len(public_ids) == 1:
+            # Une seule image: API d'upload, sans quota horaire de l'API Admin
+            public_id = next(iter(public_ids))
+            with track_cloudinary('destroy'):
+                result = cloudinary_sdk().uploader.destroy(public_id)
+            return [dict(destroy_status(result), collection=collection, filename=public_ids[public_id])]
+        
+        ids = list(public_ids)
+        statuses = {}
+        for start in range(0, len(ids), CLOUDINARY_DELETE_BATCH):
+            with track_cloudinary('delete_resources'):
+                result = cloudinary_sdk().api.delete_resources(ids[start:start + CLOUDINARY_DELETE_BATCH])
+            statuses.update(result.get('deleted', {}))
+        return [
+            {'collection': collection, 'filename': name, 'status': statuses.get(public_id, 'not_found')}
+            for public_id, name in public_ids.items()
+        ]
+
+    def clear(self, collection, prefix=''):
+        results = []
+        # delete_resources_by_prefix supprime par tranches: relancer tant que 'partial'
+        while True:
+            with track_cloudinary('delete_resources_by_prefix'):
+                result = cloudinary_sdk().api.delete_resources_by_prefix(f"rayschic/{collection}/{prefix}")
+            for public_id, status in result.get('deleted', {}).items():
+                results.append({'collection': collection, 'filename': os.path.basename(public_id), 'status': status})
+            if not result.get('partial'):
+                return results
+
+    def scan(self, collections):
+        # Une requête par collection, en parallèle
+        results = fan_out_collections(list_cloudinary_collection, collections)
+        return {collection: records for collection, (records, error) in results.items()}
+
+    def fetch(self, collection, filename, dest):
+        """Copier l'original d'une image dans le fichier ouvert dest"""
+        url = cloudinary_sdk().utils.cloudinary_url(collection_public_id(collection, filename), secure=True)[0]
+        response = cloudinary_http.request('GET', url, preload_content=False)
+        try:
+            if response.status != 200:
+                raise FileNotFoundError(f"{url}: HTTP {response.status}")
+            for chunk in response.stream(1024 * 1024):
+                dest.write(chunk)
+        finally:
+            response.release_conn()
+
+# Mode mixte: collections servies depuis le cache disque, et sa taille
+TIERED_COLLECTIONS = [c for c in os.environ.get('TIERED_COLLECTIONS', 'hero,costumes').split(',') if c]
+TIERED_CACHE_DIR = os.environ.get('TIERED_CACHE_DIR', os.path.join(UPLOAD_FOLDER, '.cache'))
+TIERED_CACHE_MAX_BYTES = int(os.environ.get('TIERED_CACHE_MAX_MB', 512)) * 1024 * 1024
+
+class DiskLRUCache:
+    """Cache disque borné en taille, éviction du moins récemment servi.
+
+    La récence est la date de modification du fichier (touchée à chaque
+    accès): elle est partagée par tous les workers sans index commun.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.fetch_locks = {}
+        self.total = None
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, collection, filename):
+        return os.path.join(self.root, collection, filename)
+
+    def get(self, collection, filename):
+        path = self.path(collection, filename)
+        try:
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return path
+
+    def put(self, collection, filename, write):
+        """Écrire une entrée via write(fichier), atomiquement"""
+        path = self.path(collection, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        with self.lock:
+            if self.total is not None:
+                self.total += size
+            full = self.total is None or self.total > self.max_bytes
+        if full:
+            self.trim()
+        return path
+
+    def fetch(self, collection, filename, write):
+        """get(), sinon remplir l'entrée une seule fois pour ce processus"""
+        path = self.get(collection, filename)
+        if path:
+            return path
+        key = (collection, filename)
+        with self.lock:
+            fetch_lock = self.fetch_locks.setdefault(key, threading.Lock())
+        with fetch_lock:
+            try:
+                path = self.path(collection, filename)
+                if os.path.isfile(path):
+                    return path
+                return self.put(collection, filename, write)
+            finally:
+                with self.lock:
+                    self.fetch_locks.pop(key, None)
+
+    def evict(self, collection, filename):
+        try:
+            os.remove(self.path(collection, filename))
+        except OSError:
+            pass
+
+    def trim(self):
+        """Recompter le cache sur disque et supprimer les plus anciens au-delà de la limite"""
+        entries = []
+        if os.path.isdir(self.root):
+            for collection in os.listdir(self.root):
+                collection_path = os.path.join(self.root, collection)
+                if not os.path.isdir(collection_path):
+                    continue
+                with os.scandir(collection_path) as files:
+                    for entry in files:
+                        if entry.is_file() and not entry.name.endswith('.tmp'):
+                            try:
+                                stat = entry.stat()
+                            except OSError:
+                                continue
+                            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in entries)
+        # Descendre à 90% pour ne pas relancer le tri à chaque ajout
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+        with self.lock:
+            self.total = total
+
+class TieredBackend(StorageBackend):
+    """Cloudinary pour les écritures, cache disque LRU pour les originaux chauds.
+
+    Les images des collections `cached` ont une URL /media/... servie
+    depuis le cache; un défaut de cache télécharge l'original une fois.
+    """
+    name = 'tiered'
+    remote = True
+
+    def __init__(self, origin, cache, cached):
+        # Backend distant d'origine; `remote` reste le drapeau de classe
+        self.origin = origin
+        self.cache = cache
+        self.cached = set(cached)
+
+    def local_record(self, collection, record):
+        if collection in self.cached:
+            record = dict(record, url=f"/media/{collection}/{record['filename']}")
+        return record
+
+    def put(self, collection, source, filename, sha256, public_id=None):
+        record = self.origin.put(collection, source, filename, sha256, public_id)
+        if collection in self.cached:
+            # Écriture traversante: l'image vient d'être reçue, le cache est chaud
+            try:
+                path = source if isinstance(source, str) else getattr(source.stream, 'path', None)
+                if path:
+                    self.cache.put(collection, record['filename'], lambda f: copy_file_into(path, f))
+            except OSError as e:
+                print(f"Erreur cache {collection}/{record['filename']}: {e}")
+        return self.local_record(collection, record)
+
+    def delete_many(self, collection, names):
+        results = self.origin.delete_many(collection, names)
+        for result in results:
+            self.cache.evict(collection, result['filename'])
+        return results
+
+    def clear(self, collection, prefix=''):
+        results = self.origin.clear(collection, prefix)
+        for result in results:
+            self.cache.evict(collection, result['filename'])
+        return results
+
+    def scan(self, collections):
+        return {
+            collection: None if records is None else [self.local_record(collection, r) for r in records]
+            for collection, records in self.origin.scan(collections).items()
+        }
+
+    def open(self, collection, filename):
+        """Chemin de l'original dans le cache, téléchargé au besoin (None si absent)"""
+        if collection not in self.cached:
+            return None
+        try:
+            return self.cache.fetch(
+                collection, filename,
+                lambda f: self.origin.fetch(collection, filename, f)
+            )
+        except FileNotFoundError:
+            return None
+
+def copy_file_into(path, dest):
+    with open(path, 'rb') as src:
+        shutil.copyfileobj(src, dest, 1024 * 1024)
+
+# local, cloudinary ou tiered (défaut: cloudinary si configuré)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', '').lower()
+
+def make_storage():
+    backend = STORAGE_BACKEND or ('cloudinary' if CLOUDINARY_ENABLED else 'local')
+    if backend in ('cloudinary', 'tiered') and not CLOUDINARY_ENABLED:
+        print(f"⚠️ STORAGE_BACKEND={backend} sans Cloudinary configuré: stockage local")
+        backend = 'local'
+    if backend == 'tiered':
+        return TieredBackend(
+            CloudinaryBackend(),
+            DiskLRUCache(TIERED_CACHE_DIR, TIERED_CACHE_MAX_BYTES),
+            TIERED_COLLECTIONS
+        )
+    if backend == 'cloudinary':
+        return CloudinaryBackend()
+    return LocalBackend(UPLOAD_FOLDER)
+
+storage = make_storage()
+
+def media_cache_stats():
+    cache = getattr(storage, 'cache', None)
+    if cache is None:
+        return []
+    return [({'result': 'hit'}, cache.hits), ({'result': 'miss'}, cache.misses)]
+
+callback_metric(
+    'rayschic_media_cache_total', 'Accès au cache disque des originaux (mode tiered)', 'counter', media_cache_stats
+)
+
+# ========== FONCTIONS DE GESTION DES IMAGES ==========
+
+def upload_image(file, collection, public_id=None):
+    """Upload une image vers le stockage configuré.
+
+    Un contenu déjà présent dans la collection n'est pas retransféré: l'image
+    existante est retournée avec 'duplicate': True.
+    """
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        # Un magasin vide (mise à jour, changement de stockage) ne connaît
+        # pas encore les fichiers présents: les noms libres seraient faux
+        ensure_reconciled()
+        sha256 = upload_sha256(file)
+        # Avant put(): un upload local est renommé à sa place définitive
+        info = probe_upload(file)
+
+        # Doublon de contenu, sinon upload réservé dans le magasin (nom libre
+        # pour un backend à noms uniques)
+        name = secure_filename(file.filename) if storage.unique_names else None
+        unknown = set()
+        while True:
+            existing, key = claim_upload(collection, sha256, name, unknown)
+            if existing:
+                outcome = 'duplicate'
+                return duplicate_result(existing, storage.name, collection)
+            filename = key if storage.unique_names else file.filename
+            try:
+                record = dict(storage.put(collection, file, filename, sha256, public_id), **info)
+                break
+            except FileExistsError:
+                # Fichier présent sur disque mais absent du magasin: nom suivant
+                metadata_store.release(collection, key)
+                unknown.add(key)
+            except Exception:
+                metadata_store.release(collection, key)
+                raise
+        outcome = 'stored'
+        upload_bytes.observe(record['size'], storage=storage.name)
+        return store_upload(collection, record, claimed=key)
+            
+    except Exception as e:
+        print(f"Erreur upload: {e}")
+        return {'success': False, 'error': str(e)}
+    finally:
+        upload_latency.observe(time.perf_counter() - start, storage=storage.name, result=outcome)
+
+def claim_upload(collection, sha256, name=None, unknown=()):
+    """metadata_store.claim() qui attend la fin d'un upload identique en cours.
+
+    L'image transférée par l'autre requête est alors retournée comme
+    doublon: un seul transfert par contenu, même en parallèle.
+    """
+    deadline = time.monotonic() + PENDING_CLAIM_WAIT
+    while True:
+        existing, key = metadata_store.claim(collection, sha256, name, unknown)
+        if existing or key:
+            return existing, key
+        if time.monotonic() >= deadline:
+            raise RuntimeError('Upload du même contenu déjà en cours')
+        time.sleep(0.1)
+
+def store_upload(collection, record, claimed=None):
+    """Enregistrer une image écrite dans le magasin et l'index; résultat d'upload.
+
+    claimed: clé réservée par claim_upload(), libérée à l'enregistrement.
+    """
+    image = image_entry(record)
+    catalog_index.add(collection, image, metadata_store.record(collection, record, claimed), record['storage'])
+    snapshot_publisher.schedule()
+    storage.after_put(collection, image)
+    
+    return {
+        'success': True,
+        'storage': storage.name,
+        'url': record['url'],
+        'public_id': record['public_id'],
+        'filename': record['filename'],
+        'size': record['size'],
+        'collection': collection,
+        'dimensions': image.get('dimensions', ''),
+        'variants': image['variants']
+    }
+
+def cloudinary_upload_options(collection, filename, sha256, public_id=None):
+    """Options d'upload Cloudinary d'une image de collection"""
+    if not public_id:
+        name = secure_filename(filename)
+        public_id = collection_public_id(collection, name)
+    
+    return {
+        'filename': filename,
+        'chunk_size': CLOUDINARY_CHUNK_SIZE,
+        'folder': f"rayschic/{collection}",
+        'public_id': public_id,
+        'overwrite': True,
+        'resource_type': "auto",
+        'eager': cloudinary_eager_transformations(),
+        'eager_async': True,
+        'context': {'sha256': sha256}
+    }
+
+def record_cloudinary_upload(collection, result, sha256, info=None, claimed=None):
+    """Enregistrer une réponse d'upload Cloudinary (client async)"""
+    return store_upload(collection, dict(cloudinary_record(result, sha256), **(info or {})), claimed)
+
+def duplicate_result(image, storage, collection):
+    """Résultat d'upload pour un contenu déjà présent"""
+    return {
+        'success': True,
+        'duplicate': True,
+        'storage': storage,
+        'url': image['url'],
+        'public_id': image.get('public_id'),
+        'filename': image['filename'],
+        'size': image['size'],
+        'collection': collection,
+        'dimensions': image.get('dimensions', ''),
+        'variants': image.get('variants', {})
+    }
+
+def collection_public_id(collection, filename):
+    """public_id Cloudinary d'une image de collection (nom sans extension)"""
+    return f"rayschic/{collection}/{os.path.splitext(filename)[0]}"
+
+def check_collection(collection):
+    """Refuser une collection inconnue: le nom sert de chemin (LocalBackend)
+    et de dossier Cloudinary"""
+    if collection not in COLLECTIONS:
+        raise ValueError(f'Collection invalide: {collection}')
+
+def delete_image(collection, filename):
+    """Supprimer une image"""
+    try:
+        check_collection(collection)
+        name = secure_filename(filename)
+        result = storage.delete_many(collection, [name])[0]
+        
+        if result['status'] == 'error':
+            return {'success': False, 'error': result['error']}
+        if result['status'] == 'not_found' and not storage.remote:
+            return {'success': False, 'error': 'Fichier non trouvé'}
+        
+        forget_images([(collection, name)])
+        return {'success': True, 'storage': storage.name}
+                
+    except Exception as e:
+        print(f"Erreur delete: {e}")
+        return {'success': False, 'error': str(e)}
+
+def delete_images(items):
+    """Supprimer une liste de (collection, filename) en lot.
+
+    Un appel du backend par collection (Cloudinary: delete_resources par
+    tranche de 100). Le cache du catalogue est mis à jour une seule fois.
+    Retourne un statut par image.
+    """
+    results = []
+    by_collection = {}
+    for collection, filename in items:
+        by_collection.setdefault(collection, []).append(secure_filename(filename))
+    
+    for collection, names in by_collection.items():
+        try:
+            check_collection(collection)
+            results.extend(storage.delete_many(collection, names))
+        except Exception as e:
+            print(f"Erreur delete lot {collection}: {e}")
+            results.extend(
+                {'collection': collection, 'filename': name, 'status': 'error', 'error': str(e)}
+                for name in names
+            )
+    
+    forget_images([(r['collection'], r['filename']) for r in results if r['status'] == 'deleted'])
+    return results
+
+def clear_collection(collection, prefix=''):
+    """Vider une collection, ou seulement les fichiers commençant par prefix"""
+    check_collection(collection)
+    results = storage.clear(collection, prefix)
+    forget_images(
+        [(collection, r['filename']) for r in results if r['status'] == 'deleted'],
+        cleared=[(collection, prefix)]
+    )
+    return results
+
+def cloudinary_record(resource, sha256=None):
+    """Convertir une ressource Cloudinary en enregistrement du magasin.
+
+    L'empreinte est celle gardée dans le contexte Cloudinary à l'upload.
+    """
+    return {
+        'filename': os.path.basename(resource['public_id']),
+        'storage': 'cloudinary',
+        'url': resource['secure_url'],
+        'public_id': resource['public_id'],
+        'size': resource.get('bytes', 0),
+        'width': resource.get('width', 0),
+        'height': resource.get('height', 0),
+        'format': resource.get('format'),
+        'frames': resource.get('pages'),
+        'sha256': sha256 or resource.get('context', {}).get('custom', {}).get('sha256'),
+        'variants': cloudinary_variants(resource['public_id']),
+        'uploaded_at': resource.get('created_at', '')
+    }
+
+def list_cloudinary_page(collection, limit, cursor=None):
+    """Lister une page d'une collection Cloudinary et le curseur suivant"""
+    options = {'next_cursor': cursor} if cursor else {}
+    with track_cloudinary('resources'):
+        result = cloudinary_sdk().api.resources(
+            type="upload",
+            prefix=f"rayschic/{collection}/",
+            max_results=limit,
+            context=True,
+            timeout=CLOUDINARY_LIST_TIMEOUT,
+            **options
+        )
+    records = [cloudinary_record(resource) for resource in result.get('resources', [])]
+    return records, result.get('next_cursor')
+
+def list_cloudinary_collection(collection):
+    """Lister une collection Cloudinary complète en suivant les curseurs"""
+    records = []
+    cursor = None
+    while True:
+        page, cursor = list_cloudinary_page(collection, CLOUDINARY_MAX_RESULTS, cursor)
+        records.extend(page)
+        if not cursor:
+            return records
+
+def fan_out_collections(func, collections):
+    """Appeler func(collection) en parallèle sur le pool Cloudinary.
+
+    Retourne {collection: (résultat, erreur)}; une collection qui dépasse
+    CLOUDINARY_LIST_TIMEOUT est rendue en erreur sans bloquer les autres.
+    """
+    futures = {
+        collection: cloudinary_list_executor.submit(func, collection)
+        for collection in collections
+    }
+    deadline = time.monotonic() + CLOUDINARY_LIST_TIMEOUT
+    results = {}
+    
+    for collection, future in futures.items():
+        try:
+            results[collection] = (future.result(timeout=max(0, deadline - time.monotonic())), None)
+        except Exception as e:
+            if isinstance(e, FuturesTimeoutError):
+                # La requête continue en arrière-plan, son résultat est ignoré
+                future.cancel()
+                e = f"délai dépassé ({CLOUDINARY_LIST_TIMEOUT}s)"
+            print(f"Erreur listing {collection}: {e}")
+            results[collection] = (None, e)
+    return results
+
+def scan_local_collection(collection):
+    """Relire un dossier local; l'empreinte n'est recalculée que si la taille a changé"""
+    with local_scan_latency.time(collection=collection):
+        return _scan_local_collection(collection)
+
+def _scan_local_collection(collection):
+    collection_path = os.path.join(UPLOAD_FOLDER, collection)
+    known = metadata_store.known_files(collection)
+    records = []
+    
+    # Un seul listdir des dérivés: un dossier présent est complet
+    variants_path = os.path.join(collection_path, VARIANTS_DIRNAME)
+    with_variants = set(os.listdir(variants_path)) if os.path.isdir(variants_path) else set()
+    
+    if os.path.isdir(collection_path):
+        with os.scandir(collection_path) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                    row = known.get(entry.name)
+                    if row is not None and row['size'] == stat.st_size and row['sha256']:
+                        sha256 = row['sha256']
+                        info = {key: row[key] for key in ('width', 'height', 'format', 'frames')}
+                    else:
+                        # Fichier nouveau ou modifié: relu en entier pour l'empreinte,
+                        # ses en-têtes donnent en plus dimensions et format
+                        sha256 = file_etag(entry.path, stat, full=True)
+                        try:
+                            info = probe_upload(entry.path)
+                        except ImageProbeError:
+                            info = {'width': None, 'height': None, 'format': None, 'frames': None}
+                    records.append({
+                        'filename': entry.name,
+                        'storage': 'local',
+                        'url': local_file_url(collection, entry.name, sha256),
+                        'public_id': None,
+                        'size': stat.st_size,
+                        'sha256': sha256,
+                        **info,
+                        'variants': local_variants(collection, entry.name, sha256) if entry.name in with_variants else {},
+                        'uploaded_at': row['uploaded_at'] if row is not None else datetime.fromtimestamp(stat.st_ctime).isoformat()
+                    })
+                except OSError:
+                    continue
+    return records
+
+def scan_storage(collections=COLLECTIONS):
+    """Relire le stockage lui-même: {collection: enregistrements, ou None si erreur}"""
+    return storage.scan(collections)
+
+def reconcile(collections=COLLECTIONS, scanned=None):
+    """Reconstruire le magasin de métadonnées depuis le stockage actif.
+
+    `scanned` permet de fournir une relecture déjà faite (mode async).
+    Une collection illisible (erreur Cloudinary) garde ses lignes actuelles.
+    Retourne le nombre d'images par collection, ou 'error'.
+    """
+    if scanned is None:
+        scanned = scan_storage(collections)
+    summary = {}
+    for collection, records in scanned.items():
+        if records is None:
+            summary[collection] = 'error'
+            continue
+        metadata_store.replace_collection(collection, records)
+        summary[collection] = len(records)
+    
+    metadata_store.set_meta('backend', storage.name)
+    metadata_store.set_meta('reconciled_at', datetime.now().isoformat())
+    catalog_index.invalidate()
+    snapshot_publisher.schedule()
+    return summary
+
+def ensure_reconciled():
+    """Remplir le magasin au premier démarrage ou après un changement de stockage"""
+    if metadata_store.get_meta('backend') != storage.name:
+        print(f"Reconstruction du magasin de métadonnées ({storage.name})...")
+        reconcile()
+
+def list_images():
+    """Lister toutes les images depuis le magasin de métadonnées"""
+    ensure_reconciled()
+    version, catalog = metadata_store.load_catalog()
+    collections_data = {}
+    
+    for collection in COLLECTIONS:
+        images = catalog.get(collection, [])
+        collections_data[collection] = {
+            'title': COLLECTION_TITLES.get(collection, collection),
+            'images': images,
+            'count': len(images),
+            'storage': storage.name
+        }
+    
+    return {
+        'collections': collections_data,
+        'stats': {
+            'total_images': sum(c['count'] for c in collections_data.values()),
+            'collections_count': len(collections_data),
+            'storage': storage.name,
+            'version': version,
+            'last_updated': metadata_store.get_meta('updated_at') or ''
+        }
+    }
+
+def list_images_page(collections, limit, cursors, force_refresh=False):
+    """Lister au plus `limit` images par collection à partir des curseurs.
+
+    Chaque collection porte un `next_cursor` (None sur la dernière page).
+    Les pages viennent de l'index trié par nom, quel que soit le stockage.
+    """
+    # Un seul rafraîchissement pour toute la requête
+    version, last_updated = catalog_index.stamp(force_refresh)
+    collections_data = {}
+    
+    for collection in collections:
+        images, next_cursor, collection_storage = catalog_index.page(
+            collection, limit, cursors.get(collection)
+        )
+        collections_data[collection] = {
+            'title': COLLECTION_TITLES.get(collection, collection),
+            'images': images,
+            'count': len(images),
+            'storage': collection_storage,
+            'next_cursor': next_cursor
+        }
+    
+    return {
+        'collections': collections_data,
+        'stats': {
+            'total_images': sum(c['count'] for c in collections_data.values()),
+            'collections_count': len(collections_data),
+            'storage': storage.name,
+            'version': version,
+            'last_updated': last_updated
+        }
+    }
+
+def iter_collection_images(collection, page_size):
+    """Parcourir une collection page par page sans la charger entièrement"""
+    cursor = None
+    while True:
+        images, cursor, _ = catalog_index.page(collection, page_size, cursor)
+        yield from images
+        if not cursor:
+            return
+
+# ========== FILE D'ATTENTE DES UPLOADS CLOUDINARY ==========
+
+# Mode file d'attente: l'upload est déposé sur disque et poussé vers
+# Cloudinary en arrière-plan (sans effet en stockage local)
+UPLOAD_QUEUE = os.environ.get('UPLOAD_QUEUE', '').lower() in ('1', 'true', 'yes')
+QUEUE_FOLDER = os.path.join(UPLOAD_FOLDER, '.queue')
+UPLOAD_QUEUE_WORKERS = int(os.environ.get('UPLOAD_QUEUE_WORKERS', 2))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_RETRY_BASE = float(os.environ.get('JOB_RETRY_BASE', 2))
+JOB_RETRY_MAX = float(os.environ.get('JOB_RETRY_MAX', 300))
+# Un job "running" dont le bail expire (worker tué) est repris par un autre
+JOB_LEASE = float(os.environ.get('JOB_LEASE', 600))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+# Durée de conservation des jobs terminés (secondes)
+JOB_RETENTION = float(os.environ.get('JOB_RETENTION', 86400))
+JOB_STATUS_MAX_IDS = 100
+
+def permanent_upload_error(e):
+    """Erreur qu'un nouvel essai ne corrigera pas (fichier disparu, refus Cloudinary)"""
+    if isinstance(e, (FileNotFoundError, ImageProbeError)):
+        return True
+    # Une exception Cloudinary implique que le SDK est déjà chargé
+    if cloudinary_module is None:
+        return False
+    exceptions = cloudinary_module.exceptions
+    return isinstance(e, (exceptions.BadRequest, exceptions.AuthorizationRequired,
+                          exceptions.NotAllowed, exceptions.NotFound))
+
+def queue_enabled():
+    return UPLOAD_QUEUE and storage.remote
+
+def job_status(row):
+    """Décrire un job pour les réponses API"""
+    status = {
+        'id': row['id'],
+        'status': row['status'],
+        'collection': row['collection'],
+        'filename': row['filename'],
+        'attempts': row['attempts'],
+        'error': row['error'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at']
+    }
+    if row['result']:
+        status['image'] = json.loads(row['result'])
+    return status
+
+class UploadQueue:
+    """Jobs d'upload Cloudinary persistés dans le magasin de métadonnées.
+
+    Tous les workers gunicorn partagent la table `jobs`: un job est pris
+    sous transaction, avec un bail, par un seul thread à la fois.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.wakeup = threading.Event()
+        self.pid = None
+        self.lock = threading.Lock()
+        self.purged_at = 0
+
+    def start(self):
+        """Démarrer les threads de ce processus (une fois par worker forké)"""
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            os.makedirs(QUEUE_FOLDER, exist_ok=True)
+            for index in range(self.workers):
+                threading.Thread(target=self.run, name=f'upload-job-{index}', daemon=True).start()
+
+    def add(self, collection, filename, staged_path, sha256):
+        """Créer un job, ou retourner le job en cours pour le même contenu.
+
+        Retourne (job, créé).
+        """
+        now = datetime.now().isoformat()
+        with metadata_store.transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE collection = ? AND sha256 = ? AND status IN ('queued', 'running')",
+                (collection, sha256)
+            ).fetchone()
+            if row:
+                return row, False
+            job_id = os.path.splitext(os.path.basename(staged_path))[0]
+            conn.execute(
+                "INSERT INTO jobs (id, collection, filename, staged_path, sha256, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, collection, filename, staged_path, sha256, now, now)
+            )
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        self.wakeup.set()
+        return row, True
+
+    def get_many(self, job_ids):
+        placeholders = ', '.join('?' * len(job_ids))
+        rows = metadata_store.connection().execute(
+            f'SELECT * FROM jobs WHERE id IN ({placeholders})', list(job_ids)
+        ).fetchall()
+        return {row['id']: row for row in rows}
+
+    def counts(self):
+        rows = metadata_store.connection().execute(
+            'SELECT status, COUNT(*) FROM jobs GROUP BY status'
+        ).fetchall()
+        return {status: count for status, count in rows}
+
+    def claim_next(self):
+        """Prendre le prochain job prêt (ou dont le bail a expiré)"""
+        now = time.time()
+        with metadata_store.transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') AND run_after <= ? "
+                "ORDER BY run_after LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, run_after = ?, updated_at = ? "
+                "WHERE id = ?",
+                (now + JOB_LEASE, datetime.now().isoformat(), row['id'])
+            )
+            return conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+
+    def finish(self, job, status, error=None, result=None, run_after=0):
+        with metadata_store.transaction() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, result = ?, run_after = ?, updated_at = ? WHERE id = ?',
+                (status, error, json.dumps(result) if result else None, run_after,
+                 datetime.now().isoformat(), job['id'])
+            )
+
+    def purge(self):
+        """Oublier les jobs terminés depuis plus de JOB_RETENTION"""
+        if time.monotonic() - self.purged_at < 3600:
+            return
+        self.purged_at = time.monotonic()
+        cutoff = datetime.fromtimestamp(time.time() - JOB_RETENTION).isoformat()
+        with metadata_store.transaction() as conn:
+            conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,))
+
+    def run(self):
+        while True:
+            # Cloudinary limite les requêtes: laisser passer la pause
+            pause = cloudinary_backoff.remaining()
+            if pause:
+                time.sleep(pause)
+                continue
+            try:
+                self.purge()
+                job = self.claim_next()
+            except Exception as e:
+                print(f"Erreur file d'upload: {e}")
+                job = None
+            if job is None:
+                self.wakeup.wait(JOB_POLL_INTERVAL)
+                self.wakeup.clear()
+                continue
+            self.process(job)
+
+    def process(self, job):
+        collection = job['collection']
+        try:
+            # Réservé comme un upload direct: un envoi concurrent du même
+            # contenu attend celui-ci au lieu de repartir vers le stockage
+            existing, key = claim_upload(collection, job['sha256'])
+            if existing:
+                result = duplicate_result(existing, storage.name, collection)
+            else:
+                try:
+                    info = probe_upload(job['staged_path'])
+                    record = dict(storage.put(collection, job['staged_path'], job['filename'], job['sha256']), **info)
+                except Exception:
+                    metadata_store.release(collection, key)
+                    raise
+                result = store_upload(collection, record, claimed=key)
+        except Exception as e:
+            permanent = permanent_upload_error(e)
+            if permanent or job['attempts'] >= JOB_MAX_ATTEMPTS:
+                print(f"Job {job['id']} en échec: {e}")
+                self.finish(job, 'failed', error=str(e))
+                self.discard(job)
+            else:
+                # Backoff exponentiel avec gigue
+                delay = min(JOB_RETRY_MAX, JOB_RETRY_BASE * 2 ** (job['attempts'] - 1))
+                delay *= random.uniform(0.5, 1.0)
+                print(f"Job {job['id']} essai {job['attempts']} échoué ({e}), reprise dans {delay:.0f}s")
+                self.finish(job, 'queued', error=str(e), run_after=time.time() + delay)
+            return
+        
+        self.finish(job, 'done', result=dict(uploaded_image_info(result, collection), duplicate=result.get('duplicate', False)))
+        self.discard(job)
+
+    def discard(self, job):
+        try:
+            os.remove(job['staged_path'])
+        except OSError:
+            pass
+
+upload_queue = UploadQueue(UPLOAD_QUEUE_WORKERS)
+
+callback_metric(
+    'rayschic_upload_jobs', 'Jobs de la file d\'upload par statut', 'gauge',
+    lambda: [({'status': status}, count) for status, count in upload_queue.counts().items()] if queue_enabled() else []
+)
+
+def start_upload_queue():
+    # Reprend aussi les jobs laissés par un redémarrage
+    if queue_enabled():
+        upload_queue.start()
+
+def enqueue_upload(file, collection):
+    """Déposer un upload sur disque et le confier à la file d'attente.
+
+    Un contenu déjà présent est signalé tout de suite comme doublon.
+    """
+    try:
+        ensure_reconciled()
+        sha256 = upload_sha256(file)
+        existing = metadata_store.find_duplicate(collection, sha256)
+        if existing:
+            return duplicate_result(existing, storage.name, collection)
+        
+        os.makedirs(QUEUE_FOLDER, exist_ok=True)
+        ext = os.path.splitext(secure_filename(file.filename))[1]
+        staged_path = os.path.join(QUEUE_FOLDER, f"{uuid.uuid4().hex}{ext}")
+        if isinstance(file.stream, StagedUpload):
+            file.stream.commit(staged_path)
+        else:
+            file.save(staged_path)
+        
+        job, created = upload_queue.add(collection, file.filename, staged_path, sha256)
+        if not created:
+            # Même contenu déjà en file: un seul envoi
+            os.remove(staged_path)
+        
+        return {
+            'success': True,
+            'queued': True,
+            'storage': storage.name,
+            'job': job_status(job)
+        }
+    except Exception as e:
+        print(f"Erreur mise en file: {e}")
+        return {'success': False, 'error': str(e)}
+
+# ========== ROUTES API ==========
+
+# Taille de page maximale pour ?limit=
+PAGE_MAX_LIMIT = CLOUDINARY_MAX_RESULTS
+
+# Taille des pages lues pendant la génération JSON en streaming
+STREAM_PAGE_SIZE = 100
+
+def wants_refresh(args=None):
+    """Le client demande-t-il une relecture complète du stockage ?"""
+    args = request.args if args is None else args
+    return args.get('refresh', '').lower() in ('1', 'true', 'yes')
+
+def uploads_reach_cloudinary():
+    """L'upload appelle-t-il le stockage distant pendant la requête ?"""
+    return storage.remote and not queue_enabled()
+
+def uses_remote_storage():
+    return storage.remote
+
+def parse_collections(args):
+    """Lire ?collection= (répétable ou séparé par des virgules), toutes par défaut"""
+    selected = [
+        name
+        for value in args.getlist('collection')
+        for name in value.split(',') if name
+    ] or COLLECTIONS
+    for collection in selected:
+        if collection not in COLLECTIONS:
+            raise ValueError(f'Collection invalide: {collection}')
+    return selected
+
+def parse_page_args(args=None):
+    """Lire ?limit=, ?collection= et les curseurs (None sans pagination).
+
+    Le curseur d'une collection se passe en ?cursor_<collection>=..., ou en
+    ?cursor=... quand une seule collection est demandée. `args` vaut par
+    défaut request.args (tout objet avec get/getlist convient).
+    """
+    args = request.args if args is None else args
+    if 'limit' not in args:
+        return None
+    
+    try:
+        limit = int(args['limit'])
+    except ValueError:
+        raise ValueError('Paramètre limit invalide')
+    if not 1 <= limit <= PAGE_MAX_LIMIT:
+        raise ValueError(f'Paramètre limit entre 1 et {PAGE_MAX_LIMIT}')
+    
+    selected = parse_collections(args)
+    cursors = {
+        collection: args[f'cursor_{collection}']
+        for collection in selected if args.get(f'cursor_{collection}')
+    }
+    if len(selected) == 1 and args.get('cursor'):
+        cursors[selected[0]] = args['cursor']
+    
+    return selected, limit, cursors
+
+# Taille de page par défaut de /api/images (maximum: PAGE_MAX_LIMIT)
+SEARCH_DEFAULT_LIMIT = 50
+
+def parse_size_arg(args, name, default):
+    value = args.get(name)
+    if not value:
+        return default
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError(f'Paramètre {name} invalide')
+    if size < 0:
+        raise ValueError(f'Paramètre {name} invalide')
+    return size
+
+def parse_date_arg(args, name):
+    value = args.get(name, '')
+    if value:
+        try:
+            datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f'Paramètre {name} invalide (date ISO 8601 attendue)')
+    return value
+
+def encode_search_cursor(sort, key):
+    return base64.urlsafe_b64encode(json.dumps([sort, *key]).encode()).decode()
+
+def decode_search_cursor(sort, cursor):
+    """Clé (valeur, collection, nom) après laquelle reprendre, pour ce tri"""
+    try:
+        cursor_sort, value, collection, filename = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Curseur invalide')
+    value_type = int if sort == 'size' else str
+    if cursor_sort != sort or not isinstance(value, value_type) or not isinstance(collection, str) \
+            or not isinstance(filename, str):
+        raise ValueError('Curseur invalide pour ce tri')
+    return (value, collection, filename)
+
+def parse_search_args(args):
+    """Lire les filtres, le tri et la page de /api/images.
+
+    ?q= (sous-chaîne du nom), ?prefix=, ?collection=, ?storage=,
+    ?min_size= / ?max_size= (octets), ?from= / ?to= (dates ISO,
+    bornes incluses), ?sort=date|size|name, ?order=asc|desc,
+    ?limit= et ?cursor= (next_cursor de la page précédente).
+    """
+    selected = parse_collections(args)
+    filters = {
+        'collections': None if selected == COLLECTIONS else set(selected),
+        'storage': args.get('storage') or None,
+        'prefix': args.get('prefix', '').lower(),
+        'text': args.get('q', '').lower(),
+        'min_size': parse_size_arg(args, 'min_size', 0),
+        'max_size': parse_size_arg(args, 'max_size', float('inf')),
+        'date_from': parse_date_arg(args, 'from'),
+        # "to=2024-05-01" inclut toute la journée
+        'date_to': (parse_date_arg(args, 'to') or '') + SEARCH_MAX_CHAR
+    }
     
+    sort = args.get('sort', 'date')
+    if sort not in SEARCH_SORTS:
+        raise ValueError(f"Paramètre sort invalide ({', '.join(SEARCH_SORTS)})")
+    order = args.get('order', SEARCH_SORTS[sort])
+    if order not in ('asc', 'desc'):
+        raise ValueError('Paramètre order invalide (asc, desc)')
+    
+    try:
+        limit = int(args.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError('Paramètre limit invalide')
+    if not 1 <= limit <= PAGE_MAX_LIMIT:
+        raise ValueError(f'Paramètre limit entre 1 et {PAGE_MAX_LIMIT}')
+    
+    cursor = decode_search_cursor(sort, args['cursor']) if args.get('cursor') else None
+    return filters, sort, order == 'desc', limit, cursor
+
+def search_images(args):
+    """Une page d'images filtrées et triées, depuis les index en mémoire"""
+    filters, sort, descending, limit, cursor = parse_search_args(args)
+    images, next_key, version = catalog_index.search(filters, sort, descending, limit, cursor)
+    return {
+        'images': images,
+        'count': len(images),
+        'next_cursor': encode_search_cursor(sort, next_key) if next_key else None,
+        'sort': sort,
+        'order': 'desc' if descending else 'asc',
+        'version': version
+    }
+
+def get_listing(args=None, force_refresh=None):
+    """Catalogue complet depuis l'index, ou une page si ?limit= est fourni"""
+    if force_refresh is None:
+        force_refresh = wants_refresh(args)
+    page_args = parse_page_args(args)
+    if page_args:
+        return list_images_page(*page_args, force_refresh=force_refresh)
+    return catalog_index.get(force_refresh=force_refresh)
+
+class DeltaUnavailable(Exception):
+    """Le journal des changements ne remonte pas jusqu'à la version ?since="""
+
+def parse_since(args):
+    """Lire ?since=<version> (None sans delta)"""
+    value = args.get('since', '')
+    if not value:
+        return None
+    try:
+        since = int(value)
+    except ValueError:
+        raise ValueError('Paramètre since invalide')
+    if since < 0:
+        raise ValueError('Paramètre since invalide')
+    return since
+
+def catalog_delta(since, collections):
+    """Images ajoutées/modifiées et noms retirés depuis la version `since`"""
+    changes = metadata_store.changes_since(since)
+    if changes is None:
+        raise DeltaUnavailable(f'Delta indisponible depuis la version {since}, relire le catalogue complet')
+    version, delta = changes
+    collections_data = {
+        collection: delta.get(collection, {'added': [], 'removed': []})
+        for collection in collections
+    }
     return {
+        'delta': True,
+        'since': since,
+        'version': version,
         'collections': collections_data,
         'stats': {
-            'total_images': total_images,
-            'collections_count': len(collections_data),
-            'storage': 'cloudinary' if CLOUDINARY_ENABLED else 'local',
-            'last_updated': datetime.now().isoformat()
+            'added': sum(len(c['added']) for c in collections_data.values()),
+            'removed': sum(len(c['removed']) for c in collections_data.values()),
+            'storage': storage.name,
+            'version': version,
+            'last_updated': metadata_store.get_meta('updated_at') or ''
         }
     }
 
-# ========== ROUTES API ==========
+def listing_etag(kind, version, args):
+    """ETag d'une réponse de catalogue: version du magasin et paramètres de la requête.
+
+    Le corps ne dépend que de ces deux choses, il est donc identique
+    octet pour octet tant que la version ne bouge pas.
+    """
+    params = sorted(
+        (key, value)
+        for key in args if key != 'refresh'
+        for value in args.getlist(key)
+    )
+    digest = hashlib.sha256(json.dumps([kind, storage.name, params]).encode()).hexdigest()[:16]
+    return f"v{version}-{digest}"
+
+def conditional_listing(kind, args, if_none_match, build, force_refresh=None):
+    """Préparer une réponse conditionnelle de /api/scan ou /api/generate-json.
+
+    Retourne (etag, data): data vaut None si le client a déjà cette
+    version (304), le delta avec ?since=, sinon build(). La version est lue
+    avant le corps: au pire l'ETag est en retard, jamais en avance.
+    """
+    if force_refresh is None:
+        force_refresh = wants_refresh(args)
+    since = parse_since(args)
+    collections = parse_collections(args) if since is not None else None
+    version, _ = catalog_index.stamp(force_refresh)
+    etag = listing_etag(kind, version, args)
+    if if_none_match and parse_etags(if_none_match).contains_weak(etag):
+        listing_responses_total.inc(endpoint=kind, result='not_modified')
+        return etag, None
+    if since is not None:
+        listing_responses_total.inc(endpoint=kind, result='delta')
+        return etag, catalog_delta(since, collections)
+    listing_responses_total.inc(endpoint=kind, result='full')
+    return etag, build()
+
+def catalog_response(etag, data, headers=None):
+    """Réponse JSON (ou 304 si data vaut None) portant l'ETag du catalogue"""
+    if data is None:
+        response = Response(status=304)
+    elif isinstance(data, Response):
+        response = data
+    else:
+        response = jsonify(data)
+    response.set_etag(etag)
+    # Toujours revalider: le navigateur renvoie If-None-Match tout seul
+    response.headers['Cache-Control'] = 'no-cache'
+    for name, value in (headers or {}).items():
+        response.headers[name] = value
+    return response
 
 @app.route('/api/scan', methods=['GET'])
+@limited('list', cloudinary=uses_remote_storage, when=wants_refresh)
 def api_scan():
-    """API: Scanner toutes les images"""
+    """API: Scanner toutes les images (ETag, 304 et ?since=<version>)"""
+    try:
+        etag, data = conditional_listing(
+            'scan', request.args, request.headers.get('If-None-Match'),
+            lambda: get_listing(force_refresh=False)
+        )
+        return catalog_response(etag, data)
+    except DeltaUnavailable as e:
+        return jsonify({'error': str(e), 'version': catalog_index.stamp()[0]}), 410
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/images', methods=['GET'])
+def api_images():
+    """API: Rechercher, filtrer et trier les images (une page à la fois)"""
     try:
-        data = list_images()
-        return jsonify(data)
+        return jsonify(search_images(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+# Uploads parallèles vers le stockage pour /api/upload/batch
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 4))
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='upload')
+
+def validate_upload(file, collection):
+    """Vérifier un fichier avant upload; retourne un message d'erreur ou None"""
+    if collection not in COLLECTIONS:
+        return f'Collection invalide: {collection}'
+    
+    if file.filename == '':
+        return 'Nom de fichier vide'
+    
+    # Vérifier la taille (max 10MB), déjà mesurée pendant la réception
+    if isinstance(file.stream, StagedUpload):
+        too_large = file.stream.too_large
+    else:
+        file.seek(0, os.SEEK_END)
+        too_large = file.tell() > MAX_FILE_SIZE
+        file.seek(0)
+    
+    if too_large:
+        return 'Fichier trop volumineux (max 10MB)'
+    
+    # Vérifier l'extension
+    if '.' in file.filename:
+        ext = file.filename.rsplit('.', 1)[1].lower()
+        if ext not in ALLOWED_EXTENSIONS:
+            return 'Type de fichier non autorisé. Utilisez: PNG, JPG, JPEG, GIF, WebP'
+    
+    # Vérifier le contenu réel sur ses seuls en-têtes (type, pixels, images)
+    try:
+        info = probe_upload(file)
+    except ImageProbeError as e:
+        return str(e)
+    return image_limits_error(info, file.filename)
+
+def uploaded_image_info(result, collection):
+    """Décrire une image uploadée pour les réponses API"""
+    return {
+        'filename': result['filename'],
+        'url': result['url'],
+        'size': result['size'],
+        'collection': collection,
+        'public_id': result.get('public_id'),
+        'dimensions': result.get('dimensions', ''),
+        'variants': result.get('variants', {})
+    }
+
+def upload_response(result, collection):
+    """Corps et statut HTTP de /api/upload pour un résultat d'upload"""
+    if result.get('queued'):
+        return {
+            'success': True,
+            'message': 'Upload en file d\'attente',
+            'storage': result['storage'],
+            'queued': True,
+            'job': result['job'],
+            'status_url': f"/api/jobs/{result['job']['id']}"
+        }, 202
+    if not result['success']:
+        return {'error': result['error']}, 500
+    return {
+        'success': True,
+        'message': 'Image déjà présente' if result.get('duplicate') else 'Image uploadée avec succès',
+        'storage': result['storage'],
+        'duplicate': result.get('duplicate', False),
+        'image': uploaded_image_info(result, collection)
+    }, 200
+
 @app.route('/api/upload', methods=['POST'])
+@limited('upload', cloudinary=uploads_reach_cloudinary)
 def api_upload():
     """API: Uploader une image"""
     try:
@@ -264,52 +3286,125 @@ def api_upload():
         file = request.files['file']
         collection = request.form['collection']
         
-        if collection not in COLLECTIONS:
-            return jsonify({'error': f'Collection invalide: {collection}'}), 400
-        
-        if file.filename == '':
-            return jsonify({'error': 'Nom de fichier vide'}), 400
+        error = validate_upload(file, collection)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Vérifier la taille (max 10MB)
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
+        if queue_enabled():
+            # Réponse immédiate: l'envoi vers Cloudinary se fait en arrière-plan
+            result = enqueue_upload(file, collection)
+        else:
+            # Upload l'image
+            result = upload_image(file, collection)
         
-        if file_size > 10 * 1024 * 1024:
-            return jsonify({'error': 'Fichier trop volumineux (max 10MB)'}), 400
+        payload, status = upload_response(result, collection)
+        return jsonify(payload), status
+            
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        print(f"Upload error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/upload/batch', methods=['POST'])
+@limited('upload', cloudinary=uploads_reach_cloudinary)
+def api_upload_batch():
+    """API: Uploader plusieurs images en une requête.
+
+    Champs multipart: `files` (répété) et soit `collection` pour tous les
+    fichiers, soit `collections` répété dans le même ordre que `files`.
+    """
+    try:
+        files = request.files.getlist('files')
+        if not files:
+            return jsonify({'error': 'Aucun fichier fourni'}), 400
         
-        # Vérifier l'extension
-        allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-        if '.' in file.filename:
-            ext = file.filename.rsplit('.', 1)[1].lower()
-            if ext not in allowed_extensions:
-                return jsonify({'error': 'Type de fichier non autorisé. Utilisez: PNG, JPG, JPEG, GIF, WebP'}), 400
+        collections = request.form.getlist('collections')
+        if not collections:
+            if 'collection' not in request.form:
+                return jsonify({'error': 'Collection non spécifiée'}), 400
+            collections = [request.form['collection']] * len(files)
+        elif len(collections) != len(files):
+            return jsonify({'error': 'Une collection par fichier requise'}), 400
         
-        # Upload l'image
-        result = upload_image(file, collection)
+        # Une seule reconstruction du magasin, avant les envois parallèles
+        ensure_reconciled()
+        upload = enqueue_upload if queue_enabled() else upload_image
+        results = [None] * len(files)
+        futures = {}
+        for index, (file, collection) in enumerate(zip(files, collections)):
+            error = validate_upload(file, collection)
+            if error:
+                results[index] = {'success': False, 'filename': file.filename, 'collection': collection, 'error': error}
+            else:
+                futures[index] = upload_executor.submit(upload, file, collection)
         
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'message': 'Image uploadée avec succès',
-                'storage': result['storage'],
-                'image': {
-                    'filename': result['filename'],
-                    'url': result['url'],
-                    'size': result['size'],
+        for index, future in futures.items():
+            file, collection = files[index], collections[index]
+            result = future.result()
+            if result.get('queued'):
+                results[index] = {
+                    'success': True,
+                    'filename': file.filename,
                     'collection': collection,
-                    'public_id': result.get('public_id'),
-                    'dimensions': result.get('dimensions', '')
+                    'storage': result['storage'],
+                    'queued': True,
+                    'job': result['job'],
+                    'status_url': f"/api/jobs/{result['job']['id']}"
                 }
-            })
-        else:
-            return jsonify({'error': result['error']}), 500
-            
+            elif result['success']:
+                results[index] = {
+                    'success': True,
+                    'filename': file.filename,
+                    'collection': collection,
+                    'storage': result['storage'],
+                    'duplicate': result.get('duplicate', False),
+                    'image': uploaded_image_info(result, collection)
+                }
+            else:
+                results[index] = {'success': False, 'filename': file.filename, 'collection': collection, 'error': result['error']}
+        
+        uploaded = sum(1 for result in results if result['success'])
+        queued = sum(1 for result in results if result.get('queued'))
+        return jsonify({
+            'success': uploaded == len(results),
+            'message': f'{uploaded}/{len(results)} image(s) uploadée(s)' + (f', dont {queued} en file d\'attente' if queued else ''),
+            'queued': queued,
+            'uploaded': uploaded,
+            'failed': len(results) - uploaded,
+            'results': results
+        })
+        
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
-        print(f"Upload error: {e}")
+        print(f"Batch upload error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """API: Statut d'un job d'upload"""
+    job = upload_queue.get_many([job_id]).get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/api/jobs')
+def api_jobs():
+    """API: Statut de plusieurs jobs (?ids=a,b,c), ou compteurs par statut sans ids"""
+    job_ids = [job_id for value in request.args.getlist('ids') for job_id in value.split(',') if job_id]
+    if not job_ids:
+        return jsonify({'enabled': queue_enabled(), 'counts': upload_queue.counts()})
+    if len(job_ids) > JOB_STATUS_MAX_IDS:
+        return jsonify({'error': f'{JOB_STATUS_MAX_IDS} jobs maximum par requête'}), 400
+    
+    jobs = upload_queue.get_many(job_ids)
+    return jsonify({
+        'jobs': {job_id: job_status(jobs[job_id]) if job_id in jobs else None for job_id in job_ids}
+    })
+
 @app.route('/api/delete', methods=['POST'])
+@limited('delete', cloudinary=uses_remote_storage)
 def api_delete():
     """API: Supprimer une image"""
     try:
@@ -324,6 +3419,9 @@ def api_delete():
         if not collection or not filename:
             return jsonify({'error': 'Collection et nom de fichier requis'}), 400
         
+        if collection not in COLLECTIONS:
+            return jsonify({'error': f'Collection invalide: {collection}'}), 400
+        
         # Supprimer l'image
         result = delete_image(collection, filename)
         
@@ -340,52 +3438,185 @@ def api_delete():
         print(f"Delete error: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/generate-json', methods=['GET'])
-def api_generate_json():
-    """API: Générer le JSON pour GitHub"""
-    try:
-        data = list_images()
-        
-        # Formater pour GitHub
-        github_data = {
-            'last_updated': datetime.now().isoformat(),
-            'storage': 'cloudinary' if CLOUDINARY_ENABLED else 'local',
-            'hero': {
-                'url': data['collections']['hero']['images'][0]['url'] if data['collections']['hero']['images'] else ''
-            },
-            'collections': {}
+def format_github_data(data):
+    """Formater un listing pour le fichier rayschic-images.json de GitHub"""
+    hero = data['collections'].get('hero')
+    github_data = {
+        'last_updated': data['stats']['last_updated'],
+        'version': data['stats']['version'],
+        'storage': storage.name,
+        'hero': {
+            'url': hero['images'][0]['url'] if hero and hero['images'] else ''
+        },
+        'collections': {}
+    }
+    
+    for key, collection in data['collections'].items():
+        if key == 'hero':
+            continue
+        
+        github_data['collections'][key] = {
+            'title': collection['title'],
+            'images': collection['images'],
+            'count': collection['count']
         }
+        if 'next_cursor' in collection:
+            github_data['collections'][key]['next_cursor'] = collection['next_cursor']
+    
+    return github_data
+
+def github_json(value):
+    """Sérialiser (une partie de) rayschic-images.json.
+
+    Clés dans l'ordre du schéma (static/images.json), pas triées comme
+    jsonify: le document est identique octet pour octet, qu'il soit
+    généré en un bloc ou en streaming.
+    """
+    return json.dumps(value, ensure_ascii=app.json.ensure_ascii, default=app.json.default)
+
+def stream_github_data():
+    """Générer rayschic-images.json morceau par morceau, collection par collection.
+
+    Mêmes octets que github_json(format_github_data(...)) sur tout le
+    catalogue; seule une page d'images est en mémoire à la fois.
+    """
+    dumps = github_json
+    version, last_updated = catalog_index.stamp()
+    hero = next(iter_collection_images('hero', 1), None)
+    
+    yield '{"last_updated": %s, "version": %s, "storage": %s, "hero": {"url": %s}, "collections": {' % (
+        dumps(last_updated),
+        dumps(version),
+        dumps(storage.name),
+        dumps(hero['url'] if hero else '')
+    )
+    
+    first_collection = True
+    for key in COLLECTIONS:
+        if key == 'hero':
+            continue
         
-        for key, collection in data['collections'].items():
-            if key == 'hero':
-                continue
-            
-            github_data['collections'][key] = {
-                'title': collection['title'],
-                'images': collection['images'],
-                'count': collection['count']
-            }
+        yield '%s%s: {"title": %s, "images": [' % (
+            '' if first_collection else ', ',
+            dumps(key),
+            dumps(COLLECTION_TITLES.get(key, key))
+        )
+        first_collection = False
+        
+        count = 0
+        try:
+            for image in iter_collection_images(key, STREAM_PAGE_SIZE):
+                yield (', ' if count else '') + dumps(image)
+                count += 1
+        except Exception as e:
+            # Les en-têtes sont déjà partis: le document est laissé incomplet
+            print(f"Erreur génération JSON {key}: {e}")
+            raise
+        
+        yield '], "count": %d}' % count
+    
+    yield '}}'
+
+@app.route('/api/delete/batch', methods=['POST'])
+@limited('delete', cloudinary=uses_remote_storage)
+def api_delete_batch():
+    """API: Supprimer des images en lot.
+
+    JSON: {"items": [{"collection", "filename"}, ...]} pour une liste
+    d'images, ou {"collections": [...], "prefix": "..."} (ou "collection")
+    pour vider des collections entières ou par préfixe de nom.
+    """
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'Données JSON requises'}), 400
+        
+        if 'items' in data:
+            items = []
+            for item in data['items']:
+                if not isinstance(item, dict) or not item.get('collection') or not item.get('filename'):
+                    return jsonify({'error': 'Collection et nom de fichier requis pour chaque image'}), 400
+                if item['collection'] not in COLLECTIONS:
+                    return jsonify({'error': f"Collection invalide: {item['collection']}"}), 400
+                items.append((item['collection'], item['filename']))
+            results = delete_images(items)
+        else:
+            collections = data.get('collections') or ([data['collection']] if data.get('collection') else [])
+            if not collections:
+                return jsonify({'error': 'Images ou collections requises'}), 400
+            for collection in collections:
+                if collection not in COLLECTIONS:
+                    return jsonify({'error': f'Collection invalide: {collection}'}), 400
+            prefix = secure_filename(data.get('prefix', '')) if data.get('prefix') else ''
+            results = []
+            for collection in collections:
+                results.extend(clear_collection(collection, prefix))
+        
+        deleted = sum(1 for result in results if result['status'] == 'deleted')
+        return jsonify({
+            'success': all(result['status'] != 'error' for result in results),
+            'message': f'{deleted} image(s) supprimée(s)',
+            'deleted': deleted,
+            'storage': storage.name,
+            'results': results
+        })
+        
+    except Exception as e:
+        print(f"Batch delete error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def wants_stream(args):
+    return args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+@app.route('/api/generate-json', methods=['GET'])
+@limited('list', cloudinary=uses_remote_storage, when=wants_refresh)
+def api_generate_json():
+    """API: Générer le JSON pour GitHub (ETag, 304 et ?since=<version>)"""
+    try:
+        if wants_stream(request.args):
+            build = lambda: Response(stream_with_context(stream_github_data()), mimetype='application/json')
+        else:
+            build = lambda: Response(github_json(format_github_data(get_listing(force_refresh=False))),
+                                     mimetype='application/json')
+        etag, data = conditional_listing('github', request.args, request.headers.get('If-None-Match'), build)
         
         # Téléchargement
-        response = jsonify(github_data)
-        response.headers.add('Content-Disposition', 'attachment; filename=rayschic-images.json')
-        return response
+        return catalog_response(etag, data, {'Content-Disposition': 'attachment; filename=rayschic-images.json'})
         
+    except DeltaUnavailable as e:
+        return jsonify({'error': str(e), 'version': catalog_index.stamp()[0]}), 410
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/health', methods=['GET'])
-def api_health():
-    """API: Vérifier la santé"""
-    return jsonify({
+def health_status():
+    return {
         'status': 'online',
-        'storage': 'cloudinary' if CLOUDINARY_ENABLED else 'local',
+        'storage': storage.name,
         'cloudinary_enabled': CLOUDINARY_ENABLED,
+        'upload_queue': queue_enabled(),
+        'max_upload_bytes': app.config['MAX_CONTENT_LENGTH'],
+        'http_pool': cloudinary_pool_stats(),
+        'snapshot': snapshot_status(),
+        'admission': admission_status(),
         'timestamp': datetime.now().isoformat(),
         'message': 'Système fonctionnel' + (' avec Cloudinary' if CLOUDINARY_ENABLED else ' en local')
-    })
+    }
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métriques du worker au format texte Prometheus"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/health', methods=['GET'])
+def api_health():
+    """API: Vérifier la santé"""
+    return jsonify(health_status())
 
 @app.route('/api/test-cloudinary', methods=['GET'])
+@limited('ping', cloudinary=lambda: CLOUDINARY_ENABLED)
 def test_cloudinary():
     """Tester la connexion Cloudinary"""
     if not CLOUDINARY_ENABLED:
@@ -396,7 +3627,8 @@ def test_cloudinary():
         })
     
     try:
-        result = cloudinary.api.ping()
+        with track_cloudinary('ping'):
+            result = cloudinary_sdk().api.ping()
         return jsonify({
             'success': True,
             'cloudinary': 'connected',
@@ -409,33 +3641,570 @@ def test_cloudinary():
             'error': str(e)
         }), 500
 
+# ========== FLUX D'ÉVÉNEMENTS (SSE) ==========
+
+# Les événements sont lus dans le journal `changes` du magasin: tous les
+# workers voient les écritures des autres sans canal supplémentaire.
+EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 1))
+# Durée d'une connexion /api/events côté Flask. Un worker gunicorn sync ne
+# sert qu'une requête à la fois: par défaut on envoie le retard puis on
+# ferme, et EventSource se reconnecte après EVENTS_RETRY_MS. Sous gunicorn
+# sync (render.yaml), le flux est donc un sondage toutes les EVENTS_RETRY_MS,
+# sans perte grâce à l'id renvoyé à chaque réponse. Avec des workers à
+# threads (-k gthread) ou le mode async (asgi.py), la connexion peut durer.
+EVENTS_STREAM_SECONDS = float(os.environ.get('EVENTS_STREAM_SECONDS', 0))
+EVENTS_RETRY_MS = int(os.environ.get('EVENTS_RETRY_MS', 3000))
+EVENTS_HEARTBEAT = 15
+EVENTS_BATCH = 500
+
+EVENT_NAMES = {
+    'added': 'image_added',
+    'updated': 'image_updated',
+    'removed': 'image_deleted'
+}
+
+def sse_message(event, data, event_id=None):
+    """Formater un message SSE (data JSON sur une ligne)"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+def catalog_events(rows):
+    """Transformer les lignes du journal en (version, événement, données).
+
+    Les retraits d'une collection vidée dans la même version sont
+    regroupés en un seul collection_cleared.
+    """
+    cleared = {
+        (version, collection): {'collection': collection, 'prefix': prefix, 'removed': []}
+        for version, op, collection, prefix, _ in rows if op == 'cleared'
+    }
+    events = []
+    for version, op, collection, filename, image in rows:
+        if op == 'cleared':
+            events.append((version, 'collection_cleared', cleared[(version, collection)]))
+        elif op == 'removed' and (version, collection) in cleared:
+            cleared[(version, collection)]['removed'].append(filename)
+        elif op == 'removed':
+            events.append((version, EVENT_NAMES[op], {'collection': collection, 'filename': filename}))
+        else:
+            events.append((version, EVENT_NAMES[op], {'collection': collection, 'image': image}))
+    return events
+
+def events_start(args, headers):
+    """Version de départ: Last-Event-ID (reconnexion), ?since=, sinon l'actuelle"""
+    value = headers.get('Last-Event-ID') or args.get('since')
+    if not value:
+        return metadata_store.version()
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError('Version de départ invalide')
+
+def poll_events(since):
+    """Retourner (version atteinte, texte SSE) des changements après `since`"""
+    if metadata_store.version() == since:
+        return since, ''
+    result = metadata_store.events_since(since, EVENTS_BATCH)
+    if result is None:
+        # Journal purgé: le client doit relire le catalogue complet
+        version = metadata_store.version()
+        return version, sse_message('reset', {'version': version}, version)
+    version, rows = result
+    messages = [sse_message(event, data) for _, event, data in catalog_events(rows)]
+    # L'id en dernier: une reconnexion reprend après toute la version
+    messages.append(f"id: {version}\n\n")
+    return version, ''.join(messages)
+
+def event_stream(since, duration):
+    """Générer le flux SSE pendant `duration` secondes (0: le retard seulement)"""
+    # L'id de départ d'abord: même sans changement, la reconnexion
+    # reprendra à cette version (Last-Event-ID)
+    yield f"retry: {EVENTS_RETRY_MS}\nid: {since}\n\n"
+    deadline = time.monotonic() + duration
+    last_write = time.monotonic()
+    while True:
+        since, text = poll_events(since)
+        if text:
+            yield text
+            last_write = time.monotonic()
+        elif time.monotonic() - last_write >= EVENTS_HEARTBEAT:
+            yield ': ping\n\n'
+            last_write = time.monotonic()
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(EVENTS_POLL_INTERVAL)
+
+@app.route('/api/events', methods=['GET'])
+def api_events():
+    """API: Flux des changements du catalogue (Server-Sent Events).
+
+    Événements: image_added, image_updated, image_deleted,
+    collection_cleared, et reset quand le client doit tout relire.
+    Chaque réponse porte l'id (version) où reprendre. Sous gunicorn sync,
+    la réponse se ferme après le retard (EVENTS_STREAM_SECONDS=0):
+    EventSource se reconnecte, c'est un sondage et non un flux continu.
+    """
+    try:
+        since = events_start(request.args, request.headers)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = Response(
+        stream_with_context(event_stream(since, EVENTS_STREAM_SECONDS)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par nginx (X-Accel)
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# ========== LIVRAISON DES FICHIERS LOCAUX ==========
+
+# Durée de cache des fichiers ordinaires (revalidés ensuite par ETag)
+FILE_CACHE_MAX_AGE = int(os.environ.get('FILE_CACHE_MAX_AGE', 3600))
+
+# Cache immuable d'un an seulement pour une URL qui porte l'empreinte du
+# contenu servi (?v=<sha256>, au moins VERSION_MIN_LENGTH caractères hex):
+# un nom de fichier peut être réutilisé pour un autre contenu
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+VERSION_MIN_LENGTH = 16
+
+# Délégation de l'envoi au proxy: '' (Python), 'nginx' (X-Accel-Redirect) ou 'x-sendfile'
+SENDFILE_MODE = os.environ.get('SENDFILE_MODE', '').lower()
+
+# Préfixe de la location nginx `internal` qui pointe vers UPLOAD_FOLDER
+X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX', '/_protected').rstrip('/')
+
+app.config['USE_X_SENDFILE'] = SENDFILE_MODE == 'x-sendfile'
+
+# Empreintes déjà calculées: chemin -> ((taille, mtime), etag)
+ETAG_CACHE_SIZE = 4096
+_etag_cache = OrderedDict()
+_etag_lock = threading.Lock()
+
+def file_etag(path, stat, full=False):
+    """ETag basé sur le contenu, recalculé seulement si le fichier a changé.
+
+    full=True retourne l'empreinte SHA-256 complète au lieu de l'ETag court.
+    """
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _etag_lock:
+        cached = _etag_cache.get(path)
+        if cached and cached[0] == key:
+            _etag_cache.move_to_end(path)
+            return cached[1] if full else cached[1][:32]
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+    
+    with _etag_lock:
+        _etag_cache[path] = (key, sha256)
+        if len(_etag_cache) > ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+    return sha256 if full else sha256[:32]
+
+# Signatures des formats d'image servis sans extension (cache tiered)
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF8', 'image/gif'),
+    (b'RIFF', 'image/webp'),
+)
+
+def sniff_image_type(path):
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'image/avif'
+    return 'application/octet-stream'
+
+def stored_sha256(collection, filename):
+    """Empreinte enregistrée d'un original local, si la taille du fichier correspond encore"""
+    row = metadata_store.image_row(collection, filename)
+    if row is None or not row['sha256']:
+        return None
+    try:
+        if os.path.getsize(os.path.join(UPLOAD_FOLDER, collection, filename)) != row['size']:
+            return None
+    except OSError:
+        return None
+    return row['sha256']
+
+def send_local_file(directory, filename, mimetype=None, max_age=None, sha256=None, version_of=None):
+    """Envoyer un fichier local avec ETag, Last-Modified, Range et 304.
+
+    sha256: empreinte connue du fichier (magasin), sinon il est haché une
+    fois puis gardé en cache. version_of: empreinte que ?v= doit porter
+    pour un cache immuable (par défaut celle du fichier; celle de
+    l'original pour un dérivé).
+
+    Avec SENDFILE_MODE=nginx, seuls les en-têtes sont produits et nginx
+    envoie les octets depuis X_ACCEL_PREFIX + chemin du fichier relatif à
+    UPLOAD_FOLDER, par ex.:
+
+        location /_protected/ { internal; alias /app/temp_uploads/; }
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'error': 'Fichier non trouvé'}), 404
+    
+    stat = os.stat(path)
+    if not sha256:
+        sha256 = file_etag(path, stat, full=True)
+    etag = sha256[:32]
+    version = request.args.get('v', '').lower()
+    immutable = (
+        max_age is None and len(version) >= VERSION_MIN_LENGTH
+        and (version_of or sha256).startswith(version)
+    )
+    if max_age is None:
+        max_age = IMMUTABLE_MAX_AGE if immutable else FILE_CACHE_MAX_AGE
+    
+    # Hors de UPLOAD_FOLDER (cache tiered déplacé), l'envoi reste en Python
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(UPLOAD_FOLDER))
+    if SENDFILE_MODE == 'nginx' and not relative.startswith(os.pardir):
+        response = Response(mimetype=mimetype or mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = X_ACCEL_PREFIX + '/' + relative.replace(os.sep, '/')
+        response.set_etag(etag)
+        response.last_modified = stat.st_mtime
+        response.make_conditional(request)
+    else:
+        response = send_file(
+            os.path.abspath(path),
+            mimetype=mimetype,
+            etag=etag,
+            last_modified=stat.st_mtime,
+            conditional=True,
+            max_age=max_age
+        )
+    
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = immutable
+    return response
+
+# ========== INSTANTANÉ PUBLIÉ DU CATALOGUE ==========
+
+# Fichier JSON consommé par le site public, republié après chaque écriture
+# du catalogue ('' pour désactiver). Les variantes .gz/.br, le fichier .meta
+# (version, empreinte) et le verrou sont écrits à côté: hors de static/,
+# servi tel quel et suivi par git, seule /images.json les expose.
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH', os.path.join('instance', 'images.json'))
+# Annexes publiées sous static/ par les versions précédentes, retirées
+LEGACY_SNAPSHOT_FILES = [
+    os.path.join(app.static_folder, 'images.json' + suffix) for suffix in ('.gz', '.br', '.meta', '.lock')
+]
+
+# Rafales d'écritures regroupées: publication après SNAPSHOT_DELAY secondes
+# sans écriture, au plus tard SNAPSHOT_MAX_DELAY après la première
+SNAPSHOT_DELAY = float(os.environ.get('SNAPSHOT_DELAY', 2))
+SNAPSHOT_MAX_DELAY = float(os.environ.get('SNAPSHOT_MAX_DELAY', 30))
+SNAPSHOT_MAX_AGE = int(os.environ.get('SNAPSHOT_MAX_AGE', 60))
+SNAPSHOT_BROTLI_QUALITY = int(os.environ.get('SNAPSHOT_BROTLI_QUALITY', 9))
+
+# Encodages précompressés, par ordre de préférence à qualité égale
+SNAPSHOT_ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+snapshot_publish_latency = histogram(
+    'rayschic_snapshot_publish_duration_seconds', 'Publication de l\'instantané du catalogue (published, unchanged, error)'
+)
+
+def brotli_module():
+    """Module brotli, ou None (pas de variante .br sans lui)"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+def read_snapshot_meta(path):
+    try:
+        with open(path + '.meta', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_snapshot(path, version, last_updated):
+    """Écrire le JSON et ses variantes compressées à côté, puis les renommer.
+
+    Le document est produit par stream_github_data(): ni lui ni ses
+    variantes ne sont entièrement en mémoire. Chaque fichier apparaît d'un
+    bloc (os.replace), jamais à moitié écrit.
+    """
+    brotli = brotli_module()
+    tmp = f"{path}.tmp-{os.getpid()}"
+    targets = {'identity': path, 'gzip': path + '.gz'}
+    if brotli is not None:
+        targets['br'] = path + '.br'
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, 'wb') as raw, open(tmp + '.gz', 'wb') as gz_raw:
+            gz = gzip.GzipFile(fileobj=gz_raw, mode='wb', compresslevel=9, mtime=0)
+            br_raw = open(tmp + '.br', 'wb') if brotli is not None else None
+            compressor = brotli.Compressor(quality=SNAPSHOT_BROTLI_QUALITY) if brotli is not None else None
+            try:
+                buffer = []
+                buffered = 0
+                for chunk in itertools.chain(stream_github_data(), [None]):
+                    if chunk is not None:
+                        buffer.append(chunk)
+                        buffered += len(chunk)
+                        if buffered < 64 * 1024:
+                            continue
+                    data = ''.join(buffer).encode('utf-8')
+                    buffer, buffered = [], 0
+                    raw.write(data)
+                    digest.update(data)
+                    size += len(data)
+                    gz.write(data)
+                    if compressor is not None:
+                        br_raw.write(compressor.process(data))
+                gz.close()
+                if compressor is not None:
+                    br_raw.write(compressor.finish())
+            finally:
+                if br_raw is not None:
+                    br_raw.close()
+        
+        # Variantes d'abord: le fichier principal annonce la nouvelle version
+        for encoding in ('br', 'gzip', 'identity'):
+            if encoding in targets:
+                os.replace(tmp + SNAPSHOT_ENCODINGS.get(encoding, ''), targets[encoding])
+        for encoding, suffix in SNAPSHOT_ENCODINGS.items():
+            if encoding not in targets:
+                # Variante d'une publication précédente, désormais périmée
+                try:
+                    os.remove(path + suffix)
+                except OSError:
+                    pass
+    finally:
+        for suffix in ('', '.gz', '.br'):
+            try:
+                os.remove(tmp + suffix)
+            except OSError:
+                pass
+    
+    meta = {
+        'version': version,
+        'last_updated': last_updated,
+        'sha256': digest.hexdigest(),
+        'size': size,
+        'encodings': {encoding: os.path.getsize(target) for encoding, target in targets.items()},
+        'published_at': datetime.now().isoformat()
+    }
+    with open(tmp + '.meta', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp + '.meta', path + '.meta')
+    return meta
+
+class SnapshotPublisher:
+    """Republie l'instantané du catalogue après une rafale d'écritures.
+
+    Un thread par processus attend que les écritures se calment. Entre
+    workers, un verrou fichier sérialise les publications et le .meta
+    évite de réécrire une version déjà publiée par un autre.
+    """
+
+    def __init__(self, path, delay, max_delay):
+        self.path = path
+        self.delay = delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.first_change = None
+        self.last_change = None
+        self.pid = None
+        self.checked = False
+
+    def schedule(self):
+        """Noter une écriture du catalogue; la publication suit la rafale"""
+        if not self.path:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if self.first_change is None:
+                self.first_change = now
+            self.last_change = now
+            # Un thread par processus (les workers sont forkés)
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                threading.Thread(target=self.run, name='snapshot', daemon=True).start()
+        self.wakeup.set()
+
+    def check_once(self):
+        """Au premier accès du processus: republier si le fichier est périmé"""
+        if not self.checked:
+            self.checked = True
+            if os.path.abspath(self.path) != os.path.abspath(os.path.join(app.static_folder, 'images.json')):
+                for path in LEGACY_SNAPSHOT_FILES:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            self.schedule()
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            with self.lock:
+                self.wakeup.clear()
+                if self.last_change is None:
+                    continue
+                due = min(self.last_change + self.delay, self.first_change + self.max_delay)
+                remaining = due - time.monotonic()
+                if remaining <= 0:
+                    self.first_change = self.last_change = None
+            if remaining > 0:
+                # Une nouvelle écriture réveille le thread et repousse l'échéance
+                self.wakeup.wait(remaining)
+                self.wakeup.set()
+                continue
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"Erreur publication de l'instantané: {e}")
+
+    def publish(self):
+        """Publier maintenant si la version du catalogue a changé; retourne le .meta"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        start = time.perf_counter()
+        result = 'error'
+        try:
+            with file_lock(self.path + '.lock'):
+                version, last_updated = catalog_index.stamp()
+                meta = read_snapshot_meta(self.path)
+                if meta and meta.get('version') == version and os.path.exists(self.path):
+                    result = 'unchanged'
+                    return meta
+                meta = write_snapshot(self.path, version, last_updated)
+                result = 'published'
+                return meta
+        finally:
+            snapshot_publish_latency.observe(time.perf_counter() - start, result=result)
+
+snapshot_publisher = SnapshotPublisher(SNAPSHOT_PATH, SNAPSHOT_DELAY, SNAPSHOT_MAX_DELAY)
+
+def snapshot_status():
+    if not SNAPSHOT_PATH:
+        return None
+    meta = read_snapshot_meta(SNAPSHOT_PATH)
+    return {key: meta.get(key) for key in ('version', 'sha256', 'published_at')} if meta else {}
+
+@app.route('/images.json')
+@app.route('/static/images.json')
+def serve_snapshot():
+    """Instantané publié du catalogue, variante précompressée selon Accept-Encoding.
+
+    Derrière nginx, `gzip_static on;` (et brotli_static) sur le même
+    fichier évite tout passage par Python.
+    """
+    if not SNAPSHOT_PATH:
+        return send_local_file(app.static_folder, 'images.json', mimetype='application/json')
+    snapshot_publisher.check_once()
+    if not os.path.exists(SNAPSHOT_PATH):
+        # Déploiement neuf: rien n'est encore publié, publier sans attendre
+        snapshot_publisher.publish()
+    
+    offered = [encoding for encoding, suffix in SNAPSHOT_ENCODINGS.items()
+               if os.path.exists(SNAPSHOT_PATH + suffix)]
+    encoding = request.accept_encodings.best_match(offered + ['identity'], default='identity')
+    filename = os.path.basename(SNAPSHOT_PATH) + SNAPSHOT_ENCODINGS.get(encoding, '')
+    response = send_local_file(
+        os.path.dirname(SNAPSHOT_PATH) or '.', filename,
+        mimetype='application/json', max_age=SNAPSHOT_MAX_AGE
+    )
+    if isinstance(response, Response):
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+    return response
+
 # ========== ROUTES POUR FICHIERS LOCAUX ==========
 
+def public_upload_path(collection, *names):
+    """Seules les collections sont servies; les fichiers cachés (.queue, .cache...) jamais"""
+    return collection in COLLECTIONS and not any(name.startswith('.') for name in names)
+
 @app.route('/temp_uploads/<collection>/<filename>')
 def serve_temp_file(collection, filename):
     """Servir les fichiers uploadés localement"""
-    if not CLOUDINARY_ENABLED:
-        try:
-            return send_from_directory(os.path.join(UPLOAD_FOLDER, collection), filename)
-        except:
-            return jsonify({'error': 'Fichier non trouvé'}), 404
+    if not public_upload_path(collection, filename):
+        return jsonify({'error': 'Fichier non trouvé'}), 404
+    if not storage.remote:
+        return send_local_file(os.path.join(UPLOAD_FOLDER, collection), filename, sha256=stored_sha256(collection, filename))
+    else:
+        return jsonify({'error': 'Utilisez les URLs Cloudinary'}), 400
+
+@app.route(f'/temp_uploads/<collection>/{VARIANTS_DIRNAME}/<filename>/<variant>')
+def serve_variant_file(collection, filename, variant):
+    """Servir les dérivés générés localement"""
+    if not public_upload_path(collection, filename, variant):
+        return jsonify({'error': 'Fichier non trouvé'}), 404
+    if not storage.remote:
+        return send_local_file(
+            os.path.join(UPLOAD_FOLDER, collection, VARIANTS_DIRNAME, filename), variant,
+            version_of=stored_sha256(collection, filename)
+        )
     else:
         return jsonify({'error': 'Utilisez les URLs Cloudinary'}), 400
 
+@app.route('/media/<collection>/<filename>')
+def serve_cached_file(collection, filename):
+    """Servir un original depuis le cache disque du mode tiered"""
+    if not isinstance(storage, TieredBackend) or collection not in COLLECTIONS:
+        return jsonify({'error': 'Fichier non trouvé'}), 404
+    
+    path = storage.open(collection, secure_filename(filename))
+    if path is None:
+        return jsonify({'error': 'Fichier non trouvé'}), 404
+    return send_local_file(os.path.dirname(path), os.path.basename(path), mimetype=sniff_image_type(path))
+
 @app.route('/static/<path:filename>')
 def serve_static(filename):
     """Servir les fichiers statiques"""
-    try:
-        return send_from_directory(app.static_folder, filename)
-    except:
-        return jsonify({'error': 'Fichier non trouvé'}), 404
+    return send_local_file(app.static_folder, filename)
+
+# ========== PAGES HTML ==========
+
+# Pages rendues une fois par processus: nom -> (clé, corps, etag)
+page_cache = {}
+
+def cached_page(name, key, render):
+    """Page HTML rendue au premier hit (puis si la clé change), avec ETag et 304"""
+    entry = page_cache.get(name)
+    if entry is None or entry[0] != key:
+        body = render().encode('utf-8')
+        entry = page_cache[name] = (key, body, hashlib.sha256(body).hexdigest()[:16])
+    _, body, etag = entry
+    response = Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 @app.route('/admin')
 def serve_admin():
     """Interface admin"""
+    path = os.path.join(app.static_folder, 'admin.html')
+    try:
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        key = None
+    return cached_page('admin', key, lambda: render_admin(path))
+
+def render_admin(path):
     try:
-        return send_from_directory(app.static_folder, 'admin.html')
-    except:
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    except OSError:
         # Fallback si admin.html n'existe pas
         return '''
         <!DOCTYPE html>
@@ -491,8 +4260,27 @@ def serve_admin():
 @app.route('/')
 def index():
     """Page d'accueil"""
-    storage_type = 'Cloudinary' if CLOUDINARY_ENABLED else 'Local (temporaire)'
-    storage_color = '#28a745' if CLOUDINARY_ENABLED else '#ffc107'
+    return cached_page('index', (storage.name, storage.remote), render_index)
+
+def render_index():
+    storage_type = {
+        'cloudinary': 'Cloudinary',
+        'tiered': 'Cloudinary + cache local'
+    }.get(storage.name, 'Local (temporaire)')
+    storage_color = '#28a745' if storage.remote else '#ffc107'
+    local_warning = '''
+            <div class="card warning">
+                <h2>⚠️ Stockage Local Temporaire</h2>
+                <p><strong>Les images seront perdues au redémarrage!</strong></p>
+                <p>Pour activer Cloudinary (stockage permanent) :</p>
+                <ol>
+                    <li>Créez un compte gratuit sur <a href="https://cloudinary.com" style="color:#d4af37;">cloudinary.com</a></li>
+                    <li>Récupérez vos credentials (cloud_name, api_key, api_secret)</li>
+                    <li>Ajoutez-les dans les variables d'environnement sur Render</li>
+                    <li>Redémarrez le service</li>
+                </ol>
+            </div>
+            ''' if not storage.remote else ''
     
     return f'''
     <!DOCTYPE html>
@@ -537,28 +4325,21 @@ def index():
             <div class="card">
                 <h2>⚡ API Endpoints</h2>
                 <p>Endpoints REST pour intégration :</p>
-                <div class="endpoint">GET <strong>/api/scan</strong> - Lister toutes les images</div>
+                <div class="endpoint">GET <strong>/api/scan</strong> - Lister toutes les images (<code>?refresh=1</code> pour relire le stockage, <code>?limit=&amp;cursor=</code> pour paginer, <code>?since=&lt;version&gt;</code> pour les changements)</div>
                 <div class="endpoint">POST <strong>/api/upload</strong> - Uploader une image</div>
+                <div class="endpoint">POST <strong>/api/upload/batch</strong> - Uploader plusieurs images</div>
+                <div class="endpoint">GET <strong>/api/jobs/&lt;id&gt;</strong> - Statut d'un upload en file d'attente (<code>/api/jobs?ids=a,b</code> en lot)</div>
                 <div class="endpoint">POST <strong>/api/delete</strong> - Supprimer une image</div>
-                <div class="endpoint">GET <strong>/api/generate-json</strong> - Générer JSON pour GitHub</div>
+                <div class="endpoint">POST <strong>/api/delete/batch</strong> - Supprimer en lot ou vider une collection</div>
+                <div class="endpoint">GET <strong>/api/events</strong> - Flux des changements du catalogue (Server-Sent Events)</div>
+                <div class="endpoint">GET <strong>/api/generate-json</strong> - Générer JSON pour GitHub (<code>?stream=1</code> en streaming)</div>
                 <div class="endpoint">GET <strong>/api/health</strong> - Vérifier le statut</div>
+                <div class="endpoint">GET <strong>/metrics</strong> - Métriques au format Prometheus</div>
                 <div class="endpoint">GET <strong>/api/test-cloudinary</strong> - Tester Cloudinary</div>
                 <a href="/api/health" class="btn">Vérifier santé</a>
             </div>
             
-            {"".join(f'''
-            <div class="card warning">
-                <h2>⚠️ Stockage Local Temporaire</h2>
-                <p><strong>Les images seront perdues au redémarrage!</strong></p>
-                <p>Pour activer Cloudinary (stockage permanent) :</p>
-                <ol>
-                    <li>Créez un compte gratuit sur <a href="https://cloudinary.com" style="color:#d4af37;">cloudinary.com</a></li>
-                    <li>Récupérez vos credentials (cloud_name, api_key, api_secret)</li>
-                    <li>Ajoutez-les dans les variables d'environnement sur Render</li>
-                    <li>Redémarrez le service</li>
-                </ol>
-            </div>
-            ''' if not CLOUDINARY_ENABLED else "")}
+            {local_warning}
             
             <div class="card info">
                 <h2>📦 Collections disponibles</h2>
@@ -592,20 +4373,60 @@ def not_found(error):
         '/': 'Page d\'accueil',
         '/admin': 'Interface admin',
         '/api/scan': 'Scanner images',
+        '/api/images': 'Rechercher, filtrer et trier les images',
         '/api/upload': 'Uploader image (POST)',
+        '/api/upload/batch': 'Uploader plusieurs images (POST)',
+        '/api/jobs/<id>': 'Statut d\'un upload en file d\'attente',
+        '/api/events': 'Flux des changements (SSE)',
         '/api/delete': 'Supprimer image (POST)',
-        '/api/health': 'Santé système'
+        '/api/delete/batch': 'Supprimer en lot (POST)',
+        '/api/health': 'Santé système',
+        '/metrics': 'Métriques Prometheus'
     }}), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    max_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({'error': f'Requête trop volumineuse (max {max_mb}MB)'}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Erreur interne du serveur', 'message': str(error)}), 500
 
+# ========== COMMANDES ==========
+
+@app.cli.command('reconcile')
+def reconcile_command():
+    """Reconstruire le magasin de métadonnées depuis le stockage (flask --app app reconcile)"""
+    for collection, count in reconcile().items():
+        print(f"{collection}: {count}")
+
+@app.cli.command('publish-snapshot')
+def publish_snapshot_command():
+    """Publier l'instantané du catalogue maintenant (flask --app app publish-snapshot)"""
+    if not SNAPSHOT_PATH:
+        print("SNAPSHOT_PATH vide: publication désactivée")
+        return
+    meta = snapshot_publisher.publish()
+    print(f"{SNAPSHOT_PATH}: version {meta['version']}, sha256 {meta['sha256'][:16]}, {meta['encodings']}")
+
+# File d'attente démarrée une fois, module entièrement chargé, par chaque
+# worker; avec gunicorn --preload le maître importe l'application et les
+# threads ne survivent pas au fork: chaque worker forké relance les siens
+start_upload_queue()
+os.register_at_fork(after_in_child=start_upload_queue)
+
 # ========== POINT D'ENTRÉE ==========
 
 if __name__ == '__main__':
+    if sys.argv[1:] == ['reconcile']:
+        for collection, count in reconcile().items():
+            print(f"{collection}: {count}")
+        sys.exit(0)
+    
     port = int(os.environ.get('PORT', 5000))
     print(f"🚀 Démarrage sur le port {port}")
     print(f"📦 Cloudinary activé: {CLOUDINARY_ENABLED}")
+    print(f"🗄️ Backend de stockage: {storage.name}")
     print(f"📁 Stockage de secours: {UPLOAD_FOLDER}")
     app.run(host='0.0.0.0', port=port, debug=False)
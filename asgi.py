@@ -0,0 +1,654 @@
+"""Mode de service asynchrone (ASGI) de l'admin RAYS CHIC.
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+/api/scan, /api/images, /api/upload, /api/delete, /api/generate-json,
+/api/events, /api/health et /api/test-cloudinary sont servies ici sans
+bloquer de worker (le flux /api/events reste ouvert longtemps): avec le
+backend cloudinary, les appels réseau passent par un client HTTP
+asynchrone avec pool de connexions; le magasin de métadonnées, le disque
+et les autres backends par des threads courts. Le reste
+(admin, fichiers locaux, lots, jobs) est délégué à l'application Flask.
+
+Dépendances: requirements-async.txt
+"""
+import asyncio
+import functools
+import os
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import FileStorage
+
+import app as core
+
+# Le SDK cloudinary (signature, URLs, exceptions) est chargé au premier
+# appel par core.cloudinary_sdk(), comme côté Flask
+
+# ========== CLIENT CLOUDINARY ASYNCHRONE ==========
+
+# Connexions simultanées vers Cloudinary pour tout le processus
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get('ASYNC_HTTP_MAX_CONNECTIONS', 100))
+ASYNC_HTTP_KEEPALIVE = int(os.environ.get('ASYNC_HTTP_KEEPALIVE', 20))
+ASYNC_HTTP_TIMEOUT = float(os.environ.get('ASYNC_HTTP_TIMEOUT', 60))
+
+# Durée d'une connexion /api/events avant reconnexion du navigateur
+ASYNC_EVENTS_STREAM_SECONDS = float(os.environ.get('ASYNC_EVENTS_STREAM_SECONDS', 300))
+
+# Mêmes exceptions que cloudinary.api selon le statut HTTP
+ERRORS_BY_STATUS = {
+    400: 'BadRequest',
+    401: 'AuthorizationRequired',
+    403: 'NotAllowed',
+    404: 'NotFound',
+    409: 'AlreadyExists',
+    420: 'RateLimited',
+    429: 'RateLimited'
+}
+
+class AsyncCloudinary:
+    """Appels Cloudinary (upload, destroy, resources, ping) via httpx.
+
+    Un seul AsyncClient par processus: les connexions TLS sont réutilisées
+    entre les requêtes. Signature et paramètres viennent du SDK officiel.
+    """
+
+    def __init__(self):
+        self.client = None
+
+    def http(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=ASYNC_HTTP_KEEPALIVE
+                ),
+                timeout=httpx.Timeout(ASYNC_HTTP_TIMEOUT, connect=10),
+                headers={'User-Agent': core.cloudinary_sdk().get_user_agent()}
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def parse(self, response):
+        exceptions = core.cloudinary_sdk().exceptions
+        try:
+            result = response.json()
+        except ValueError:
+            raise exceptions.GeneralError(f"Réponse Cloudinary illisible (HTTP {response.status_code})")
+        if response.status_code >= 400 or 'error' in result:
+            message = result.get('error', {}).get('message', f"HTTP {response.status_code}")
+            error = getattr(exceptions, ERRORS_BY_STATUS.get(response.status_code, 'GeneralError'))(message)
+            # Lus par core.track_cloudinary (limitation, durée de la pause)
+            error.http_code = response.status_code
+            retry_after = response.headers.get('retry-after', '')
+            if retry_after.isdigit():
+                error.retry_after = int(retry_after)
+            raise error
+        return result
+
+    async def admin(self, path, params=None):
+        """GET sur l'Admin API (authentification basique)"""
+        cloudinary = core.cloudinary_sdk()
+        config = cloudinary.config()
+        response = await self.http().get(
+            cloudinary.utils.base_api_url(path),
+            params={key: value for key, value in (params or {}).items() if value is not None},
+            auth=(config.api_key, config.api_secret)
+        )
+        return self.parse(response)
+
+    async def call_api(self, action, params, file=None, headers=None, resource_type='image'):
+        """POST signé sur l'API d'upload (équivalent de uploader.call_api)"""
+        cloudinary = core.cloudinary_sdk()
+        params = cloudinary.utils.sign_request(cloudinary.utils.cleanup_params(params), {})
+        data = {}
+        for key, value in params.items():
+            if isinstance(value, list):
+                data[f"{key}[]"] = [str(item) for item in value]
+            elif value:
+                data[key] = str(value)
+
+        response = await self.http().post(
+            cloudinary.utils.cloudinary_api_url(action, resource_type=resource_type),
+            data=data,
+            files={'file': file} if file else None,
+            headers=headers
+        )
+        return self.parse(response)
+
+    async def upload(self, source, size, **options):
+        """Uploader un fichier ouvert, par morceaux au-delà de chunk_size"""
+        chunk_size = options.get('chunk_size', core.CLOUDINARY_CHUNK_SIZE)
+        filename = options.get('filename') or 'stream'
+        utils = core.cloudinary_sdk().utils
+        upload_id = utils.random_public_id()
+        offset = 0
+
+        while True:
+            chunk = await asyncio.to_thread(source.read, chunk_size)
+            headers = None
+            if size > chunk_size:
+                headers = {
+                    'Content-Range': f"bytes {offset}-{offset + len(chunk) - 1}/{size}",
+                    'X-Unique-Upload-Id': upload_id
+                }
+            with core.track_cloudinary('upload'):
+                result = await self.call_api(
+                    'upload',
+                    utils.build_upload_params(**options),
+                    file=(filename, chunk),
+                    headers=headers,
+                    resource_type=options.get('resource_type', 'image')
+                )
+            offset += len(chunk)
+            options['public_id'] = result.get('public_id', options.get('public_id'))
+            if offset >= size or not chunk:
+                return result
+
+    async def destroy(self, public_id):
+        with core.track_cloudinary('destroy'):
+            return await self.call_api('destroy', {'timestamp': core.cloudinary_sdk().utils.now(), 'public_id': public_id})
+
+    async def resources(self, prefix, max_results, next_cursor=None):
+        with core.track_cloudinary('resources'):
+            return await self.admin(['resources', 'image', 'upload'], {
+                'prefix': prefix,
+                'max_results': max_results,
+                'next_cursor': next_cursor,
+                'context': 'true'
+            })
+
+    async def ping(self):
+        with core.track_cloudinary('ping'):
+            return await self.admin(['ping'])
+
+cloudinary_client = AsyncCloudinary()
+
+# ========== CONTRÔLE D'ADMISSION ==========
+
+def limited(operation, cloudinary=lambda: False, when=lambda request: True):
+    """Équivalent async de core.limited: mêmes limites, refus en 429/503 avec Retry-After"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            if not when(request):
+                return await handler(request)
+            client = core.client_address(
+                request.client.host if request.client else None, request.headers.get('x-forwarded-for')
+            )
+            try:
+                with core.admitted(operation, client, cloudinary()):
+                    return await handler(request)
+            except core.AdmissionRejected as e:
+                return JSONResponse(
+                    {'error': e.message, 'retry_after': e.retry_after},
+                    status_code=e.status, headers={'Retry-After': str(e.retry_after)}
+                )
+        return wrapper
+    return decorator
+
+def refresh_requested(request):
+    return core.wants_refresh(request.query_params)
+
+# ========== STOCKAGE ==========
+
+async def list_cloudinary_collection(collection):
+    """Lister une collection Cloudinary complète en suivant les curseurs"""
+    records = []
+    cursor = None
+    while True:
+        result = await cloudinary_client.resources(f"rayschic/{collection}/", core.CLOUDINARY_MAX_RESULTS, cursor)
+        records.extend(core.cloudinary_record(resource) for resource in result.get('resources', []))
+        cursor = result.get('next_cursor')
+        if not cursor:
+            return records
+
+async def scan_storage():
+    """Relire le stockage: toutes les collections Cloudinary en même temps"""
+    if core.storage.name != 'cloudinary':
+        return await asyncio.to_thread(core.scan_storage)
+
+    async def scan(collection):
+        try:
+            return await asyncio.wait_for(list_cloudinary_collection(collection), core.CLOUDINARY_LIST_TIMEOUT)
+        except Exception as e:
+            print(f"Erreur listing {collection}: {e!r}")
+            return None
+
+    results = await asyncio.gather(*(scan(collection) for collection in core.COLLECTIONS))
+    return dict(zip(core.COLLECTIONS, results))
+
+async def refresh_catalog():
+    """Équivalent async de ?refresh=1: relecture du stockage puis réconciliation"""
+    scanned = await scan_storage()
+    await asyncio.to_thread(core.reconcile, core.COLLECTIONS, scanned)
+
+async def claim_upload(collection, sha256):
+    """Équivalent async de core.claim_upload: l'attente ne bloque pas de thread"""
+    deadline = time.monotonic() + core.PENDING_CLAIM_WAIT
+    while True:
+        existing, key = await asyncio.to_thread(core.metadata_store.claim, collection, sha256)
+        if existing or key:
+            return existing, key
+        if time.monotonic() >= deadline:
+            raise RuntimeError('Upload du même contenu déjà en cours')
+        await asyncio.sleep(0.1)
+
+async def upload_to_cloudinary(file, collection):
+    """Même contrat que core.upload_image, réseau en async"""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        sha256 = await asyncio.to_thread(core.upload_sha256, file)
+        # Même réservation que core.upload_image: un upload identique en
+        # cours est attendu puis retourné comme doublon
+        existing, key = await claim_upload(collection, sha256)
+        if existing:
+            outcome = 'duplicate'
+            return core.duplicate_result(existing, core.storage.name, collection)
+
+        try:
+            info = await asyncio.to_thread(core.probe_upload, file)
+            file.stream.seek(0, os.SEEK_END)
+            size = file.stream.tell()
+            file.stream.seek(0)
+            result = await cloudinary_client.upload(
+                file.stream, size, **core.cloudinary_upload_options(collection, file.filename, sha256)
+            )
+        except Exception:
+            await asyncio.to_thread(core.metadata_store.release, collection, key)
+            raise
+        outcome = 'stored'
+        core.upload_bytes.observe(size, storage='cloudinary')
+        return await asyncio.to_thread(
+            core.record_cloudinary_upload, collection, result, sha256, info, key
+        )
+    except Exception as e:
+        print(f"Erreur upload: {e}")
+        return {'success': False, 'error': str(e)}
+    finally:
+        core.upload_latency.observe(time.perf_counter() - start, storage='cloudinary', result=outcome)
+
+# ========== RÉCEPTION DES UPLOADS ==========
+
+class BodyTooLarge(Exception):
+    """Corps de requête au-delà de MAX_CONTENT_LENGTH"""
+
+async def limited_body(request, limit):
+    """Corps de la requête morceau par morceau, interrompu au-delà de `limit` octets.
+
+    Compté à la réception: une requête chunked sans Content-Length est
+    bornée comme les autres.
+    """
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise BodyTooLarge()
+        yield chunk
+
+class StagedMultiPartParser(MultiPartParser):
+    """Parseur multipart dont les fichiers sont reçus dans des core.StagedUpload.
+
+    Comme StreamingUploadRequest côté Flask: écrits sur disque et hachés
+    au passage, taille contrôlée pendant la réception.
+    """
+
+    def on_headers_finished(self):
+        super().on_headers_finished()
+        upload = self._current_part.file
+        if upload is not None:
+            upload.file.close()
+            upload.file = core.StagedUpload(core.MAX_FILE_SIZE)
+            # Fermé (et supprimé) si la réception échoue
+            self._files_to_close_on_error[-1] = upload.file
+
+async def read_upload_form(request):
+    """Formulaire d'upload lu en flux; BodyTooLarge au-delà de MAX_CONTENT_LENGTH"""
+    if not request.headers.get('content-type', '').startswith('multipart/form-data'):
+        raise MultiPartException('Formulaire multipart attendu')
+    limit = core.app.config['MAX_CONTENT_LENGTH']
+    return await StagedMultiPartParser(request.headers, limited_body(request, limit), max_files=1).parse()
+
+# ========== ROUTES ==========
+
+def catalog_response(etag, data, headers=None):
+    """Équivalent de core.catalog_response: JSON ou 304 avec l'ETag du catalogue"""
+    headers = dict(headers or {}, **{'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'})
+    if data is None:
+        return Response(status_code=304, headers=headers)
+    if isinstance(data, Response):
+        data.headers.update(headers)
+        return data
+    return JSONResponse(data, headers=headers)
+
+async def conditional_listing(request, kind, build):
+    if core.wants_refresh(request.query_params):
+        await refresh_catalog()
+    return await asyncio.to_thread(
+        core.conditional_listing, kind, request.query_params,
+        request.headers.get('if-none-match'), build, False
+    )
+
+def delta_unavailable(error):
+    return JSONResponse({'error': str(error), 'version': core.catalog_index.stamp()[0]}, status_code=410)
+
+@limited('list', cloudinary=core.uses_remote_storage, when=refresh_requested)
+async def api_scan(request):
+    """API: Scanner toutes les images (ETag, 304 et ?since=<version>)"""
+    try:
+        etag, data = await conditional_listing(
+            request, 'scan', lambda: core.get_listing(request.query_params, False)
+        )
+        return catalog_response(etag, data)
+    except core.DeltaUnavailable as e:
+        return delta_unavailable(e)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+async def api_images(request):
+    """API: Rechercher, filtrer et trier les images (une page à la fois)"""
+    try:
+        return JSONResponse(await asyncio.to_thread(core.search_images, request.query_params))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@limited('upload', cloudinary=core.uploads_reach_cloudinary)
+async def api_upload(request):
+    """API: Uploader une image"""
+    max_length = core.app.config['MAX_CONTENT_LENGTH']
+    too_large = JSONResponse({'error': f'Requête trop volumineuse (max {max_length // (1024 * 1024)}MB)'}, status_code=413)
+    if int(request.headers.get('content-length') or 0) > max_length:
+        return too_large
+
+    try:
+        form = await read_upload_form(request)
+    except BodyTooLarge:
+        return too_large
+    except MultiPartException as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    try:
+        upload = form.get('file')
+        if upload is None or isinstance(upload, str):
+            return JSONResponse({'error': 'Aucun fichier fourni'}, status_code=400)
+
+        if 'collection' not in form:
+            return JSONResponse({'error': 'Collection non spécifiée'}, status_code=400)
+
+        file = FileStorage(stream=upload.file, filename=upload.filename or '')
+        collection = form['collection']
+
+        # Sondage de l'en-tête (l'empreinte est déjà calculée): hors de la boucle d'événements
+        error = await asyncio.to_thread(core.validate_upload, file, collection)
+        if error:
+            return JSONResponse({'error': error}, status_code=400)
+
+        if core.queue_enabled():
+            result = await asyncio.to_thread(core.enqueue_upload, file, collection)
+        elif core.storage.name == 'cloudinary':
+            result = await upload_to_cloudinary(file, collection)
+        else:
+            # Stockage local ou tiered: passe par le backend synchrone
+            result = await asyncio.to_thread(core.upload_image, file, collection)
+
+        payload, status = core.upload_response(result, collection)
+        return JSONResponse(payload, status_code=status)
+
+    except Exception as e:
+        print(f"Upload error: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+    finally:
+        # Fichier reçu non déplacé: supprimé
+        await form.close()
+
+@limited('delete', cloudinary=core.uses_remote_storage)
+async def api_delete(request):
+    """API: Supprimer une image"""
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+
+        if not data:
+            return JSONResponse({'error': 'Données JSON requises'}, status_code=400)
+
+        collection = data.get('collection')
+        filename = data.get('filename')
+
+        if not collection or not filename:
+            return JSONResponse({'error': 'Collection et nom de fichier requis'}, status_code=400)
+
+        if collection not in core.COLLECTIONS:
+            return JSONResponse({'error': f'Collection invalide: {collection}'}, status_code=400)
+
+        if core.storage.name == 'cloudinary':
+            name = core.secure_filename(filename)
+            status = core.destroy_status(await cloudinary_client.destroy(core.collection_public_id(collection, name)))
+            if status['status'] == 'error':
+                result = {'success': False, 'error': status['error']}
+            else:
+                # Déjà absente chez Cloudinary: retirée du catalogue aussi
+                await asyncio.to_thread(core.forget_images, [(collection, name)])
+                result = {'success': True, 'storage': 'cloudinary'}
+        else:
+            result = await asyncio.to_thread(core.delete_image, collection, filename)
+
+        if result['success']:
+            return JSONResponse({
+                'success': True,
+                'message': 'Image supprimée avec succès',
+                'storage': result['storage']
+            })
+        return JSONResponse({'error': result['error']}, status_code=500)
+
+    except Exception as e:
+        print(f"Delete error: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@limited('list', cloudinary=core.uses_remote_storage, when=refresh_requested)
+async def api_generate_json(request):
+    """API: Générer le JSON pour GitHub"""
+    headers = {'Content-Disposition': 'attachment; filename=rayschic-images.json'}
+    try:
+        if core.wants_stream(request.query_params):
+            # Générateur synchrone: Starlette le parcourt dans un thread
+            build = lambda: StreamingResponse(core.stream_github_data(), media_type='application/json')
+        else:
+            build = lambda: Response(
+                core.github_json(core.format_github_data(core.get_listing(request.query_params, False))),
+                media_type='application/json'
+            )
+        etag, data = await conditional_listing(request, 'github', build)
+        return catalog_response(etag, data, headers)
+
+    except core.DeltaUnavailable as e:
+        return delta_unavailable(e)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+class VersionWatcher:
+    """Surveille la version du magasin pour tous les flux /api/events du processus.
+
+    Une seule lecture SQLite par EVENTS_POLL_INTERVAL, quel que soit le
+    nombre de connexions; chacune ne relit le journal qu'après un
+    changement. La tâche s'arrête quand plus personne n'écoute.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.version = None
+        self.generation = 0
+        self.subscribers = 0
+        self.task = None
+        self.loop = None
+        self.condition = None
+
+    async def run(self):
+        while self.subscribers:
+            try:
+                version = await asyncio.to_thread(core.metadata_store.version)
+            except Exception as e:
+                print(f"Erreur lecture de version: {e}")
+                version = self.version
+            if version != self.version:
+                self.version = version
+                async with self.condition:
+                    self.generation += 1
+                    self.condition.notify_all()
+            await asyncio.sleep(self.interval)
+        self.task = None
+
+    @asynccontextmanager
+    async def subscribe(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            # Condition et tâche appartiennent à une boucle d'événements
+            self.loop, self.condition, self.task, self.subscribers = loop, asyncio.Condition(), None, 0
+        self.subscribers += 1
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+        try:
+            yield self
+        finally:
+            self.subscribers -= 1
+
+    async def wait(self, generation, timeout):
+        """Attendre un changement après `generation`: True, ou False après timeout secondes"""
+        async with self.condition:
+            try:
+                await asyncio.wait_for(self.condition.wait_for(lambda: self.generation != generation), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+version_watcher = VersionWatcher(core.EVENTS_POLL_INTERVAL)
+
+async def event_stream(since):
+    """Équivalent async de core.event_stream: une connexion ne coûte qu'une tâche"""
+    yield f"retry: {core.EVENTS_RETRY_MS}\nid: {since}\n\n"
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + ASYNC_EVENTS_STREAM_SECONDS
+    last_write = loop.time()
+    async with version_watcher.subscribe():
+        # Rattrapage du retard d'abord, puis à chaque changement de version
+        pending = True
+        while True:
+            if pending:
+                generation = version_watcher.generation
+                since, text = await asyncio.to_thread(core.poll_events, since)
+                if text:
+                    yield text
+                    last_write = loop.time()
+                # Un lot plein (EVENTS_BATCH) peut avoir une suite: relire
+                pending = bool(text)
+            if loop.time() >= deadline:
+                return
+            if not pending:
+                timeout = min(deadline, last_write + core.EVENTS_HEARTBEAT) - loop.time()
+                pending = await version_watcher.wait(generation, max(0, timeout))
+                if not pending and loop.time() - last_write >= core.EVENTS_HEARTBEAT:
+                    yield ': ping\n\n'
+                    last_write = loop.time()
+
+async def api_events(request):
+    """API: Flux des changements du catalogue (Server-Sent Events)"""
+    try:
+        since = await asyncio.to_thread(core.events_start, request.query_params, request.headers)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    return StreamingResponse(
+        event_stream(since),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+async def api_health(request):
+    """API: Vérifier la santé"""
+    return JSONResponse(dict(core.health_status(), server='asgi'))
+
+@limited('ping', cloudinary=lambda: core.CLOUDINARY_ENABLED)
+async def test_cloudinary(request):
+    """Tester la connexion Cloudinary"""
+    if not core.CLOUDINARY_ENABLED:
+        return JSONResponse({
+            'success': False,
+            'cloudinary': 'disabled',
+            'message': 'Cloudinary non configuré. Stockage local utilisé.'
+        })
+
+    try:
+        result = await cloudinary_client.ping()
+        return JSONResponse({'success': True, 'cloudinary': 'connected', 'response': result})
+    except Exception as e:
+        return JSONResponse({'success': False, 'cloudinary': 'disconnected', 'error': str(e)}, status_code=500)
+
+class RouteMetricsMiddleware:
+    """Durée des routes servies ici (les routes Flask sont mesurées par Flask)"""
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+
+        async def send_timed(message):
+            if message['type'] == 'http.response.start':
+                core.http_latency.observe(
+                    time.perf_counter() - start,
+                    method=scope['method'], route=scope['path'], status=str(message['status'])
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_timed)
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await cloudinary_client.close()
+
+async_routes = [
+    Route('/api/scan', api_scan, methods=['GET']),
+    Route('/api/images', api_images, methods=['GET']),
+    Route('/api/upload', api_upload, methods=['POST']),
+    Route('/api/delete', api_delete, methods=['POST']),
+    Route('/api/generate-json', api_generate_json, methods=['GET']),
+    Route('/api/events', api_events, methods=['GET']),
+    Route('/api/health', api_health, methods=['GET']),
+    Route('/api/test-cloudinary', test_cloudinary, methods=['GET'])
+]
+
+app = Starlette(
+    routes=async_routes + [
+        # Tout le reste: application Flask (admin, fichiers, lots, jobs, /metrics)
+        Mount('/', WSGIMiddleware(core.app))
+    ],
+    middleware=[
+        # Comme CORS(app) côté Flask: toutes origines
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(RouteMetricsMiddleware, paths={route.path for route in async_routes})
+    ],
+    lifespan=lifespan
+)
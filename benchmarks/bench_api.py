@@ -0,0 +1,478 @@
+"""Suite de benchmarks de l'API: stockage local et faux Cloudinary, avec baseline
+
+Chaque configuration (stockage x taille de catalogue) tourne contre un vrai
+serveur gunicorn (comme render.yaml), lancé dans un dossier vierge dont le
+catalogue est rempli avant le démarrage:
+
+    scan                      GET /api/scan (catalogue complet)
+    scan_parallel             GET /api/scan, --concurrency clients
+    generate_json             GET /api/generate-json
+    search_text               GET /api/images?q=... (index des trigrammes)
+    search_sorted             GET /api/images?sort=size (index trié, une page)
+    upload_<taille>           POST /api/upload, un à la fois
+    upload_<taille>_parallel  POST /api/upload, --concurrency clients
+    delete_batch              POST /api/delete/batch des images uploadées
+
+Pour chaque scénario: p50/p95/p99, débit, erreurs et pic de RSS du
+serveur (VmHWM, Linux). Avec une baseline (--baseline, par défaut
+benchmarks/baseline.json si présente), le script sort en erreur si un
+scénario régresse au-delà de --tolerance. --save-baseline enregistre les
+résultats comme nouvelle référence, avec la machine (CPU, mémoire,
+Python) et les réglages de la mesure. Des réglages différents de ceux
+de la baseline rendent la comparaison impossible (code 2); une autre
+machine la rend seulement indicative (avertissement). La baseline
+suivie dans le dépôt ne vaut que pour sa machine: ailleurs, en générer
+une d'abord avec les réglages par défaut:
+
+    python benchmarks/bench_api.py --save-baseline --baseline /tmp/baseline.json
+    python benchmarks/bench_api.py --baseline /tmp/baseline.json
+
+Usage:
+    python benchmarks/bench_api.py                          # local + cloudinary, 10 et 1k images
+    python benchmarks/bench_api.py --sizes 10 1000 50000    # suite complète (long)
+    python benchmarks/bench_api.py --backends local --save-baseline
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_cloudinary import FakeCloudinaryServer
+from fake_images import jpeg_bytes
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+COLLECTIONS = ['hero', 'costumes', 'chemises', 'pantalons', 'vestes', 'tenues', 'accessoires']
+UPLOAD_COLLECTION = 'tenues'
+
+# En deçà de ces écarts absolus, une différence est du bruit de mesure
+LATENCY_SLACK = 0.005
+RSS_SLACK = 8 * 1024 * 1024
+
+# Réglages qui changent les mesures (--backends et --sizes ne font que
+# choisir les scénarios)
+MEASURE_SETTINGS = ('latency', 'requests', 'uploads', 'upload_sizes', 'concurrency', 'workers', 'admission')
+
+
+# ========== CLIENT HTTP ==========
+
+class Client:
+    """Connexions keep-alive, une par thread"""
+
+    def __init__(self, port):
+        self.port = port
+        self.local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        """Retourner (statut, durée en secondes, corps)"""
+        for attempt in (0, 1):
+            conn = getattr(self.local, 'conn', None)
+            if conn is None:
+                conn = self.local.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=600)
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+                return response.status, time.perf_counter() - start, data
+            except (http.client.HTTPException, OSError):
+                # Connexion fermée par le serveur entre deux requêtes: une reprise
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    for name, filename, content in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def parse_size(value):
+    units = {'k': 1024, 'm': 1024 * 1024}
+    value = value.strip().lower()
+    if value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# ========== SERVEUR ==========
+
+def process_tree(pid):
+    """pid et descendants (Linux: /proc/<pid>/task/*/children)"""
+    pids = [pid]
+    for current in pids:
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def peak_rss(pid):
+    """Pic de RSS du plus gros processus du serveur (octets), None hors Linux"""
+    peaks = []
+    for current in process_tree(pid):
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        peaks.append(int(line.split()[1]) * 1024)
+        except OSError:
+            continue
+    return max(peaks) if peaks else None
+
+
+class Server:
+    def __init__(self, workdir, env, workers):
+        self.workdir = workdir
+        self.env = env
+        self.workers = workers
+        self.port = free_port()
+        self.process = None
+
+    def start(self):
+        self.log = open(os.path.join(self.workdir, 'server.log'), 'wb')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'app:app', '-w', str(self.workers),
+             '-b', f'127.0.0.1:{self.port}', '--timeout', '600'],
+            cwd=self.workdir, env=self.env, stdout=self.log, stderr=subprocess.STDOUT
+        )
+        client = Client(self.port)
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            try:
+                if client.request('GET', '/api/health')[0] == 200:
+                    return client
+            except OSError:
+                pass
+            if self.process.poll() is not None:
+                break
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"Serveur non démarré, voir {self.log.name}")
+
+    def peak_rss(self):
+        return peak_rss(self.process.pid)
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait()
+        self.log.close()
+
+
+def seed_local(workdir, size):
+    """Écrire `size` petits fichiers distincts par collection"""
+    for collection in COLLECTIONS:
+        folder = os.path.join(workdir, 'temp_uploads', collection)
+        os.makedirs(folder, exist_ok=True)
+        for index in range(size):
+            with open(os.path.join(folder, f"img_{index:05d}.jpg"), 'wb') as f:
+                f.write(jpeg_bytes(0, payload=f"{collection}-{index}".encode() * 16))
+
+
+def reconcile(workdir, env):
+    """Remplir le magasin de métadonnées avant le démarrage (hors mesure)"""
+    subprocess.run(
+        [sys.executable, '-c', 'import app; app.reconcile()'],
+        cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL
+    )
+
+
+# ========== SCÉNARIOS ==========
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def run_scenario(client, count, concurrency, make_request):
+    """Envoyer `count` requêtes (make_request(i) -> méthode, chemin, corps, en-têtes)"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(index):
+        nonlocal errors
+        method, path, body, headers = make_request(index)
+        try:
+            status, duration, _ = client.request(method, path, body, headers)
+        except OSError:
+            status, duration = None, None
+        with lock:
+            if status is None or status >= 400:
+                errors += 1
+            else:
+                latencies.append(duration)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(count)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': count,
+        'errors': errors,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'throughput': len(latencies) / elapsed if elapsed else None
+    }
+
+
+def scenarios(args, size):
+    """(nom, nombre de requêtes, concurrence, fabrique de requêtes)"""
+    # Un gros catalogue fait des réponses de plusieurs dizaines de Mo
+    reads = args.requests if size < 10000 else max(5, args.requests // 10)
+    uploaded = []
+    lock = threading.Lock()
+
+    def get(path):
+        return lambda index: ('GET', path, None, {})
+
+    def upload(file_size, tag):
+        def make(index):
+            filename = f"bench_{tag}_{index}_{uuid.uuid4().hex[:8]}.jpg"
+            with lock:
+                uploaded.append(filename)
+            body, content_type = multipart(
+                {'collection': UPLOAD_COLLECTION},
+                [('file', filename, jpeg_bytes(file_size))]
+            )
+            return 'POST', '/api/upload', body, {'Content-Type': content_type}
+        return make
+
+    def delete_batch(index):
+        body = json.dumps({'items': [
+            {'collection': UPLOAD_COLLECTION, 'filename': filename} for filename in uploaded
+        ]}).encode()
+        return 'POST', '/api/delete/batch', body, {'Content-Type': 'application/json'}
+
+    yield 'scan', reads, 1, get('/api/scan')
+    yield 'scan_parallel', reads, args.concurrency, get('/api/scan')
+    yield 'generate_json', reads, 1, get('/api/generate-json')
+    # Noms img_00042 (local) ou image_00042 (faux Cloudinary)
+    yield 'search_text', reads, 1, get('/api/images?q=0004&limit=50')
+    yield 'search_sorted', reads, 1, get('/api/images?sort=size&limit=50')
+    for label, file_size in args.upload_sizes:
+        yield f"upload_{label}", args.uploads, 1, upload(file_size, label)
+        yield f"upload_{label}_parallel", args.uploads, args.concurrency, upload(file_size, f"{label}p")
+    yield 'delete_batch', 1, 1, delete_batch
+
+
+def run_configuration(args, backend, size):
+    workdir = tempfile.mkdtemp(prefix=f'rayschic-bench-{backend}-')
+    # Instantané publié dans le dossier du serveur, pas dans static/ du dépôt;
+    # un seul client local: le contrôle d'admission refuserait la rafale
+    env = dict(os.environ, PYTHONPATH=REPO, UPLOAD_QUEUE='0', SNAPSHOT_PATH='images.json',
+               ADMISSION_ENABLED='1' if args.admission else '0')
+    for key in ('CLOUDINARY_CLOUD_NAME', 'CLOUDINARY_CLOUD', 'CLOUDINARY_API_KEY', 'CLOUDINARY_KEY',
+                'CLOUDINARY_API_SECRET', 'CLOUDINARY_SECRET', 'STORAGE_BACKEND', 'CLOUDINARY_URL'):
+        env.pop(key, None)
+    fake = None
+    if backend == 'cloudinary':
+        fake = FakeCloudinaryServer(latency=args.latency, images_per_collection=size).start()
+        env.update(
+            CLOUDINARY_CLOUD_NAME='fake-cloud',
+            CLOUDINARY_API_KEY='key',
+            CLOUDINARY_API_SECRET='secret',
+            CLOUDINARY_UPLOAD_PREFIX=fake.url
+        )
+    else:
+        seed_local(workdir, size)
+
+    server = None
+    results = {}
+    try:
+        reconcile(workdir, env)
+        server = Server(workdir, env, args.workers)
+        client = server.start()
+        for name, count, concurrency, make_request in scenarios(args, size):
+            result = run_scenario(client, count, concurrency, make_request)
+            result['peak_rss'] = server.peak_rss()
+            results[f"{backend}/{size}/{name}"] = result
+            print_result(f"{backend}/{size}/{name}", result)
+    finally:
+        if server:
+            server.stop()
+        if fake:
+            fake.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+# ========== RAPPORT ET BASELINE ==========
+
+def ms(value):
+    return f"{value * 1000:8.1f}" if value is not None else '       -'
+
+
+def print_result(key, result):
+    rss = result['peak_rss']
+    print(f"{key:<42} p50 {ms(result['p50'])} ms  p95 {ms(result['p95'])} ms  p99 {ms(result['p99'])} ms  "
+          f"{result['throughput'] or 0:8.1f} req/s  {result['errors']:3d} err  "
+          f"RSS {rss / 1024 / 1024 if rss else 0:6.0f} MB")
+
+
+def machine_info():
+    """Machine de la mesure, enregistrée avec la baseline"""
+    info = {
+        'system': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'cpu': platform.processor() or platform.machine(),
+        'memory': None
+    }
+    try:
+        with open('/proc/cpuinfo') as f:
+            info['cpu'] = next(line.split(':', 1)[1].strip() for line in f if line.startswith('model name'))
+    except (OSError, StopIteration):
+        pass
+    try:
+        with open('/proc/meminfo') as f:
+            info['memory'] = next(int(line.split()[1]) * 1024 for line in f if line.startswith('MemTotal:'))
+    except (OSError, StopIteration):
+        pass
+    return info
+
+
+def measure_settings(args):
+    settings = {name: getattr(args, name) for name in MEASURE_SETTINGS}
+    settings['upload_sizes'] = [label for label, _ in args.upload_sizes]
+    return settings
+
+
+def load_baseline(path):
+    """(machine, réglages, résultats) d'une baseline"""
+    with open(path) as f:
+        data = json.load(f)
+    return data.get('machine'), data.get('settings'), data['results']
+
+
+def differences(expected, actual):
+    return [f"{key}: {expected.get(key)!r} -> {actual.get(key)!r}"
+            for key in sorted(set(expected) | set(actual)) if expected.get(key) != actual.get(key)]
+
+
+def compare(results, baseline, tolerance):
+    """Lister les régressions par rapport à la baseline"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if result['errors'] > base.get('errors', 0):
+            regressions.append(f"{key}: {result['errors']} erreurs (baseline {base.get('errors', 0)})")
+        for metric in ('p50', 'p95', 'p99'):
+            if result[metric] is None or base.get(metric) is None:
+                continue
+            if result[metric] > base[metric] * (1 + tolerance) and result[metric] - base[metric] > LATENCY_SLACK:
+                regressions.append(f"{key}: {metric} {ms(result[metric]).strip()} ms (baseline {ms(base[metric]).strip()} ms)")
+        if result['throughput'] and base.get('throughput') and result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{key}: {result['throughput']:.1f} req/s (baseline {base['throughput']:.1f})")
+        if (result['peak_rss'] and base.get('peak_rss')
+                and result['peak_rss'] > base['peak_rss'] * (1 + tolerance)
+                and result['peak_rss'] - base['peak_rss'] > RSS_SLACK):
+            regressions.append(f"{key}: RSS {result['peak_rss'] // 2**20} MB (baseline {base['peak_rss'] // 2**20} MB)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', choices=['local', 'cloudinary'], default=['local', 'cloudinary'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000], help='images par collection')
+    parser.add_argument('--latency', type=float, default=0.05, help='latence du faux Cloudinary (s)')
+    parser.add_argument('--requests', type=int, default=50, help='requêtes par scénario de lecture')
+    parser.add_argument('--uploads', type=int, default=20, help='uploads par scénario')
+    parser.add_argument('--upload-sizes', nargs='+', default=['100k', '1m', '5m'])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=1, help='workers gunicorn (render.yaml: 1)')
+    parser.add_argument('--admission', action='store_true', help='garder le contrôle d\'admission (429/503 comptés en erreurs)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='écart toléré (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--output', help='écrire les résultats en JSON')
+    args = parser.parse_args()
+    args.upload_sizes = [(label.lower(), parse_size(label)) for label in args.upload_sizes]
+
+    results = {}
+    for backend in args.backends:
+        for size in args.sizes:
+            print(f"\n== {backend}, {size} images par collection")
+            results.update(run_configuration(args, backend, size))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    machine, settings = machine_info(), measure_settings(args)
+    if args.save_baseline:
+        baseline = {}
+        # Résultats ajoutés à ceux de la même machine et des mêmes réglages
+        if os.path.exists(args.baseline):
+            base_machine, base_settings, base_results = load_baseline(args.baseline)
+            if base_machine == machine and base_settings == settings:
+                baseline = base_results
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': machine, 'settings': settings, 'results': baseline}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline enregistrée: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nPas de baseline ({args.baseline}): --save-baseline pour en créer une")
+        return 0
+    base_machine, base_settings, base_results = load_baseline(args.baseline)
+    changed = differences(base_settings or {}, settings)
+    if changed:
+        print(f"\nRéglages différents de la baseline ({args.baseline}), pas de comparaison:")
+        for line in changed:
+            print(f"  {line}")
+        return 2
+    changed = differences(base_machine or {}, machine)
+    if changed:
+        print("\n⚠️ Baseline mesurée sur une autre machine, comparaison indicative:")
+        for line in changed:
+            print(f"  {line}")
+    regressions = compare(results, base_results, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} régression(s) au-delà de {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nAucune régression au-delà de {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Test de charge: déploiement sync (gunicorn) vs mode async (uvicorn asgi:app)
+
+Les deux serveurs parlent à un faux Cloudinary HTTP avec latence. Chaque
+client enchaîne uploads, /api/scan et /api/health; on mesure le débit et
+les latences par route.
+
+Usage: python benchmarks/bench_async.py [--latency 0.3] [--concurrency 50] [--duration 10]
+Dépendances: requirements-async.txt
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_cloudinary import FakeCloudinaryServer
+from fake_images import jpeg_bytes
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIX = ('upload', 'scan', 'health')
+
+
+def start_server(command, port, env):
+    """Lancer un serveur dans un dossier vierge et attendre /api/health"""
+    workdir = tempfile.mkdtemp(prefix='rayschic-load-')
+    process = subprocess.Popen(
+        command, cwd=workdir, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return process, workdir
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Serveur non démarré: {' '.join(command)}")
+
+
+async def client(http, base, deadline, latencies, errors, worker):
+    counter = 0
+    while time.monotonic() < deadline:
+        kind = MIX[counter % len(MIX)]
+        counter += 1
+        start = time.perf_counter()
+        try:
+            if kind == 'upload':
+                # Contenu unique: pas de dédoublonnage
+                content = jpeg_bytes(0, payload=f"{worker}-{counter}-{time.time_ns()}".encode() * 64)
+                response = await http.post(
+                    f"{base}/api/upload",
+                    data={'collection': 'tenues'},
+                    files={'file': (f"load_{worker}_{counter}.jpg", content, 'image/jpeg')}
+                )
+            elif kind == 'scan':
+                response = await http.get(f"{base}/api/scan?limit=20&collection=tenues")
+            else:
+                response = await http.get(f"{base}/api/health")
+            if response.status_code >= 400:
+                errors[kind] += 1
+                continue
+        except httpx.HTTPError:
+            errors[kind] += 1
+            continue
+        latencies[kind].append(time.perf_counter() - start)
+
+
+async def load(base, concurrency, duration):
+    latencies = {kind: [] for kind in MIX}
+    errors = {kind: 0 for kind in MIX}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as http:
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(
+            client(http, base, deadline, latencies, errors, worker) for worker in range(concurrency)
+        ))
+    return latencies, errors
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def report(label, latencies, errors, duration):
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n{label}: {total / duration:.1f} req/s")
+    for kind in MIX:
+        values = latencies[kind]
+        print(f"  {kind:>7}: {len(values):5d} ok, {errors[kind]:4d} erreurs, "
+              f"p50 {percentile(values, 0.50) * 1000:7.0f} ms, "
+              f"p95 {percentile(values, 0.95) * 1000:7.0f} ms, "
+              f"p99 {percentile(values, 0.99) * 1000:7.0f} ms"
+              + (f", moyenne {statistics.mean(values) * 1000:.0f} ms" if values else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.3, help='latence du faux Cloudinary (s)')
+    parser.add_argument('--concurrency', type=int, default=50, help='clients simultanés')
+    parser.add_argument('--duration', type=float, default=10, help='durée par scénario (s)')
+    parser.add_argument('--sync-workers', type=int, default=1, help='workers gunicorn (render.yaml: 1)')
+    args = parser.parse_args()
+
+    fake = FakeCloudinaryServer(latency=args.latency).start()
+    env = dict(
+        os.environ,
+        PYTHONPATH=REPO,
+        SNAPSHOT_PATH='images.json',
+        # Capacité brute: pas de refus 429/503 pour la rafale d'un seul client
+        ADMISSION_ENABLED='0',
+        CLOUDINARY_CLOUD_NAME='fake-cloud',
+        CLOUDINARY_API_KEY='key',
+        CLOUDINARY_API_SECRET='secret',
+        CLOUDINARY_UPLOAD_PREFIX=fake.url
+    )
+    scenarios = (
+        ('sync (gunicorn)', 8101, [sys.executable, '-m', 'gunicorn', 'app:app',
+                                   '-w', str(args.sync_workers), '-b', '127.0.0.1:8101']),
+        ('async (uvicorn)', 8102, [sys.executable, '-m', 'uvicorn', 'asgi:app',
+                                   '--port', '8102', '--log-level', 'warning']),
+    )
+    try:
+        for label, port, command in scenarios:
+            process, workdir = start_server(command, port, env)
+            try:
+                latencies, errors = asyncio.run(load(f"http://127.0.0.1:{port}", args.concurrency, args.duration))
+                report(label, latencies, errors, args.duration)
+            finally:
+                process.terminate()
+                process.wait()
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
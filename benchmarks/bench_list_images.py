@@ -0,0 +1,61 @@
+"""Benchmark: relecture Cloudinary (scan_storage) séquentielle vs parallèle (faux Cloudinary)
+
+Usage: python benchmarks/bench_list_images.py [--latency 0.2] [--slow 2.0]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(app, runs):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        data = app.scan_storage()
+        durations.append(time.perf_counter() - start)
+    return durations, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.2, help='latence par appel (s)')
+    parser.add_argument('--slow', type=float, default=0.0,
+                        help='latence de la collection "vestes" (0 = désactivé)')
+    parser.add_argument('--timeout', type=float, default=1.0, help='délai par collection (s)')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # app.py crée temp_uploads dans le répertoire courant
+    os.chdir(tempfile.mkdtemp(prefix='rayschic-bench-'))
+    import app
+    from fake_cloudinary import FakeCloudinaryAPI
+
+    slow = {'rayschic/vestes/': args.slow} if args.slow else {}
+    FakeCloudinaryAPI(latency=args.latency, slow_prefixes=slow).install(app)
+    # Le séquentiel n'a pas de délai: il représente l'ancien comportement
+    scenarios = (
+        ('séquentiel', 1, 3600),
+        ('parallèle', len(app.COLLECTIONS), args.timeout),
+    )
+    for label, workers, timeout in scenarios:
+        app.CLOUDINARY_LIST_TIMEOUT = timeout
+        app.cloudinary_list_executor = ThreadPoolExecutor(max_workers=workers)
+        durations, data = measure(app, args.runs)
+        errors = [k for k, records in data.items() if records is None]
+        print(f"{label:>11} (pool={workers}): "
+              f"médiane {statistics.median(durations) * 1000:.0f} ms, "
+              f"max {max(durations) * 1000:.0f} ms, "
+              f"collections en erreur: {errors or 'aucune'}")
+        app.cloudinary_list_executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == '__main__':
+    main()
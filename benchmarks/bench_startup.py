@@ -0,0 +1,107 @@
+"""Budget de démarrage à froid: import de app.py et première requête
+
+Chaque mesure se fait dans un processus neuf (comme un worker gunicorn
+qui démarre): durée de `import app`, puis de la première requête sur /,
+/api/health et /admin. Affiche les modules les plus lents (-X importtime)
+et sort en erreur si la médiane de l'import dépasse --budget-ms.
+
+Usage: python benchmarks/bench_startup.py [--runs 7] [--budget-ms 300] [--cloudinary]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+timings = {'import': imported - start}
+for path in ('/', '/api/health', '/admin'):
+    begin = time.perf_counter()
+    client.get(path).close()
+    timings[path] = time.perf_counter() - begin
+timings['first_request'] = time.perf_counter() - start
+timings['cloudinary_loaded'] = 'cloudinary' in sys.modules
+timings['pillow_loaded'] = 'PIL' in sys.modules
+print(json.dumps(timings))
+'''
+
+
+def run_probe(env, workdir):
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=workdir, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(env, workdir, top):
+    """Modules les plus coûteux d'après -X importtime (cumulé, microsecondes)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=workdir, env=env,
+        capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        # Imports directs de app.py seulement (la hiérarchie est indentée)
+        if name.startswith('   ') and not name.startswith('     '):
+            rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=7, help='processus neufs mesurés')
+    parser.add_argument('--budget-ms', type=float, default=300, help='médiane maximale de `import app`')
+    parser.add_argument('--top', type=int, default=10, help='modules affichés')
+    parser.add_argument('--cloudinary', action='store_true', help='variables Cloudinary définies (factices)')
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=REPO, SNAPSHOT_PATH='images.json')
+    for key in ('CLOUDINARY_CLOUD_NAME', 'CLOUDINARY_CLOUD', 'CLOUDINARY_API_KEY', 'CLOUDINARY_KEY',
+                'CLOUDINARY_API_SECRET', 'CLOUDINARY_SECRET', 'STORAGE_BACKEND'):
+        env.pop(key, None)
+    if args.cloudinary:
+        env.update(CLOUDINARY_CLOUD_NAME='fake-cloud', CLOUDINARY_API_KEY='key', CLOUDINARY_API_SECRET='secret')
+
+    # Dossier vierge (temp_uploads, catalogue), static/ pour /admin
+    workdir = tempfile.mkdtemp(prefix='rayschic-startup-')
+    shutil.copytree(os.path.join(REPO, 'static'), os.path.join(workdir, 'static'))
+    try:
+        run_probe(env, workdir)  # caches .pyc et schéma SQLite
+        runs = [run_probe(env, workdir) for _ in range(args.runs)]
+        profile = import_profile(env, workdir, args.top)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    mode = 'cloudinary' if args.cloudinary else 'local'
+    print(f"{args.runs} démarrages à froid ({mode})")
+    for key in ('import', '/', '/api/health', '/admin', 'first_request'):
+        values = [run[key] * 1000 for run in runs]
+        print(f"  {key:>14}: médiane {statistics.median(values):7.1f} ms, max {max(values):7.1f} ms")
+    print(f"  SDK Cloudinary chargé: {runs[-1]['cloudinary_loaded']}, Pillow chargé: {runs[-1]['pillow_loaded']}")
+    print("\nImports les plus lents (cumulé):")
+    for cumulative_us, name in profile:
+        print(f"  {cumulative_us / 1000:7.1f} ms  {name}")
+
+    median_import = statistics.median(run['import'] for run in runs) * 1000
+    if median_import > args.budget_ms:
+        print(f"\n❌ import app: {median_import:.0f} ms > budget {args.budget_ms:.0f} ms")
+        sys.exit(1)
+    print(f"\n✅ import app: {median_import:.0f} ms (budget {args.budget_ms:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark: originaux servis via le cache disque du mode tiered
+
+Un backend distant factice (latence injectée) reçoit des images hero et
+costumes; on rejoue ensuite des vues à popularité de Zipf sur /media/...
+et on compte les téléchargements évités selon la taille du cache.
+
+Usage: python benchmarks/bench_tiered_cache.py [--images 200] [--views 5000] [--latency 0.02]
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=200, help='images par collection')
+    parser.add_argument('--image-kb', type=int, default=200)
+    parser.add_argument('--views', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.02, help='latence du distant (s)')
+    parser.add_argument('--cache-mb', type=float, nargs='+', default=[5, 20, 100])
+    args = parser.parse_args()
+
+    # app.py crée temp_uploads dans le répertoire courant
+    os.chdir(tempfile.mkdtemp(prefix='rayschic-bench-'))
+    os.environ.setdefault('SNAPSHOT_PATH', 'images.json')
+    os.environ.setdefault('ADMISSION_ENABLED', '0')
+    import app
+    from fake_storage import FakeRemoteBackend
+    from fake_images import jpeg_bytes
+
+    remote = FakeRemoteBackend(latency=args.latency)
+    collections = ['hero', 'costumes']
+    app.storage = app.TieredBackend(remote, app.DiskLRUCache('cache-seed', 0), collections)
+    client = app.app.test_client()
+    for collection in collections:
+        for index in range(args.images):
+            content = jpeg_bytes(args.image_kb * 1024)
+            client.post('/api/upload', data={
+                'collection': collection,
+                'file': (io.BytesIO(content), f"img_{index:04d}.jpg")
+            }, content_type='multipart/form-data')
+
+    # Popularité de Zipf: quelques images concentrent l'essentiel des vues
+    rng = random.Random(42)
+    names = [(c, f"img_{i:04d}") for c in collections for i in range(args.images)]
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    views = rng.choices(names, weights=weights, k=args.views)
+    total_mb = len(names) * args.image_kb / 1024
+
+    print(f"{len(names)} images ({total_mb:.0f} MB), {args.views} vues, latence {args.latency * 1000:.0f} ms")
+    print(f"sans cache: {args.views} téléchargements, {args.views * args.image_kb / 1024:.0f} MB")
+    for cache_mb in args.cache_mb:
+        cache = app.DiskLRUCache(f"cache-{cache_mb}", int(cache_mb * 1024 * 1024))
+        app.storage = app.TieredBackend(remote, cache, collections)
+        calls, sent = remote.calls, remote.bytes_sent
+        durations = []
+        for collection, name in views:
+            start = time.perf_counter()
+            response = client.get(f"/media/{collection}/{name}")
+            response.close()
+            durations.append(time.perf_counter() - start)
+        fetched = remote.calls - calls
+        print(f"cache {cache_mb:>5} MB: {fetched:5d} téléchargements "
+              f"({(remote.bytes_sent - sent) / 1024 / 1024:.0f} MB), "
+              f"taux de succès {cache.hits / max(1, cache.hits + cache.misses):.0%}, "
+              f"médiane {statistics.median(durations) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Faux Cloudinary local avec latence injectée, pour les benchmarks"""
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeCloudinaryAPI:
+    """Remplace cloudinary.api.resources par une version locale.
+
+    latency: délai simulé par appel (secondes)
+    slow_prefixes: {prefix: délai} pour simuler une collection lente
+    """
+
+    def __init__(self, latency=0.1, images_per_collection=10, slow_prefixes=None):
+        self.latency = latency
+        self.images_per_collection = images_per_collection
+        self.slow_prefixes = slow_prefixes or {}
+        self.calls = 0
+
+    def resources(self, type="upload", prefix="", max_results=10, next_cursor=None, **options):
+        self.calls += 1
+        time.sleep(self.slow_prefixes.get(prefix, self.latency))
+        start = int(next_cursor or 0)
+        end = min(start + max_results, self.images_per_collection)
+        result = {
+            'resources': [
+                {
+                    'public_id': f"{prefix}image_{i:05d}",
+                    'secure_url': f"https://res.cloudinary.test/{prefix}image_{i:05d}.jpg",
+                    'bytes': 150000,
+                    'width': 1200,
+                    'height': 1600,
+                    'created_at': datetime(2024, 1, 1).isoformat()
+                }
+                for i in range(start, end)
+            ]
+        }
+        if end < self.images_per_collection:
+            result['next_cursor'] = str(end)
+        return result
+
+    def install(self, app_module):
+        """Brancher le faux sur le module app (mode Cloudinary forcé)"""
+        sdk = app_module.cloudinary_sdk()
+        sdk.config(cloud_name='fake-cloud')
+        sdk.api.resources = self.resources
+        app_module.CLOUDINARY_ENABLED = True
+        app_module.storage = app_module.CloudinaryBackend()
+
+
+class FakeCloudinaryServer:
+    """Faux Cloudinary HTTP (upload, destroy, resources, delete, ping) avec latence.
+
+    Sert à comparer des processus séparés: le SDK et le client async y
+    sont dirigés par CLOUDINARY_UPLOAD_PREFIX=http://127.0.0.1:<port>.
+    """
+
+    def __init__(self, latency=0.1, images_per_collection=10, port=0):
+        self.api = FakeCloudinaryAPI(latency=0, images_per_collection=images_per_collection)
+        self.latency = latency
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                time.sleep(fake.latency)
+                url = urlparse(self.path)
+                if url.path.endswith('/ping'):
+                    return self.reply({'status': 'ok'})
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                self.reply(fake.api.resources(
+                    prefix=query.get('prefix', ''),
+                    max_results=int(query.get('max_results', 10)),
+                    next_cursor=query.get('next_cursor')
+                ))
+
+            def do_DELETE(self):
+                # delete_resources / delete_resources_by_prefix: paramètres dans l'URL
+                time.sleep(fake.latency)
+                query = parse_qs(urlparse(self.path).query)
+                public_ids = query.get('public_ids[]', [])
+                self.reply({'deleted': {public_id: 'deleted' for public_id in public_ids}, 'partial': False})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                time.sleep(fake.latency)
+                if self.path.endswith('/destroy'):
+                    return self.reply({'result': 'ok'})
+                match = re.search(rb'name="public_id"\r\n\r\n([^\r]*)', body)
+                public_id = match.group(1).decode() if match else 'upload'
+                self.reply({
+                    'public_id': public_id,
+                    'secure_url': f"https://res.cloudinary.test/{public_id}.jpg",
+                    'bytes': len(body),
+                    'width': 1200,
+                    'height': 1600,
+                    'created_at': datetime.now().isoformat()
+                })
+
+        return Handler
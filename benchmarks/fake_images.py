@@ -0,0 +1,14 @@
+"""Contenus d'images factices pour les benchmarks.
+
+L'upload sonde les en-têtes (type réel, dimensions): un en-tête JPEG
+valide suivi d'octets quelconques suffit, sans coût d'encodage.
+"""
+import os
+import struct
+
+
+def jpeg_bytes(size, width=1200, height=800, payload=None):
+    """`size` octets commençant par SOI + SOF0 (width x height), le reste aléatoire"""
+    header = b'\xff\xd8' + b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+    body = payload if payload is not None else os.urandom(max(0, size - len(header)))
+    return header + body
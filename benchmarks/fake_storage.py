@@ -0,0 +1,111 @@
+"""Backend de stockage distant en mémoire, pour les tests et benchmarks.
+
+Même interface que app.StorageBackend; compte les appels et les octets
+transférés pour mesurer ce qu'un cache évite.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+
+class FakeRemoteBackend:
+    name = 'fake'
+    unique_names = False
+    remote = True
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.objects = {}
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.bytes_sent = 0
+
+    def _call(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+    def _read(self, source):
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return f.read()
+        path = getattr(source.stream, 'path', None)
+        if path:
+            with open(path, 'rb') as f:
+                return f.read()
+        data = source.stream.read()
+        source.stream.seek(0)
+        return data
+
+    def put(self, collection, source, filename, sha256, public_id=None):
+        self._call()
+        name = os.path.splitext(filename)[0]
+        data = self._read(source)
+        with self.lock:
+            self.objects[(collection, name)] = data
+        return {
+            'filename': name,
+            'storage': 'fake',
+            'url': f"https://fake.cdn/{collection}/{name}",
+            'public_id': f"rayschic/{collection}/{name}",
+            'size': len(data),
+            'width': None,
+            'height': None,
+            'format': None,
+            'frames': None,
+            'sha256': sha256,
+            'variants': {},
+            'uploaded_at': datetime.now().isoformat()
+        }
+
+    def delete_many(self, collection, names):
+        self._call()
+        results = []
+        with self.lock:
+            for name in names:
+                found = self.objects.pop((collection, os.path.splitext(name)[0]), None) is not None
+                results.append({'collection': collection, 'filename': name,
+                                'status': 'deleted' if found else 'not_found'})
+        return results
+
+    def clear(self, collection, prefix=''):
+        names = [name for c, name in list(self.objects) if c == collection and name.startswith(prefix)]
+        return self.delete_many(collection, names)
+
+    def scan(self, collections):
+        self._call()
+        with self.lock:
+            objects = dict(self.objects)
+        return {
+            collection: [
+                {
+                    'filename': name,
+                    'storage': 'fake',
+                    'url': f"https://fake.cdn/{collection}/{name}",
+                    'public_id': f"rayschic/{collection}/{name}",
+                    'size': len(data),
+                    'width': None,
+                    'height': None,
+                    'format': None,
+                    'frames': None,
+                    'sha256': None,
+                    'variants': {},
+                    'uploaded_at': ''
+                }
+                for (c, name), data in objects.items() if c == collection
+            ]
+            for collection in collections
+        }
+
+    def fetch(self, collection, filename, dest):
+        self._call()
+        data = self.objects.get((collection, filename))
+        if data is None:
+            raise FileNotFoundError(f"{collection}/{filename}")
+        with self.lock:
+            self.bytes_sent += len(data)
+        dest.write(data)
+
+    def after_put(self, collection, image):
+        pass
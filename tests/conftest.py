@@ -0,0 +1,56 @@
+"""Configuration commune des tests: app.py importé hors du dépôt.
+
+app.py travaille dans le répertoire courant (temp_uploads/, instance/):
+chaque test reçoit un dossier vierge, un magasin de métadonnées et un
+index du catalogue neufs, et le stockage local par défaut.
+"""
+import io
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+for key in ('CLOUDINARY_CLOUD_NAME', 'CLOUDINARY_CLOUD', 'CLOUDINARY_API_KEY', 'CLOUDINARY_KEY',
+            'CLOUDINARY_API_SECRET', 'CLOUDINARY_SECRET', 'CLOUDINARY_URL', 'STORAGE_BACKEND'):
+    os.environ.pop(key, None)
+# Pas d'instantané publié, pas de limite de débit entre deux requêtes de test
+os.environ.update(SNAPSHOT_PATH='', ADMISSION_ENABLED='0', UPLOAD_QUEUE='0')
+os.chdir(tempfile.mkdtemp(prefix='rayschic-tests-'))
+
+import app as core  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(core, 'metadata_store', core.MetadataStore(os.path.join('instance', 'catalog.db')))
+    monkeypatch.setattr(core, 'catalog_index', core.CatalogIndex(core.CATALOG_TTL))
+    monkeypatch.setattr(core, 'storage', core.LocalBackend(core.UPLOAD_FOLDER))
+    # Les dérivés tournent dans un thread: hors sujet ici
+    monkeypatch.setattr(core, 'schedule_variants', lambda collection, image: None)
+    return tmp_path
+
+
+@pytest.fixture
+def client():
+    return core.app.test_client()
+
+
+def image_bytes(fmt='JPEG', size=(40, 30), **options):
+    """Petite image encodée par Pillow"""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def upload(client, collection, filename, data):
+    return client.post('/api/upload', data={
+        'collection': collection,
+        'file': (io.BytesIO(data), filename)
+    }, content_type='multipart/form-data')
@@ -0,0 +1,72 @@
+"""Seaux à jetons et admission des requêtes"""
+import pytest
+
+import app as core
+
+
+def test_token_bucket_refills_over_time():
+    bucket = core.TokenBucket(rate=2, burst=3, now=100)
+
+    assert [bucket.take(100) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(100) == pytest.approx(0.5)
+    # Un jeton toutes les 0,5 s
+    assert bucket.take(100.25) == pytest.approx(0.25)
+    assert bucket.take(100.5) == 0
+    # Jamais plus que la réserve, même après une longue pause
+    assert [bucket.take(1000) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(1000) > 0
+
+
+def test_token_bucket_refund_and_unlimited():
+    bucket = core.TokenBucket(rate=1, burst=1, now=0)
+    assert bucket.take(0) == 0
+    bucket.refund()
+    assert bucket.take(0) == 0
+
+    unlimited = core.TokenBucket(rate=0, burst=1, now=0)
+    assert all(unlimited.take(0) == 0 for _ in range(100))
+
+
+def test_admission_concurrency():
+    admission = core.Admission('upload', concurrency=1, rate=0, burst=1, client_rate=0, client_burst=1)
+    admission.acquire('a')
+
+    with pytest.raises(core.AdmissionRejected) as rejected:
+        admission.acquire('b')
+    assert rejected.value.status == 503
+
+    admission.release()
+    admission.acquire('b')
+
+
+def test_admission_client_rate(monkeypatch):
+    now = [50.0]
+    monkeypatch.setattr(core.time, 'monotonic', lambda: now[0])
+    admission = core.Admission('upload', concurrency=0, rate=0, burst=1, client_rate=1, client_burst=2)
+
+    admission.acquire('a')
+    admission.acquire('a')
+    with pytest.raises(core.AdmissionRejected) as rejected:
+        admission.acquire('a')
+    assert rejected.value.status == 429
+    assert rejected.value.retry_after == 1
+    # Les autres clients ont leur propre seau
+    admission.acquire('b')
+
+    now[0] += 1
+    admission.acquire('a')
+
+
+def test_admission_global_rate_refunds_client(monkeypatch):
+    now = [50.0]
+    monkeypatch.setattr(core.time, 'monotonic', lambda: now[0])
+    admission = core.Admission('upload', concurrency=0, rate=1, burst=1, client_rate=0.01, client_burst=1)
+
+    admission.acquire('a')
+    with pytest.raises(core.AdmissionRejected) as rejected:
+        admission.acquire('b')
+    assert rejected.value.status == 503
+
+    # Sans remboursement, b attendrait 100 s son prochain jeton
+    now[0] += 1
+    admission.acquire('b')
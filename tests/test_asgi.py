@@ -0,0 +1,123 @@
+"""Mode ASGI: upload reçu en flux et borné, flux d'événements partagé"""
+import asyncio
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+from starlette.testclient import TestClient
+
+import app as core
+import asgi
+from conftest import ROOT, image_bytes
+
+
+@pytest.fixture
+def asgi_client():
+    with TestClient(asgi.app) as client:
+        yield client
+
+
+def staged_files():
+    if not os.path.isdir(core.INCOMING_FOLDER):
+        return []
+    return os.listdir(core.INCOMING_FOLDER)
+
+
+def post_upload(client, data, filename='photo.jpg', collection='hero'):
+    return client.post('/api/upload', data={'collection': collection}, files={'file': (filename, io.BytesIO(data))})
+
+
+def test_upload_is_staged_and_hashed_on_arrival(asgi_client, monkeypatch):
+    streams = []
+    upload_image = core.upload_image
+
+    def spy(file, collection):
+        streams.append(file.stream)
+        return upload_image(file, collection)
+    monkeypatch.setattr(core, 'upload_image', spy)
+    data = image_bytes()
+
+    response = post_upload(asgi_client, data)
+
+    assert response.status_code == 200
+    assert isinstance(streams[0], core.StagedUpload)
+    with open(os.path.join(core.UPLOAD_FOLDER, 'hero', 'photo.jpg'), 'rb') as f:
+        assert f.read() == data
+    assert staged_files() == []
+
+
+def test_chunked_body_over_limit_is_rejected(asgi_client, monkeypatch):
+    monkeypatch.setitem(core.app.config, 'MAX_CONTENT_LENGTH', 4096)
+    boundary = 'limite'
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="collection"\r\n\r\nhero\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="a.jpg"\r\n\r\n').encode()
+
+    def body():
+        # Pas de Content-Length: envoi en chunked
+        yield head
+        for _ in range(64):
+            yield b'x' * 1024
+
+    response = asgi_client.post(
+        '/api/upload', content=body(),
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}
+    )
+
+    assert response.status_code == 413
+    assert staged_files() == []
+
+
+def test_file_over_max_size_is_rejected(asgi_client, monkeypatch):
+    monkeypatch.setattr(core, 'MAX_FILE_SIZE', 100)
+
+    response = post_upload(asgi_client, image_bytes())
+
+    assert response.status_code == 400
+    assert 'trop volumineux' in response.json()['error']
+
+
+def test_events_share_one_version_watcher(monkeypatch):
+    reads = []
+    version = core.metadata_store.version
+
+    def counted():
+        reads.append(1)
+        return version()
+    monkeypatch.setattr(core.metadata_store, 'version', counted)
+    monkeypatch.setattr(asgi, 'version_watcher', asgi.VersionWatcher(0.05))
+    monkeypatch.setattr(asgi, 'ASYNC_EVENTS_STREAM_SECONDS', 0.5)
+    since = version()
+
+    async def collect():
+        return ''.join([chunk async for chunk in asgi.event_stream(since)])
+
+    async def scenario():
+        streams = [asyncio.create_task(collect()) for _ in range(10)]
+        await asyncio.sleep(0.2)
+        reads.clear()
+        await asyncio.to_thread(core.metadata_store.set_meta, 'probe', 'x')
+        core.metadata_store.record('hero', {
+            'filename': 'a.jpg', 'storage': 'local', 'url': '/temp_uploads/hero/a.jpg', 'public_id': None,
+            'size': 1, 'width': 1, 'height': 1, 'format': 'jpg', 'frames': 1, 'sha256': 'a' * 64,
+            'variants': {}, 'uploaded_at': '2024-01-01T00:00:00'
+        })
+        return await asyncio.gather(*streams)
+
+    texts = asyncio.run(scenario())
+
+    assert all('event: image_added' in text for text in texts)
+    # Une lecture par intervalle pour tout le processus, plus une relecture
+    # du journal par flux après le changement (au lieu d'une par flux et par intervalle)
+    assert len(reads) <= 0.3 / 0.05 + 2 + 2 * len(texts)
+
+
+def test_import_does_not_load_cloudinary():
+    code = 'import sys, asgi; print("cloudinary" in sys.modules)'
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    for key in ('CLOUDINARY_CLOUD_NAME', 'CLOUDINARY_URL'):
+        env.pop(key, None)
+    output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+
+    assert output.stdout.strip().splitlines()[-1] == 'False'
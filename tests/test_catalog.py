@@ -0,0 +1,32 @@
+"""Index du catalogue en mémoire et versions du magasin"""
+import app as core
+
+
+def image(name, size, uploaded_at):
+    return {'filename': name, 'size': size, 'uploaded_at': uploaded_at}
+
+
+def test_mutate_applies_in_order_writes():
+    index = core.CatalogIndex(core.CATALOG_TTL)
+    version, _ = index.stamp()
+
+    index.add('hero', image('alpha', 1, '2024-01-01'), version + 1)
+
+    assert index.collections is not None
+    assert index.version == version + 1
+    assert index.collections['hero']['names'] == ['alpha']
+
+
+def test_mutate_invalidates_on_out_of_order_version():
+    index = core.CatalogIndex(core.CATALOG_TTL)
+    version, _ = index.stamp()
+
+    # Une écriture d'un autre worker (version + 1) n'a pas été vue
+    index.add('hero', image('alpha', 1, '2024-01-01'), version + 2)
+
+    assert index.collections is None
+    # Même une écriture plus ancienne que la copie ne s'applique pas
+    index.stamp()
+    current = index.version
+    index.remove_many([('hero', 'alpha')], current)
+    assert index.collections is None
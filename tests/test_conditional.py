@@ -0,0 +1,86 @@
+"""ETag versionné, 304 sur If-None-Match et delta ?since= de /api/scan et /api/generate-json"""
+import pytest
+
+import app as core
+from conftest import image_bytes, upload
+
+
+@pytest.mark.parametrize('url', ['/api/scan', '/api/generate-json', '/api/generate-json?stream=1'])
+def test_if_none_match_gives_304(client, url):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+    first = client.get(url)
+    etag = first.headers['ETag']
+
+    response = client.get(url, headers={'If-None-Match': etag})
+
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert etag.startswith(f'"v{core.metadata_store.version()}-')
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_weak_and_listed_etags_match(client):
+    etag = client.get('/api/scan').headers['ETag']
+
+    assert client.get('/api/scan', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+    assert client.get('/api/scan', headers={'If-None-Match': f'"autre", {etag}'}).status_code == 304
+    assert client.get('/api/scan', headers={'If-None-Match': '"autre"'}).status_code == 200
+
+
+def test_body_is_stable_until_the_catalog_changes(client):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+    first = client.get('/api/scan')
+
+    again = client.get('/api/scan')
+    assert again.data == first.data
+    assert again.headers['ETag'] == first.headers['ETag']
+
+    upload(client, 'hero', 'b.jpg', image_bytes(size=(9, 9)))
+    changed = client.get('/api/scan', headers={'If-None-Match': first.headers['ETag']})
+
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+
+
+def test_etag_depends_on_parameters(client):
+    whole = client.get('/api/scan').headers['ETag']
+    page = client.get('/api/scan?limit=5').headers['ETag']
+
+    assert whole != page
+    # ?refresh= ne change pas le corps: même ETag
+    assert client.get('/api/scan?refresh=1').headers['ETag'] == whole
+    assert client.get('/api/scan?limit=5', headers={'If-None-Match': whole}).status_code == 200
+
+
+def test_delta_since(client):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+    since = client.get('/api/scan').get_json()['stats']['version']
+    upload(client, 'vestes', 'v.jpg', image_bytes(size=(9, 9)))
+    client.post('/api/delete', json={'collection': 'hero', 'filename': 'a.jpg'})
+
+    body = client.get(f'/api/scan?since={since}').get_json()
+
+    assert body['delta'] is True
+    assert body['version'] == core.metadata_store.version()
+    assert [image['filename'] for image in body['collections']['vestes']['added']] == ['v.jpg']
+    assert body['collections']['hero'] == {'added': [], 'removed': ['a.jpg']}
+    assert (body['stats']['added'], body['stats']['removed']) == (1, 1)
+
+
+def test_delta_limited_to_requested_collections(client):
+    upload(client, 'vestes', 'v.jpg', image_bytes())
+
+    body = client.get('/api/generate-json?since=0&collection=vestes').get_json()
+
+    assert list(body['collections']) == ['vestes']
+
+
+@pytest.mark.parametrize('since, status', [('abc', 400), ('-1', 400), ('999', 410)])
+def test_invalid_or_unavailable_since(client, since, status):
+    response = client.get(f'/api/scan?since={since}')
+
+    assert response.status_code == status
+    if status == 410:
+        assert response.get_json()['version'] == core.metadata_store.version()
@@ -0,0 +1,116 @@
+"""Déduplication par empreinte: doublons, uploads concurrents, forme de la réponse"""
+import hashlib
+import threading
+
+import pytest
+
+import app as core
+from conftest import image_bytes, upload
+from fake_storage import FakeRemoteBackend
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    remote = FakeRemoteBackend(latency=0)
+    monkeypatch.setattr(core, 'storage', remote)
+    return remote
+
+
+def pending_rows():
+    return core.metadata_store.connection().execute('SELECT * FROM images WHERE pending = 1').fetchall()
+
+
+def test_duplicate_response_shape(client, remote):
+    data = image_bytes()
+    first = upload(client, 'hero', 'a.jpg', data).get_json()
+
+    response = upload(client, 'hero', 'copie.jpg', data)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['duplicate'] is True
+    assert body['image'] == first['image']
+    assert body['image']['filename'] == 'a'
+    assert list(remote.objects) == [('hero', 'a')]
+
+
+def test_same_content_in_another_collection_is_uploaded(client, remote):
+    data = image_bytes()
+    upload(client, 'hero', 'a.jpg', data)
+
+    response = upload(client, 'costumes', 'a.jpg', data)
+
+    assert response.get_json()['duplicate'] is False
+    assert sorted(remote.objects) == [('costumes', 'a'), ('hero', 'a')]
+
+
+def test_remote_claim_is_released_after_upload(client, remote):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+
+    assert pending_rows() == []
+
+
+def test_failed_remote_upload_releases_claim(client, remote, monkeypatch):
+    data = image_bytes()
+    put = remote.put
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('distant indisponible')
+    monkeypatch.setattr(remote, 'put', broken)
+    assert upload(client, 'hero', 'a.jpg', data).status_code == 500
+    assert pending_rows() == []
+
+    monkeypatch.setattr(remote, 'put', put)
+    response = upload(client, 'hero', 'a.jpg', data)
+
+    assert response.status_code == 200
+    assert response.get_json()['duplicate'] is False
+
+
+@pytest.mark.parametrize('backend', ['remote', 'local'])
+def test_concurrent_identical_uploads_transfer_once(monkeypatch, backend):
+    puts = []
+    if backend == 'remote':
+        storage = FakeRemoteBackend(latency=0.3)
+        monkeypatch.setattr(core, 'storage', storage)
+    else:
+        storage = core.storage
+    put = storage.put
+
+    def slow_put(*args, **kwargs):
+        puts.append(args[2])
+        if backend == 'local':
+            threading.Event().wait(0.3)
+        return put(*args, **kwargs)
+    monkeypatch.setattr(storage, 'put', slow_put)
+    data = image_bytes()
+    responses = [None, None]
+
+    def send(index, filename):
+        responses[index] = upload(core.app.test_client(), 'hero', filename, data).get_json()
+    threads = [threading.Thread(target=send, args=(i, name)) for i, name in enumerate(['a.jpg', 'b.jpg'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(puts) == 1
+    assert sorted(r['duplicate'] for r in responses) == [False, True]
+    assert responses[0]['image'] == responses[1]['image']
+    images = core.catalog_index.get()['collections']['hero']['images']
+    assert [image['filename'] for image in images] == [responses[0]['image']['filename']]
+    assert core.metadata_store.find_duplicate('hero', hashlib.sha256(data).hexdigest()) is not None
+    assert pending_rows() == []
+
+
+def test_claim_reports_upload_in_progress(monkeypatch):
+    store = core.metadata_store
+
+    assert store.claim('hero', 'a' * 64) == (None, core.PENDING_PREFIX + 'a' * 64)
+    assert store.claim('hero', 'a' * 64, 'photo.jpg') == (None, None)
+    monkeypatch.setattr(core, 'PENDING_CLAIM_WAIT', 0.2)
+    with pytest.raises(RuntimeError):
+        core.claim_upload('hero', 'a' * 64)
+
+    store.release('hero', core.PENDING_PREFIX + 'a' * 64)
+    assert store.claim('hero', 'a' * 64, 'photo.jpg') == (None, 'photo.jpg')
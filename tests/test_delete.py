@@ -0,0 +1,123 @@
+"""Suppressions: /api/delete, /api/delete/batch (lot, préfixe) et collections refusées"""
+import os
+
+import pytest
+
+import app as core
+from conftest import image_bytes, upload
+
+
+def catalog_names(collection):
+    return [image['filename'] for image in core.catalog_index.get()['collections'][collection]['images']]
+
+
+@pytest.fixture
+def outside():
+    """Fichier hors de UPLOAD_FOLDER qu'une collection '..' viserait"""
+    os.makedirs(core.UPLOAD_FOLDER, exist_ok=True)
+    with open('victime.jpg', 'wb') as f:
+        f.write(b'x')
+    return 'victime.jpg'
+
+
+def test_delete(client):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+
+    response = client.post('/api/delete', json={'collection': 'hero', 'filename': 'a.jpg'})
+
+    assert response.status_code == 200
+    assert response.get_json()['storage'] == 'local'
+    assert not os.path.exists(os.path.join(core.UPLOAD_FOLDER, 'hero', 'a.jpg'))
+    assert catalog_names('hero') == []
+
+
+@pytest.mark.parametrize('collection', ['..', '../..', 'inconnue', ['hero']])
+def test_delete_rejects_unknown_collection(client, outside, collection):
+    response = client.post('/api/delete', json={'collection': collection, 'filename': outside})
+
+    assert response.status_code == 400
+    assert 'Collection invalide' in response.get_json()['error']
+    assert os.path.exists(outside)
+
+
+def test_batch_rejects_unknown_collection(client, outside):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+
+    response = client.post('/api/delete/batch', json={'items': [
+        {'collection': 'hero', 'filename': 'a.jpg'},
+        {'collection': '..', 'filename': outside}
+    ]})
+
+    assert response.status_code == 400
+    assert os.path.exists(outside)
+    # Lot refusé en entier
+    assert catalog_names('hero') == ['a.jpg']
+
+
+@pytest.mark.parametrize('body', [{'collections': ['..']}, {'collection': '..', 'prefix': 'victime'}])
+def test_clear_rejects_unknown_collection(client, outside, body):
+    response = client.post('/api/delete/batch', json=body)
+
+    assert response.status_code == 400
+    assert os.path.exists(outside)
+
+
+def test_core_functions_reject_unknown_collection(outside):
+    with pytest.raises(ValueError):
+        core.clear_collection('..')
+    assert core.delete_image('..', outside)['success'] is False
+    assert core.delete_images([('..', outside)])[0]['status'] == 'error'
+    assert os.path.exists(outside)
+
+
+def test_batch_partial_failure(client, monkeypatch):
+    for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+        upload(client, 'chemises', name, image_bytes(size=(10 + ord(name[0]) % 10, 10)))
+    remove = os.remove
+
+    def failing_remove(path, *args, **kwargs):
+        if os.path.basename(path) == 'b.jpg':
+            raise PermissionError('fichier verrouillé')
+        return remove(path, *args, **kwargs)
+    monkeypatch.setattr(os, 'remove', failing_remove)
+
+    response = client.post('/api/delete/batch', json={'items': [
+        {'collection': 'chemises', 'filename': 'a.jpg'},
+        {'collection': 'chemises', 'filename': 'b.jpg'},
+        {'collection': 'chemises', 'filename': 'absente.jpg'}
+    ]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['success'] is False
+    assert body['deleted'] == 1
+    assert {r['filename']: r['status'] for r in body['results']} == {
+        'a.jpg': 'deleted', 'b.jpg': 'error', 'absente.jpg': 'not_found'
+    }
+    assert [r['error'] for r in body['results'] if r['status'] == 'error'] == ['fichier verrouillé']
+    # Seules les suppressions réussies quittent le catalogue
+    assert catalog_names('chemises') == ['b.jpg', 'c.jpg']
+
+
+def test_clear_by_prefix(client):
+    for index, name in enumerate(['ete-1.jpg', 'ete-2.jpg', 'hiver.jpg']):
+        upload(client, 'vestes', name, image_bytes(size=(10 + index, 10)))
+
+    response = client.post('/api/delete/batch', json={'collection': 'vestes', 'prefix': 'ete-'})
+
+    body = response.get_json()
+    assert body['deleted'] == 2
+    assert sorted(r['filename'] for r in body['results']) == ['ete-1.jpg', 'ete-2.jpg']
+    assert catalog_names('vestes') == ['hiver.jpg']
+    assert sorted(os.listdir(os.path.join(core.UPLOAD_FOLDER, 'vestes'))) == ['hiver.jpg']
+
+
+def test_asgi_delete_rejects_unknown_collection(outside):
+    from starlette.testclient import TestClient
+    import asgi
+
+    with TestClient(asgi.app) as client:
+        response = client.post('/api/delete', json={'collection': '..', 'filename': outside})
+
+    assert response.status_code == 400
+    assert os.path.exists(outside)
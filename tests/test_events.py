@@ -0,0 +1,74 @@
+"""Flux /api/events: id de reprise, ?since= et Last-Event-ID"""
+import json
+
+import app as core
+from conftest import image_bytes, upload
+
+
+def read_events(response):
+    """Champs de chaque message SSE, commentaires exclus"""
+    messages = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        fields = {}
+        for line in block.splitlines():
+            if line and not line.startswith(':'):
+                key, _, value = line.partition(': ')
+                fields[key] = value
+        if fields:
+            messages.append(fields)
+    return messages
+
+
+def last_id(messages):
+    return [m['id'] for m in messages if 'id' in m][-1]
+
+
+def test_response_without_since_carries_current_version(client):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+    version = core.metadata_store.version()
+
+    messages = read_events(client.get('/api/events'))
+
+    assert messages[0]['retry'] == str(core.EVENTS_RETRY_MS)
+    assert last_id(messages) == str(version)
+    assert not any('event' in m for m in messages)
+
+
+def test_resume_with_since(client):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+    since = core.metadata_store.version()
+    upload(client, 'hero', 'b.jpg', image_bytes(size=(8, 8)))
+    client.post('/api/delete', json={'collection': 'hero', 'filename': 'a.jpg'})
+
+    messages = read_events(client.get(f'/api/events?since={since}'))
+
+    events = [(m['event'], json.loads(m['data'])) for m in messages if 'event' in m]
+    assert [name for name, _ in events] == ['image_added', 'image_deleted']
+    assert events[0][1]['image']['filename'] == 'b.jpg'
+    assert events[1][1] == {'collection': 'hero', 'filename': 'a.jpg'}
+    assert last_id(messages) == str(core.metadata_store.version())
+
+
+def test_last_event_id_wins_over_since(client):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+    after_first = core.metadata_store.version()
+    upload(client, 'hero', 'b.jpg', image_bytes(size=(8, 8)))
+
+    response = client.get('/api/events?since=0', headers={'Last-Event-ID': str(after_first)})
+
+    added = [json.loads(m['data'])['image']['filename'] for m in read_events(response) if m.get('event') == 'image_added']
+    assert added == ['b.jpg']
+
+
+def test_unknown_version_asks_for_reset(client):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+    version = core.metadata_store.version()
+
+    messages = read_events(client.get(f'/api/events?since={version + 10}'))
+
+    assert [m['event'] for m in messages if 'event' in m] == ['reset']
+    assert last_id(messages) == str(version)
+
+
+def test_invalid_since(client):
+    assert client.get('/api/events?since=abc').status_code == 400
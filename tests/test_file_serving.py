@@ -0,0 +1,87 @@
+"""Livraison des fichiers locaux: ETag, 304, Range et cache immuable"""
+import hashlib
+
+import pytest
+
+import app as core
+from conftest import image_bytes, upload
+
+
+@pytest.fixture
+def photo(client):
+    data = image_bytes(size=(64, 48))
+    image = upload(client, 'hero', 'photo.jpg', data).get_json()['image']
+    return data, image['url']
+
+
+def test_upload_url_carries_content_hash(photo):
+    data, url = photo
+
+    assert url == f"/temp_uploads/hero/photo.jpg?v={hashlib.sha256(data).hexdigest()[:16]}"
+
+
+def test_versioned_url_is_immutable(client, photo, monkeypatch):
+    data, url = photo
+    # L'empreinte vient du magasin: le fichier n'est pas relu pour l'ETag
+    monkeypatch.setattr(core, 'file_etag', lambda *args, **kwargs: pytest.fail('fichier relu'))
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.headers['ETag'] == f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+    assert response.cache_control.max_age == core.IMMUTABLE_MAX_AGE
+    assert response.cache_control.immutable
+    assert response.cache_control.public
+
+
+@pytest.mark.parametrize('query', ['', '?v=0123456789abcdef', '?v=abc'])
+def test_other_urls_are_revalidated(client, photo, query):
+    response = client.get('/temp_uploads/hero/photo.jpg' + query)
+
+    assert response.status_code == 200
+    assert response.cache_control.max_age == core.FILE_CACHE_MAX_AGE
+    assert not response.cache_control.immutable
+
+
+def test_matching_etag_gives_304(client, photo):
+    _, url = photo
+    etag = client.get(url).headers['ETag']
+
+    response = client.get(url, headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_range_gives_206(client, photo):
+    data, url = photo
+
+    response = client.get(url, headers={'Range': 'bytes=10-19'})
+
+    assert response.status_code == 206
+    assert response.data == data[10:20]
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(data)}'
+
+
+def test_nginx_handoff_is_relative_to_upload_folder(client, photo, monkeypatch):
+    _, url = photo
+    monkeypatch.setattr(core, 'SENDFILE_MODE', 'nginx')
+
+    response = client.get(url)
+
+    assert response.headers['X-Accel-Redirect'] == '/_protected/hero/photo.jpg'
+    assert response.data == b''
+
+
+def test_variants_carry_the_original_hash(client, photo):
+    data, _ = photo
+    assert core.generate_variants('hero', 'photo.jpg')
+    variants = core.local_variants('hero', 'photo.jpg', hashlib.sha256(data).hexdigest())
+    url = variants['thumbnail']['webp']
+
+    response = client.get(url)
+
+    assert url.endswith(f"?v={hashlib.sha256(data).hexdigest()[:16]}")
+    assert response.status_code == 200
+    assert response.cache_control.immutable
@@ -0,0 +1,76 @@
+"""/api/generate-json en streaming: mêmes octets que le document généré en un bloc"""
+import json
+import os
+
+import pytest
+from starlette.testclient import TestClient
+
+import app as core
+import asgi
+from conftest import ROOT, image_bytes, upload
+
+
+@pytest.fixture
+def catalog(client):
+    upload(client, 'hero', 'accueil.jpg', image_bytes())
+    for index in range(5):
+        upload(client, 'tenues', f"t{index}.jpg", image_bytes(size=(10 + index, 10)))
+    upload(client, 'vestes', 'été.png', image_bytes('PNG', size=(7, 7)))
+
+
+def test_stream_matches_whole_document(client, catalog):
+    whole = client.get('/api/generate-json')
+    streamed = client.get('/api/generate-json?stream=1')
+
+    assert streamed.status_code == whole.status_code == 200
+    assert streamed.is_streamed
+    assert streamed.data == whole.data
+    assert streamed.data == core.github_json(core.format_github_data(core.catalog_index.get())).encode()
+    assert streamed.headers['Content-Disposition'] == 'attachment; filename=rayschic-images.json'
+
+
+def test_stream_reads_one_page_at_a_time(client, catalog, monkeypatch):
+    monkeypatch.setattr(core, 'STREAM_PAGE_SIZE', 2)
+    limits = []
+    page = core.catalog_index.page
+
+    def spy(collection, limit, cursor=None, force_refresh=False):
+        limits.append(limit)
+        return page(collection, limit, cursor, force_refresh)
+    monkeypatch.setattr(core.catalog_index, 'page', spy)
+
+    chunks = list(core.stream_github_data())
+
+    assert max(limits) == 2
+    # tenues: 5 images en 3 pages
+    assert ''.join(chunks) == core.github_json(core.format_github_data(core.catalog_index.get()))
+
+
+def test_schema_of_static_document(client, catalog):
+    with open(os.path.join(ROOT, 'static', 'images.json'), encoding='utf-8') as f:
+        reference = json.load(f)
+
+    document = json.loads(client.get('/api/generate-json?stream=1').data)
+
+    assert list(document)[:1] == ['last_updated']
+    assert set(reference) <= set(document)
+    assert list(document['collections']) == list(reference['collections'])
+    assert list(document['collections']['tenues']) == list(reference['collections']['tenues'])
+    assert document['collections']['tenues']['count'] == 5
+    assert document['hero']['url'].startswith('/temp_uploads/hero/accueil.jpg')
+    assert [image['filename'] for image in document['collections']['vestes']['images']] == ['ete.png']
+
+
+def test_empty_catalog(client):
+    whole = client.get('/api/generate-json')
+
+    assert client.get('/api/generate-json?stream=1').data == whole.data
+    assert json.loads(whole.data)['hero'] == {'url': ''}
+
+
+def test_asgi_gives_the_same_bytes(client, catalog):
+    expected = client.get('/api/generate-json').data
+
+    with TestClient(asgi.app) as async_client:
+        assert async_client.get('/api/generate-json').content == expected
+        assert async_client.get('/api/generate-json?stream=1').content == expected
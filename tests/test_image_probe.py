@@ -0,0 +1,59 @@
+"""Sondage des en-têtes d'image: format réel, dimensions, images"""
+import io
+import os
+
+import pytest
+
+import app as core
+from conftest import image_bytes, upload
+
+
+@pytest.mark.parametrize('fmt, expected, options', [
+    ('PNG', 'png', {}),
+    ('JPEG', 'jpg', {}),
+    ('JPEG', 'jpg', {'progressive': True}),
+    ('GIF', 'gif', {}),
+    ('WEBP', 'webp', {}),
+    ('WEBP', 'webp', {'lossless': True})
+])
+def test_probe_image_formats(fmt, expected, options):
+    info = core.probe_image(io.BytesIO(image_bytes(fmt, size=(37, 21), **options)))
+
+    assert info == {'format': expected, 'width': 37, 'height': 21, 'frames': 1}
+
+
+def test_probe_image_counts_gif_frames():
+    from PIL import Image
+    buffer = io.BytesIO()
+    frames = [Image.new('RGB', (8, 8), (i * 60, 0, 0)) for i in range(3)]
+    frames[0].save(buffer, 'GIF', save_all=True, append_images=frames[1:])
+
+    assert core.probe_image(io.BytesIO(buffer.getvalue()))['frames'] == 3
+
+
+@pytest.mark.parametrize('fmt, size', [('JPEG', 30), ('PNG', 20), ('GIF', 8)])
+def test_probe_image_truncated(fmt, size):
+    data = image_bytes(fmt)[:size]
+
+    with pytest.raises(core.ImageProbeError, match='tronqué'):
+        core.probe_image(io.BytesIO(data))
+
+
+@pytest.mark.parametrize('data', [b'', b'not an image at all', b'RIFF\x00\x00\x00\x00WAVEfmt '])
+def test_probe_image_malformed(data):
+    with pytest.raises(core.ImageProbeError, match='non reconnu'):
+        core.probe_image(io.BytesIO(data))
+
+
+def test_png_with_jpg_extension_is_rejected(client):
+    response = upload(client, 'hero', 'photo.jpg', image_bytes('PNG'))
+
+    assert response.status_code == 400
+    assert "Contenu PNG avec l'extension .jpg" in response.get_json()['error']
+    assert not os.path.exists(os.path.join(core.UPLOAD_FOLDER, 'hero', 'photo.jpg'))
+
+
+def test_garbage_upload_is_rejected(client):
+    response = upload(client, 'hero', 'photo.png', b'\x89PNG but not really')
+
+    assert response.status_code == 400
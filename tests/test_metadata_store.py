@@ -0,0 +1,56 @@
+"""Magasin de métadonnées: noms libres, réservations et fichiers déjà présents"""
+import os
+
+import app as core
+from conftest import image_bytes, upload
+
+
+def write_file(collection, filename, data):
+    folder = os.path.join(core.UPLOAD_FOLDER, collection)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, filename), 'wb') as f:
+        f.write(data)
+
+
+def read_file(collection, filename):
+    with open(os.path.join(core.UPLOAD_FOLDER, collection, filename), 'rb') as f:
+        return f.read()
+
+
+def test_upload_after_upgrade_keeps_existing_files(client):
+    # Dossier hérité d'une version sans magasin: catalog.db est vide
+    old = image_bytes(size=(20, 20))
+    write_file('hero', 'photo.jpg', old)
+
+    response = upload(client, 'hero', 'photo.jpg', image_bytes(size=(30, 30)))
+
+    assert response.status_code == 200
+    assert response.get_json()['image']['filename'] == 'photo_1.jpg'
+    assert read_file('hero', 'photo.jpg') == old
+
+
+def test_upload_skips_file_unknown_to_store(client):
+    assert client.get('/api/scan').status_code == 200
+    # Copié à la main après la reconstruction du magasin
+    old = image_bytes(size=(20, 20))
+    write_file('hero', 'photo.jpg', old)
+
+    first = upload(client, 'hero', 'photo.jpg', image_bytes(size=(30, 30)))
+    second = upload(client, 'hero', 'photo.jpg', image_bytes(size=(40, 40)))
+
+    assert first.get_json()['image']['filename'] == 'photo_1.jpg'
+    assert second.get_json()['image']['filename'] == 'photo_2.jpg'
+    assert read_file('hero', 'photo.jpg') == old
+    assert not os.listdir(core.INCOMING_FOLDER)
+
+
+def test_claim_reserves_names_and_expires_stale_ones(monkeypatch):
+    store = core.metadata_store
+
+    assert store.claim('hero', 'a' * 64, 'photo.jpg') == (None, 'photo.jpg')
+    assert store.claim('hero', 'b' * 64, 'photo.jpg') == (None, 'photo_1.jpg')
+    assert store.claim('hero', 'c' * 64, 'photo.jpg', {'photo_2.jpg'}) == (None, 'photo_3.jpg')
+
+    # Réservations d'un upload interrompu: libérées après le délai
+    monkeypatch.setattr(core, 'PENDING_CLAIM_TIMEOUT', -1)
+    assert store.claim('hero', 'd' * 64, 'photo.jpg') == (None, 'photo.jpg')
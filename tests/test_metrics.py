@@ -0,0 +1,121 @@
+"""/metrics: format texte Prometheus, noms et étiquettes des métriques"""
+import os
+import re
+
+import pytest
+
+import app as core
+from conftest import image_bytes, upload
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def scrape(client):
+    """{(nom, étiquettes sans worker): valeur}, plus les types déclarés"""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'version=0.0.4' in response.headers['Content-Type']
+    samples, types = {}, {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            types[name] = kind
+            continue
+        if line.startswith('#'):
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.groups()
+        labels = dict(LABEL.findall(labels or ''))
+        assert labels.pop('worker') == str(os.getpid())
+        samples[name, tuple(sorted(labels.items()))] = float(value)
+    return samples, types
+
+
+def value(samples, name, **labels):
+    return samples.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def test_every_metric_is_declared(client):
+    samples, types = scrape(client)
+
+    assert types['rayschic_http_request_duration_seconds'] == 'histogram'
+    assert types['rayschic_cloudinary_errors_total'] == 'counter'
+    assert types['rayschic_admission_in_flight'] == 'gauge'
+    for name, _ in samples:
+        base = re.sub(r'_(bucket|sum|count)$', '', name)
+        assert name in types or base in types, name
+
+
+def test_request_latency_per_route(client):
+    client.get('/api/health')
+    client.get('/api/rien')
+    samples, _ = scrape(client)
+
+    name = 'rayschic_http_request_duration_seconds'
+    labels = {'method': 'GET', 'route': '/api/health', 'status': '200'}
+    count = value(samples, f'{name}_count', **labels)
+    assert count >= 1
+    # Tranches cumulées, +Inf égale au total
+    buckets = [value(samples, f'{name}_bucket', le=core.format_bound(bound), **labels)
+               for bound in core.LATENCY_BUCKETS + (float('inf'),)]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == count
+    # Étiquette = règle de la route, pas l'URL: pas une série par chemin demandé
+    routes = {dict(key).get('route') for _, key in samples}
+    assert '/api/rien' not in routes
+    assert value(samples, f'{name}_count', method='GET', route='/<path:filename>', status='404') >= 1
+
+
+def test_upload_metrics(client):
+    before, _ = scrape(client)
+    data = image_bytes()
+    upload(client, 'hero', 'a.jpg', data)
+    upload(client, 'hero', 'copie.jpg', data)
+    after, _ = scrape(client)
+
+    def delta(name, **labels):
+        return value(after, name, **labels) - value(before, name, **labels)
+
+    assert delta('rayschic_upload_bytes_count', storage='local') == 1
+    assert delta('rayschic_upload_bytes_sum', storage='local') == len(data)
+    assert delta('rayschic_upload_duration_seconds_count', storage='local', result='stored') == 1
+    assert delta('rayschic_upload_duration_seconds_count', storage='local', result='duplicate') == 1
+
+
+def test_listing_and_cache_counters(client):
+    before, _ = scrape(client)
+    etag = client.get('/api/scan').headers['ETag']
+    client.get('/api/scan', headers={'If-None-Match': etag})
+    client.get('/api/scan?since=0')
+    after, _ = scrape(client)
+
+    for result in ('full', 'not_modified', 'delta'):
+        name = 'rayschic_listing_responses_total'
+        assert value(after, name, endpoint='scan', result=result) - value(before, name, endpoint='scan', result=result) == 1
+    assert value(after, 'rayschic_catalog_cache_total', result='hit') > value(before, 'rayschic_catalog_cache_total', result='hit')
+
+
+@pytest.mark.parametrize('operation', ['upload', 'destroy', 'resources', 'ping'])
+def test_cloudinary_calls_per_operation(client, operation, monkeypatch):
+    monkeypatch.setattr(core.cloudinary_backoff, 'throttled', lambda retry_after: None)
+    before, _ = scrape(client)
+
+    with core.track_cloudinary(operation):
+        pass
+    with pytest.raises(RuntimeError):
+        with core.track_cloudinary(operation):
+            raise RuntimeError('échec')
+    after, _ = scrape(client)
+
+    name = 'rayschic_cloudinary_request_duration_seconds_count'
+    assert value(after, name, operation=operation) - value(before, name, operation=operation) == 2
+    name = 'rayschic_cloudinary_errors_total'
+    assert value(after, name, operation=operation) - value(before, name, operation=operation) == 1
+
+
+def test_label_values_are_escaped():
+    assert core.format_labels((('route', 'a"b\\c\nd'),)) == '{route="a\\"b\\\\c\\nd"}'
+    assert core.format_labels(()) == ''
@@ -0,0 +1,78 @@
+"""Pagination par curseur de /api/scan et /api/generate-json (?limit=, ?cursor=)"""
+import pytest
+
+import app as core
+from conftest import image_bytes, upload
+
+
+@pytest.fixture
+def costumes(client):
+    names = [f"c{index:02d}.jpg" for index in range(7)]
+    for index, name in enumerate(names):
+        upload(client, 'costumes', name, image_bytes(size=(10 + index, 10)))
+    return names
+
+
+def walk(client, url, cursor=None, collection='costumes'):
+    """Suivre next_cursor jusqu'au bout; noms de chaque page"""
+    pages = []
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ''))
+        assert response.status_code == 200
+        body = response.get_json()
+        data = body['collections'][collection]
+        pages.append([image['filename'] for image in data['images']])
+        cursor = data['next_cursor']
+        if not cursor:
+            return pages
+
+
+def test_scan_cursor_round_trip(client, costumes):
+    pages = walk(client, '/api/scan?collection=costumes&limit=3')
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == costumes
+
+
+def test_generate_json_cursor_round_trip(client, costumes):
+    pages = walk(client, '/api/generate-json?collection=costumes&limit=2')
+
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert sum(pages, []) == costumes
+
+
+def test_exact_last_page_has_no_cursor(client, costumes):
+    body = client.get('/api/scan?collection=costumes&limit=7').get_json()
+
+    assert body['collections']['costumes']['next_cursor'] is None
+    assert body['collections']['costumes']['count'] == 7
+
+
+def test_cursor_per_collection(client, costumes):
+    upload(client, 'vestes', 'v1.jpg', image_bytes(size=(5, 5)))
+    first = client.get('/api/scan?collection=costumes,vestes&limit=4').get_json()['collections']
+
+    assert first['vestes']['next_cursor'] is None
+    cursor = first['costumes']['next_cursor']
+    second = client.get(f'/api/scan?collection=costumes,vestes&limit=4&cursor_costumes={cursor}').get_json()
+
+    names = [image['filename'] for image in second['collections']['costumes']['images']]
+    assert names == costumes[4:]
+    # Sans curseur pour vestes: première page à nouveau
+    assert [image['filename'] for image in second['collections']['vestes']['images']] == ['v1.jpg']
+
+
+def test_writes_between_pages_do_not_repeat_or_skip(client, costumes):
+    first = client.get('/api/scan?collection=costumes&limit=3').get_json()['collections']['costumes']
+    # Un nom avant le curseur et un après
+    upload(client, 'costumes', 'a00.jpg', image_bytes(size=(30, 30)))
+    upload(client, 'costumes', 'z99.jpg', image_bytes(size=(31, 31)))
+
+    rest = walk(client, '/api/scan?collection=costumes&limit=3', first['next_cursor'])
+
+    assert sum(rest, []) == costumes[3:] + ['z99.jpg']
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=abc', f'limit={core.PAGE_MAX_LIMIT + 1}', 'limit=2&collection=inconnue'])
+def test_invalid_page_arguments(client, query):
+    assert client.get(f'/api/scan?{query}').status_code == 400
@@ -0,0 +1,86 @@
+"""Recherche, filtres et tris de /api/images (SearchIndex)"""
+import app as core
+from conftest import image_bytes, upload
+
+
+def image(name, size, uploaded_at):
+    return {'filename': name, 'size': size, 'uploaded_at': uploaded_at}
+
+
+def filters(**overrides):
+    base = {
+        'collections': None, 'storage': None, 'prefix': '', 'text': '',
+        'min_size': 0, 'max_size': float('inf'),
+        'date_from': '', 'date_to': core.SEARCH_MAX_CHAR
+    }
+    base.update(overrides)
+    return base
+
+
+def search_index():
+    collections = {
+        'hero': {'images': {
+            'alpha': image('alpha', 300, '2024-01-03'),
+            'beta': image('beta', 100, '2024-01-01')
+        }},
+        'vestes': {'images': {
+            'gamma': image('gamma', 200, '2024-01-02'),
+            'delta': image('delta', 400, '2024-01-04')
+        }}
+    }
+    return core.SearchIndex(collections, {}, 'local')
+
+
+def pages(index, sort, descending, limit, **overrides):
+    """Parcourir toutes les pages en suivant le curseur"""
+    names, cursor = [], None
+    while True:
+        page, cursor = index.query(filters(**overrides), sort, descending, limit, cursor)
+        names.append([entry[2] for entry in page])
+        if cursor is None:
+            return names
+
+
+def test_search_pages_follow_cursor():
+    index = search_index()
+
+    assert pages(index, 'name', False, 2) == [['alpha', 'beta'], ['delta', 'gamma']]
+    assert pages(index, 'size', True, 3) == [['delta', 'alpha', 'gamma'], ['beta']]
+    assert pages(index, 'date', True, 4) == [['delta', 'alpha', 'gamma', 'beta']]
+
+
+def test_search_cursor_past_the_end():
+    index = search_index()
+    last = ('gamma', 'vestes', 'gamma')
+
+    assert index.query(filters(), 'name', False, 2, last) == ([], None)
+    assert index.query(filters(), 'name', False, 2, ('zzz', 'hero', 'zzz')) == ([], None)
+    assert index.query(filters(), 'size', True, 2, (0, 'hero', 'a')) == ([], None)
+
+
+def test_search_filters_and_updates():
+    index = search_index()
+
+    page, _ = index.query(filters(text='elt'), 'name', False, 10)
+    assert [entry[2] for entry in page] == ['delta']
+    page, _ = index.query(filters(collections={'hero'}, min_size=200), 'size', False, 10)
+    assert [entry[2] for entry in page] == ['alpha']
+
+    index.add('hero', image('belt', 50, '2024-01-05'))
+    index.remove(('vestes', 'delta'))
+
+    page, _ = index.query(filters(text='elt'), 'name', False, 10)
+    assert [entry[2] for entry in page] == ['belt']
+    assert pages(index, 'date', True, 10) == [['belt', 'alpha', 'gamma', 'beta']]
+
+
+def test_api_images_cursor(client):
+    for index, name in enumerate(('a', 'b', 'c')):
+        upload(client, 'hero', f"{name}.jpg", image_bytes(size=(10 + index, 10)))
+
+    first = client.get('/api/images?sort=name&limit=2').get_json()
+    second = client.get(f"/api/images?sort=name&limit=2&cursor={first['next_cursor']}").get_json()
+
+    assert [i['filename'] for i in first['images']] == ['a.jpg', 'b.jpg']
+    assert [i['filename'] for i in second['images']] == ['c.jpg']
+    assert second['next_cursor'] is None
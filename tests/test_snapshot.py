@@ -0,0 +1,99 @@
+"""Instantané publié du catalogue: publication atomique et variantes précompressées"""
+import gzip
+import json
+import os
+
+import pytest
+
+import app as core
+from conftest import image_bytes, upload
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    path = os.path.join('instance', 'images.json')
+    monkeypatch.setattr(core, 'SNAPSHOT_PATH', path)
+    monkeypatch.setattr(core, 'snapshot_publisher', core.SnapshotPublisher(path, 0, 0))
+    return path
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_publish_writes_document_and_variants(client, snapshot):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+
+    meta = core.snapshot_publisher.publish()
+
+    body = read(snapshot)
+    assert body == ''.join(core.stream_github_data()).encode('utf-8')
+    assert gzip.decompress(read(snapshot + '.gz')) == body
+    assert json.loads(read(snapshot + '.meta'))['sha256'] == meta['sha256']
+    assert meta['version'] == core.metadata_store.version()
+    assert meta['size'] == len(body)
+    assert [name for name in os.listdir('instance') if '.tmp-' in name] == []
+
+
+def test_unchanged_catalog_is_not_rewritten(client, snapshot):
+    first = core.snapshot_publisher.publish()
+    second = core.snapshot_publisher.publish()
+
+    assert second['published_at'] == first['published_at']
+
+
+def test_failed_publish_keeps_previous_snapshot(client, snapshot, monkeypatch):
+    core.snapshot_publisher.publish()
+    before = read(snapshot)
+    upload(client, 'hero', 'a.jpg', image_bytes())
+
+    def broken():
+        yield '{"last_updated": '
+        raise RuntimeError('panne au milieu')
+    monkeypatch.setattr(core, 'stream_github_data', broken)
+
+    with pytest.raises(RuntimeError):
+        core.snapshot_publisher.publish()
+
+    assert read(snapshot) == before
+    assert gzip.decompress(read(snapshot + '.gz')) == before
+    assert [name for name in os.listdir('instance') if '.tmp-' in name] == []
+
+
+@pytest.mark.parametrize('accept, encoding', [('gzip, deflate', 'gzip'), ('identity', None), ('', None)])
+def test_encoding_negotiation(client, snapshot, accept, encoding):
+    upload(client, 'hero', 'a.jpg', image_bytes())
+    core.snapshot_publisher.publish()
+
+    response = client.get('/images.json', headers={'Accept-Encoding': accept})
+
+    assert response.status_code == 200
+    assert response.headers.get('Content-Encoding') == encoding
+    assert 'Accept-Encoding' in response.headers['Vary']
+    body = gzip.decompress(response.data) if encoding == 'gzip' else response.data
+    assert body == read(snapshot)
+
+
+def test_brotli_variant(client, snapshot):
+    brotli = pytest.importorskip('brotli')
+    core.snapshot_publisher.publish()
+
+    response = client.get('/images.json', headers={'Accept-Encoding': 'br, gzip'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data) == read(snapshot)
+
+
+def test_first_request_publishes_outside_static(client, snapshot):
+    static_files = sorted(os.listdir(core.app.static_folder))
+    tracked = read(os.path.join(core.app.static_folder, 'images.json'))
+
+    response = client.get('/images.json')
+
+    assert response.status_code == 200
+    assert os.path.exists(snapshot + '.meta')
+    assert 'collections' in json.loads(response.data)
+    # Le fichier suivi par git et static/ restent intacts
+    assert sorted(os.listdir(core.app.static_folder)) == static_files
+    assert read(os.path.join(core.app.static_folder, 'images.json')) == tracked
@@ -0,0 +1,128 @@
+"""Mode tiered avec le faux distant en mémoire (benchmarks/fake_storage.py)"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as core
+from conftest import image_bytes, upload
+from fake_storage import FakeRemoteBackend
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    remote = FakeRemoteBackend(latency=0)
+    cache = core.DiskLRUCache('cache', 10 * 1024 * 1024)
+    monkeypatch.setattr(core, 'storage', core.TieredBackend(remote, cache, ['hero']))
+    return remote
+
+
+def catalog_names(collection):
+    return [image['filename'] for image in core.catalog_index.get()['collections'][collection]['images']]
+
+
+def test_upload_goes_to_remote_and_warms_cache(client, remote):
+    data = image_bytes()
+    response = upload(client, 'hero', 'robe.jpg', data)
+
+    assert response.status_code == 200
+    assert remote.objects[('hero', 'robe')] == data
+    # Collection en cache: URL locale, original déjà sur disque
+    assert response.get_json()['image']['url'] == '/media/hero/robe'
+    assert core.storage.cache.get('hero', 'robe') is not None
+    assert catalog_names('hero') == ['robe']
+
+
+def test_duplicate_upload_skips_remote(client, remote):
+    data = image_bytes()
+    upload(client, 'costumes', 'a.jpg', data)
+    calls = remote.calls
+
+    response = upload(client, 'costumes', 'copie.jpg', data)
+
+    assert response.status_code == 200
+    assert response.get_json()['duplicate'] is True
+    assert remote.calls == calls
+    assert catalog_names('costumes') == ['a']
+
+
+def test_delete_removes_remote_cache_and_catalog(client, remote):
+    upload(client, 'hero', 'robe.jpg', image_bytes())
+
+    response = client.post('/api/delete', json={'collection': 'hero', 'filename': 'robe'})
+
+    assert response.status_code == 200
+    assert ('hero', 'robe') not in remote.objects
+    assert not os.path.exists(core.storage.cache.path('hero', 'robe'))
+    assert catalog_names('hero') == []
+
+
+def test_delete_batch(client, remote):
+    for index in range(3):
+        upload(client, 'chemises', f"c{index}.jpg", image_bytes(size=(10 + index, 10)))
+
+    response = client.post('/api/delete/batch', json={'items': [
+        {'collection': 'chemises', 'filename': 'c0'},
+        {'collection': 'chemises', 'filename': 'c2'},
+        {'collection': 'chemises', 'filename': 'absente'}
+    ]})
+
+    statuses = {r['filename']: r['status'] for r in response.get_json()['results']}
+    assert statuses == {'c0': 'deleted', 'c2': 'deleted', 'absente': 'not_found'}
+    assert catalog_names('chemises') == ['c1']
+    assert list(remote.objects) == [('chemises', 'c1')]
+
+
+def test_reconcile_follows_remote(client, remote):
+    upload(client, 'vestes', 'v1.jpg', image_bytes())
+    # Changements faits hors de l'application
+    remote.objects[('vestes', 'v2')] = image_bytes(size=(5, 5))
+    del remote.objects[('vestes', 'v1')]
+
+    summary = core.reconcile()
+
+    assert summary['vestes'] == 1
+    assert catalog_names('vestes') == ['v2']
+
+
+def test_cache_evicts_least_recently_served(client, monkeypatch):
+    remote = FakeRemoteBackend(latency=0)
+    size = 4000
+    for index in range(5):
+        remote.objects[('hero', f"h{index}")] = bytes([index]) * size
+    # Place pour trois originaux; l'éviction redescend à 90%
+    cache = core.DiskLRUCache('cache', 3 * size)
+    monkeypatch.setattr(core, 'storage', core.TieredBackend(remote, cache, ['hero']))
+
+    for index in range(3):
+        assert client.get(f"/media/hero/h{index}").status_code == 200
+        os.utime(cache.path('hero', f"h{index}"), (1000 + index, 1000 + index))
+    assert remote.calls == 3
+
+    # Un quatrième original dépasse la limite: le plus ancien part
+    response = client.get('/media/hero/h3')
+    response.close()
+
+    assert not os.path.exists(cache.path('hero', 'h0'))
+    assert os.path.exists(cache.path('hero', 'h3'))
+    client.get('/media/hero/h2').close()
+    assert cache.hits >= 1
+    assert remote.calls == 4
+
+    # Un original évincé est retéléchargé
+    client.get('/media/hero/h0').close()
+    assert remote.calls == 5
+
+
+def test_remote_flag_is_not_the_origin(remote):
+    assert core.storage.remote is True
+    assert core.storage.origin is remote
+
+
+def test_cache_counters_under_concurrency():
+    cache = core.DiskLRUCache('cache', 1024 * 1024)
+    cache.put('hero', 'a', lambda f: f.write(b'x'))
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda name: cache.get('hero', name), ['a', 'b'] * 2000))
+
+    assert (cache.hits, cache.misses) == (2000, 2000)
@@ -0,0 +1,67 @@
+"""/api/upload/batch: échecs partiels, collections par fichier, doublons dans un lot"""
+import io
+import os
+
+import app as core
+from conftest import image_bytes
+
+
+def upload_batch(client, files, **fields):
+    data = dict(fields)
+    data['files'] = [(io.BytesIO(content), name) for name, content in files]
+    return client.post('/api/upload/batch', data=data, content_type='multipart/form-data')
+
+
+def test_partial_failure(client):
+    response = upload_batch(client, [
+        ('a.jpg', image_bytes()),
+        ('notes.txt', b'pas une image'),
+        ('b.png', image_bytes('PNG', size=(8, 8))),
+        ('faux.jpg', b'\xff\xd8\xff\xe0 tronque')
+    ], collection='costumes')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['success'], body['uploaded'], body['failed'], body['queued']) == (False, 2, 2, 0)
+    assert body['message'] == '2/4 image(s) uploadée(s)'
+    results = body['results']
+    # Un résultat par fichier, dans l'ordre d'envoi
+    assert [r['filename'] for r in results] == ['a.jpg', 'notes.txt', 'b.png', 'faux.jpg']
+    assert [r['success'] for r in results] == [True, False, True, False]
+    assert all(r['error'] for r in results if not r['success'])
+    assert results[2]['image']['filename'] == 'b.png'
+    assert sorted(os.listdir(os.path.join(core.UPLOAD_FOLDER, 'costumes'))) == ['a.jpg', 'b.png']
+
+
+def test_one_collection_per_file(client):
+    response = upload_batch(client, [
+        ('a.jpg', image_bytes()),
+        ('b.jpg', image_bytes(size=(9, 9)))
+    ], collections=['hero', 'inconnue'])
+
+    results = response.get_json()['results']
+    assert [(r['collection'], r['success']) for r in results] == [('hero', True), ('inconnue', False)]
+    assert 'Collection invalide' in results[1]['error']
+
+
+def test_collections_must_match_files(client):
+    response = upload_batch(client, [('a.jpg', image_bytes()), ('b.jpg', image_bytes())], collections=['hero'])
+
+    assert response.status_code == 400
+
+
+def test_missing_files_or_collection(client):
+    assert client.post('/api/upload/batch', data={'collection': 'hero'}).status_code == 400
+    assert upload_batch(client, [('a.jpg', image_bytes())]).status_code == 400
+
+
+def test_same_content_twice_in_one_batch(client):
+    data = image_bytes()
+
+    response = upload_batch(client, [('a.jpg', data), ('copie.jpg', data)], collection='hero')
+
+    results = response.get_json()['results']
+    assert all(r['success'] for r in results)
+    assert sorted(r['duplicate'] for r in results) == [False, True]
+    assert results[0]['image'] == results[1]['image']
+    assert len(os.listdir(os.path.join(core.UPLOAD_FOLDER, 'hero'))) == 1
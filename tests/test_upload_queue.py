@@ -0,0 +1,122 @@
+"""File d'attente des uploads: cycle de vie d'un job, /api/jobs, reprise après crash"""
+import os
+
+import pytest
+
+import app as core
+from conftest import image_bytes, upload
+from fake_storage import FakeRemoteBackend
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    remote = FakeRemoteBackend(latency=0)
+    monkeypatch.setattr(core, 'storage', remote)
+    monkeypatch.setattr(core, 'UPLOAD_QUEUE', True)
+    # Pas de threads: les jobs sont traités à la main
+    queue = core.UploadQueue(1)
+    monkeypatch.setattr(core, 'upload_queue', queue)
+    queue.remote = remote
+    return queue
+
+
+def run_next(queue):
+    job = queue.claim_next()
+    assert job is not None
+    queue.process(job)
+    return job
+
+
+def test_job_lifecycle(client, queue):
+    response = upload(client, 'hero', 'robe.jpg', image_bytes())
+
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['storage'] == 'fake'
+    job_id = body['job']['id']
+    assert body['status_url'] == f"/api/jobs/{job_id}"
+    assert client.get(body['status_url']).get_json()['status'] == 'queued'
+
+    run_next(queue)
+
+    status = client.get(body['status_url']).get_json()
+    assert status['status'] == 'done'
+    assert status['attempts'] == 1
+    assert status['image']['filename'] == 'robe'
+    assert status['image']['duplicate'] is False
+    assert ('hero', 'robe') in queue.remote.objects
+    # Fichier déposé supprimé une fois envoyé
+    assert os.listdir(core.QUEUE_FOLDER) == []
+
+
+def test_same_content_is_queued_once(client, queue):
+    data = image_bytes()
+    first = upload(client, 'hero', 'a.jpg', data).get_json()['job']['id']
+    second = upload(client, 'hero', 'b.jpg', data).get_json()['job']['id']
+
+    assert second == first
+    assert len(os.listdir(core.QUEUE_FOLDER)) == 1
+
+    run_next(queue)
+    response = upload(client, 'hero', 'c.jpg', data)
+
+    assert response.status_code == 200
+    assert response.get_json()['duplicate'] is True
+
+
+def test_jobs_endpoint(client, queue):
+    ids = [upload(client, 'hero', f"{i}.jpg", image_bytes(size=(10 + i, 10))).get_json()['job']['id'] for i in range(2)]
+    run_next(queue)
+
+    response = client.get(f"/api/jobs?ids={ids[0]},{ids[1]},inconnu")
+
+    jobs = response.get_json()['jobs']
+    assert [jobs[ids[0]]['status'], jobs[ids[1]]['status']] == ['done', 'queued']
+    assert jobs['inconnu'] is None
+    assert client.get('/api/jobs').get_json() == {'enabled': True, 'counts': {'done': 1, 'queued': 1}}
+    assert client.get('/api/jobs/inconnu').status_code == 404
+
+
+def test_job_of_crashed_worker_is_retried(client, queue):
+    job_id = upload(client, 'hero', 'a.jpg', image_bytes()).get_json()['job']['id']
+    # Le worker prend le job puis meurt sans le terminer
+    assert queue.claim_next()['id'] == job_id
+    assert queue.claim_next() is None
+    assert client.get(f"/api/jobs/{job_id}").get_json()['status'] == 'running'
+
+    # Bail expiré: un autre worker le reprend
+    with core.metadata_store.transaction() as conn:
+        conn.execute('UPDATE jobs SET run_after = 0 WHERE id = ?', (job_id,))
+    job = run_next(queue)
+
+    assert job['attempts'] == 2
+    status = client.get(f"/api/jobs/{job_id}").get_json()
+    assert status['status'] == 'done'
+    assert list(queue.remote.objects) == [('hero', 'a')]
+
+
+def test_transient_error_is_retried_then_fails(client, queue, monkeypatch):
+    monkeypatch.setattr(core, 'JOB_MAX_ATTEMPTS', 2)
+    monkeypatch.setattr(core, 'JOB_RETRY_BASE', 0)
+
+    def broken(*args, **kwargs):
+        raise ConnectionError('réseau coupé')
+    monkeypatch.setattr(queue.remote, 'put', broken)
+    job_id = upload(client, 'hero', 'a.jpg', image_bytes()).get_json()['job']['id']
+
+    run_next(queue)
+    status = client.get(f"/api/jobs/{job_id}").get_json()
+    assert (status['status'], status['error']) == ('queued', 'réseau coupé')
+    # La réservation du contenu est libérée entre deux essais
+    assert core.metadata_store.connection().execute('SELECT COUNT(*) FROM images').fetchone()[0] == 0
+
+    run_next(queue)
+    status = client.get(f"/api/jobs/{job_id}").get_json()
+    assert (status['status'], status['attempts']) == ('failed', 2)
+    assert os.listdir(core.QUEUE_FOLDER) == []
+
+
+def test_queue_is_not_started_per_request(client, queue, monkeypatch):
+    monkeypatch.setattr(queue, 'start', lambda: pytest.fail('file démarrée par une requête'))
+
+    assert upload(client, 'hero', 'a.jpg', image_bytes()).status_code == 202
@@ -0,0 +1,49 @@
+"""Réception des fichiers en streaming (StagedUpload)"""
+import hashlib
+import os
+
+import app as core
+from conftest import image_bytes, upload
+
+
+def test_staged_upload_hashes_and_commits():
+    staged = core.StagedUpload(limit=100)
+    staged.write(b'a' * 60)
+    staged.write(b'b' * 40)
+
+    assert not staged.too_large
+    assert staged.sha256 == hashlib.sha256(b'a' * 60 + b'b' * 40).hexdigest()
+    assert os.path.dirname(staged.path) == core.INCOMING_FOLDER
+
+    staged.commit('recu.bin')
+    staged.close()
+
+    with open('recu.bin', 'rb') as f:
+        assert f.read() == b'a' * 60 + b'b' * 40
+    assert os.listdir(core.INCOMING_FOLDER) == []
+
+
+def test_staged_upload_over_limit_drops_content():
+    staged = core.StagedUpload(limit=100)
+    staged.write(b'x' * 80)
+    staged.write(b'x' * 30)
+    staged.write(b'x' * 10)
+
+    assert staged.too_large
+    assert staged.size > staged.limit
+    staged.seek(0, os.SEEK_END)
+    assert staged.tell() == 0
+
+    path = staged.path
+    staged.close()
+    assert not os.path.exists(path)
+
+
+def test_multipart_upload_lands_without_leftovers(client):
+    data = image_bytes()
+    response = upload(client, 'costumes', 'veste.jpg', data)
+
+    assert response.status_code == 200
+    with open(os.path.join(core.UPLOAD_FOLDER, 'costumes', 'veste.jpg'), 'rb') as f:
+        assert f.read() == data
+    assert os.listdir(core.INCOMING_FOLDER) == []